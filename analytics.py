@@ -0,0 +1,438 @@
+"""
+Columnar analytics over the turn archive. Every turn in the transcript
+archive is flattened into typed columns (timestamp, hour, call, caller,
+emotion counts, booking and complaint flags, word counts) and written out
+partitioned by day, incrementally: each export only reads turns added
+since the last one, through a read-only connection, so it never holds up
+the webhook's writes.
+
+Partitions hold parts named after the archive rowids they cover, so an
+interrupted export is simply redone. Exports into the same directory take
+turns through a file lock, so concurrent runs never clobber each other's
+state or parts. A part is a directory of raw
+little-endian column files plus meta.json (readable with numpy.fromfile),
+or a Parquet file when pyarrow is installed and ANALYTICS_FORMAT=parquet.
+Reports read only the columns and days they need and aggregate with numpy
+when it is installed, otherwise with bytes and itertools operations that
+run in C.
+
+    python analytics.py export
+    python analytics.py report --from 2026-10-01 --to 2026-10-31
+"""
+import argparse
+import calendar
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from array import array
+from collections import Counter
+from itertools import compress
+
+from customer_profile import TOPIC_KEYWORDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYTICS_DIR = os.getenv('ANALYTICS_DIR', os.path.join(BASE_DIR, 'data', 'analytics'))
+ANALYTICS_FORMAT = os.getenv('ANALYTICS_FORMAT', 'columns')
+TRANSCRIPT_ARCHIVE_PATH = os.getenv('TRANSCRIPT_ARCHIVE_PATH', os.path.join(BASE_DIR, 'data', 'transcripts.db'))
+
+EMOTIONS = ("angry", "frustrated", "urgent", "positive", "confused")
+FLAGS = ("booking_request", "booking_confirmed", "complaint")
+# Column name -> array typecode; all fixed-size, stored little-endian
+SCHEMA = {
+    "ts": "q",
+    "hour": "B",
+    "call": "q",
+    "caller": "q",
+    "first_turn": "B",
+    **{emotion: "B" for emotion in EMOTIONS},
+    "shouting": "B",
+    **{flag: "B" for flag in FLAGS},
+    "user_words": "H",
+    "reply_words": "H",
+}
+NUMPY_TYPES = {"q": "<i8", "H": "<u2", "B": "u1"}
+
+BOOKING_WORDS = frozenset(TOPIC_KEYWORDS["booking"])
+COMPLAINT_WORDS = frozenset(TOPIC_KEYWORDS["complaint"])
+BOOKING_CONFIRMED_RE = re.compile(
+    r"\b(?:i've booked|you're booked|i have booked|booking is confirmed|reservation is confirmed|"
+    r"table is booked|(?:booking|reservation|table) (?:for .{1,40} )?is (?:all )?(?:set|confirmed))\b",
+    re.IGNORECASE
+)
+WORD_RE = re.compile(r"[a-z£']+")
+NONZERO = bytes([0] + [1] * 255)
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little", signed=True)
+
+
+class AnalyticsExporter:
+    """Flattens new transcript archive turns into day-partitioned column parts"""
+
+    def __init__(self, archive_path=TRANSCRIPT_ARCHIVE_PATH, out_dir=ANALYTICS_DIR, fmt=ANALYTICS_FORMAT,
+                 batch_rows=200000):
+        self.archive_path = archive_path
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        self._day_epochs = {}
+        # customer_key -> call_sid of their latest exported turn, to flag the first turn of each call
+        self._last_call = {}
+
+    @property
+    def state_path(self):
+        return os.path.join(self.out_dir, "_state.json")
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"transcripts_rowid": 0}
+
+    def _save_state(self, state):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def lock_path(self):
+        return os.path.join(self.out_dir, "_export.lock")
+
+    def export(self, wait=True):
+        """
+        Export turns added since the last run; returns how many. With
+        wait=False, returns None at once if another export holds the lock.
+        """
+        if not os.path.exists(self.archive_path):
+            return 0
+        os.makedirs(self.out_dir, exist_ok=True)
+        # _state.json is replaced on every save, so the lock lives in a file of its own
+        with open(self.lock_path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            return self._export()
+
+    def _export(self):
+        state = self._load_state()
+        conn = sqlite3.connect(f"file:{self.archive_path}?mode=ro", uri=True, timeout=5)
+        exported = 0
+        try:
+            while True:
+                rows = conn.execute(
+                    "SELECT rowid, customer_key, seq, turn FROM transcripts WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (state["transcripts_rowid"], self.batch_rows)
+                ).fetchall()
+                if not rows:
+                    break
+                self._write_parts(self._flatten(conn, rows), rows[0][0], rows[-1][0])
+                state["transcripts_rowid"] = rows[-1][0]
+                self._save_state(state)
+                exported += len(rows)
+        finally:
+            conn.close()
+        return exported
+
+    def _epoch(self, timestamp):
+        # "YYYY-MM-DD HH:MM:SS" in UTC; strptime per row would dominate the export
+        day = timestamp[:10]
+        midnight = self._day_epochs.get(day)
+        if midnight is None:
+            midnight = self._day_epochs[day] = calendar.timegm(time.strptime(day, "%Y-%m-%d"))
+        hour = int(timestamp[11:13])
+        return day, hour, midnight + hour * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+    def _previous_call(self, conn, customer_key, seq):
+        if seq == 0:
+            return None
+        row = conn.execute("SELECT turn FROM transcripts WHERE customer_key = ? AND seq = ?",
+                           (customer_key, seq - 1)).fetchone()
+        return json.loads(row[0]).get("call_sid") if row else None
+
+    def _flatten(self, conn, rows):
+        """{day: {column: array}} for a batch of archive rows"""
+        days = {}
+        call_hashes = {}
+        for _, customer_key, seq, payload in rows:
+            turn = json.loads(payload)
+            timestamp = turn.get("timestamp")
+            if not timestamp:
+                continue
+            day, hour, ts = self._epoch(timestamp)
+
+            call_sid = turn.get("call_sid") or f"{customer_key}:{day}"
+            if customer_key not in self._last_call:
+                self._last_call[customer_key] = self._previous_call(conn, customer_key, seq)
+            first_turn = self._last_call[customer_key] != call_sid
+            self._last_call[customer_key] = call_sid
+            call = call_hashes.get(call_sid)
+            if call is None:
+                call = call_hashes[call_sid] = _hash64(call_sid)
+
+            emotions = turn.get("emotions_detected") or {}
+            user_input = turn.get("user_input") or ""
+            reply = turn.get("assistant_response") or ""
+            user_words = set(WORD_RE.findall(user_input.lower()))
+
+            # One tuple per row in SCHEMA order; columns are built from them in one pass per day
+            row = (
+                ts, hour, call, int(customer_key[:16], 16) - 2 ** 63, first_turn,
+                *[min(int(emotions.get(emotion) or 0), 255) for emotion in EMOTIONS],
+                bool(emotions.get("is_shouting")),
+                not BOOKING_WORDS.isdisjoint(user_words),
+                BOOKING_CONFIRMED_RE.search(reply) is not None,
+                not COMPLAINT_WORDS.isdisjoint(user_words),
+                min(len(user_input.split()), 65535),
+                min(len(reply.split()), 65535),
+            )
+            day_rows = days.get(day)
+            if day_rows is None:
+                day_rows = days[day] = []
+            day_rows.append(row)
+        return {
+            day: {name: array(typecode, values) for (name, typecode), values in zip(SCHEMA.items(), zip(*day_rows))}
+            for day, day_rows in days.items()
+        }
+
+    def _write_parts(self, days, first_rowid, last_rowid):
+        for day, columns in days.items():
+            day_dir = os.path.join(self.out_dir, f"date={day}")
+            os.makedirs(day_dir, exist_ok=True)
+            name = f"part-{first_rowid:012d}-{last_rowid:012d}"
+            if self.fmt == "parquet":
+                _write_parquet(os.path.join(day_dir, name + ".parquet"), columns)
+            else:
+                _write_columns(os.path.join(day_dir, name), columns)
+
+
+def _write_columns(path, columns):
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, column in columns.items():
+        if sys.byteorder == "big":
+            column = array(column.typecode, column)
+            column.byteswap()
+        with open(os.path.join(tmp_path, f"{name}.bin"), "wb") as f:
+            column.tofile(f)
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"rows": len(columns["ts"]), "columns": {name: column.typecode for name, column in columns.items()},
+                   "dtypes": {name: NUMPY_TYPES[column.typecode] for name, column in columns.items()}}, f)
+    # A re-exported range replaces the part it left half-written or already wrote
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def _write_parquet(path, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    types = {"q": pa.int64(), "H": pa.uint16(), "B": pa.uint8()}
+    table = pa.table({
+        name: pa.Array.from_buffers(types[column.typecode], len(column), [None, pa.py_buffer(column)])
+        for name, column in columns.items()
+    })
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def partitions(out_dir, start=None, end=None):
+    """(day, part paths) for the exported days between start and end (YYYY-MM-DD, inclusive)"""
+    if not os.path.isdir(out_dir):
+        return []
+    result = []
+    for entry in sorted(os.listdir(out_dir)):
+        if not entry.startswith("date="):
+            continue
+        day = entry[5:]
+        if (start and day < start) or (end and day > end):
+            continue
+        day_dir = os.path.join(out_dir, entry)
+        parts = [os.path.join(day_dir, part) for part in sorted(os.listdir(day_dir))
+                 if part.startswith("part-") and not part.endswith(".tmp")]
+        result.append((day, parts))
+    return result
+
+
+def _read_part(path, names, columns):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=list(names))
+        for name in names:
+            columns[name].append(table.column(name).to_numpy())
+        return
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        rows = json.load(f)["rows"]
+    for name in names:
+        column_path = os.path.join(path, f"{name}.bin")
+        if np is not None:
+            columns[name].append(np.fromfile(column_path, dtype=NUMPY_TYPES[SCHEMA[name]], count=rows))
+        else:
+            with open(column_path, "rb") as f:
+                # fromfile appends, so parts are concatenated without copies
+                columns[name].fromfile(f, rows)
+            if sys.byteorder == "big":
+                columns[name].byteswap()
+
+
+def load_columns(parts, names):
+    """{column: array or numpy array} for the given parts, concatenated"""
+    if np is not None:
+        chunks = {name: [] for name in names}
+        for path in parts:
+            _read_part(path, names, chunks)
+        return {name: np.concatenate(chunks[name]) if chunks[name] else np.zeros(0, NUMPY_TYPES[SCHEMA[name]])
+                for name in names}
+    columns = {name: array(SCHEMA[name]) for name in names}
+    for path in parts:
+        _read_part(path, names, columns)
+    return columns
+
+
+# Vectorized helpers: numpy arrays when numpy is installed, else uint8 columns
+# as bytes masks, combined with C-level bytes and big-integer operations
+
+def nonzero(column):
+    if np is not None:
+        return column != 0
+    return column.tobytes().translate(NONZERO)
+
+
+def both(mask, other):
+    if np is not None:
+        return mask & other
+    return (int.from_bytes(mask, "little") & int.from_bytes(other, "little")).to_bytes(len(mask), "little")
+
+
+def count(mask):
+    if np is not None:
+        return int(np.count_nonzero(mask))
+    return mask.count(1)
+
+
+def distinct(values, mask):
+    if np is not None:
+        return set(np.unique(values[mask]).tolist())
+    return set(compress(values, mask))
+
+
+def histogram(values, mask, size):
+    if np is not None:
+        return np.bincount(values[mask], minlength=size)[:size].tolist()
+    counts = Counter(compress(values, mask))
+    return [counts.get(value, 0) for value in range(size)]
+
+
+def total(values):
+    if np is not None:
+        return int(values.sum(dtype=np.int64))
+    return sum(values)
+
+
+def ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def report(out_dir=ANALYTICS_DIR, start=None, end=None):
+    """
+    Calls per hour of day and per day, emotion rates, booking conversion and
+    complaint rate between start and end. A call counts on the day and hour
+    of its first turn; a call rate is the share of calls with at least one
+    such turn.
+    """
+    began = time.perf_counter()
+    names = ("hour", "call", "caller", "first_turn", *EMOTIONS, "shouting", *FLAGS, "user_words")
+    calls_per_day = {}
+    merged = {name: [] for name in names}
+    for day, parts in partitions(out_dir, start, end):
+        columns = load_columns(parts, names)
+        calls_per_day[day] = count(nonzero(columns["first_turn"]))
+        for name in names:
+            merged[name].append(columns[name])
+    if np is not None:
+        columns = {name: np.concatenate(chunks) if chunks else np.zeros(0, NUMPY_TYPES[SCHEMA[name]])
+                   for name, chunks in merged.items()}
+    else:
+        columns = {}
+        for name, chunks in merged.items():
+            columns[name] = array(SCHEMA[name])
+            for chunk in chunks:
+                columns[name].extend(chunk)
+
+    turns = len(columns["call"])
+    everything = np.ones(turns, dtype=bool) if np is not None else b"\x01" * turns
+    first_turns = nonzero(columns["first_turn"])
+    calls = count(first_turns)
+    requested = distinct(columns["call"], nonzero(columns["booking_request"]))
+    confirmed = distinct(columns["call"], nonzero(columns["booking_confirmed"]))
+
+    emotions = {}
+    for emotion in (*EMOTIONS, "shouting"):
+        flagged = nonzero(columns[emotion])
+        flagged_turns, flagged_calls = count(flagged), len(distinct(columns["call"], flagged))
+        emotions[emotion] = {
+            "turns": flagged_turns,
+            "calls": flagged_calls,
+            "turn_rate": ratio(flagged_turns, turns),
+            "call_rate": ratio(flagged_calls, calls),
+        }
+    complained = len(distinct(columns["call"], nonzero(columns["complaint"])))
+
+    return {
+        "from": start,
+        "to": end,
+        "days": len(calls_per_day),
+        "turns": turns,
+        "calls": calls,
+        "callers": len(distinct(columns["caller"], everything)),
+        "turns_per_call": ratio(turns, calls),
+        "words_per_turn": ratio(total(columns["user_words"]), turns),
+        "calls_per_hour": histogram(columns["hour"], first_turns, 24),
+        "calls_per_day": calls_per_day,
+        "emotions": emotions,
+        "bookings": {
+            "requested_calls": len(requested),
+            "confirmed_calls": len(requested & confirmed),
+            "conversion": ratio(len(requested & confirmed), len(requested)),
+        },
+        "complaints": {"calls": complained, "rate": ratio(complained, calls)},
+        "query_seconds": round(time.perf_counter() - began, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar analytics over the transcript archive")
+    parser.add_argument("--out", default=ANALYTICS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Export turns added since the last export")
+    export.add_argument("--archive", default=TRANSCRIPT_ARCHIVE_PATH)
+    export.add_argument("--format", choices=("columns", "parquet"), default=ANALYTICS_FORMAT)
+    query = commands.add_parser("report", help="Print aggregates as JSON")
+    query.add_argument("--from", dest="start", help="First day, YYYY-MM-DD")
+    query.add_argument("--to", dest="end", help="Last day, YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        start = time.perf_counter()
+        exported = AnalyticsExporter(args.archive, args.out, args.format).export()
+        print(f"Exported {exported} turns in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    else:
+        print(json.dumps(report(args.out, args.start, args.end), indent=2))
+
+
+if __name__ == "__main__":
+    main()
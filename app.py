@@ -1,17 +1,38 @@
-from flask import Flask, request, jsonify
-from openai import OpenAI
+from flask import Flask, request, jsonify, Response
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 import pytz
-from docx import Document
 import json
 import hashlib
-from gtts import gTTS
-import speech_recognition as sr
-from twilio.rest import Client
+import hmac
+from functools import wraps
+import re
 from twilio.twiml.voice_response import VoiceResponse, Gather
-import io
+from history_store import open_store, migrate_legacy_json, CALLS, CALLS_BY_PHONE, CUSTOMERS, META
+from write_behind import WriteBehindStore
+from metrics import registry
+from prompt_builder import PromptBuilder, restaurant_lines_from_info
+from retrieval import load_or_build_index
+from streaming import PendingResponse
+from session_store import open_session_store
+from response_cache import ResponseCache
+from emotion import detector as emotion_detector
+from tracing import tracer, NULL_TRACE
+from turn_pipeline import TurnPipeline
+from llm_client import ResilientLLM, LLMUnavailable, DEGRADED_UTTERANCE
+from turn_pipeline import FALLBACK_UTTERANCE
+from tts_cache import MIMETYPES, iter_chunks
+from conversation_window import ConversationWindow, estimate_usage
+from intent_router import IntentRouter, RestaurantIndex
+from analytics import AnalyticsExporter, report as analytics_report, ANALYTICS_DIR
+from campaigns import CampaignStore, CampaignDispatcher, TwilioDialer, normalize_number, parse_numbers
+from customer_profile import CustomerProfile, TranscriptArchive, rollup_profile, RECENT_TURNS
 app = Flask(__name__)
 # Load environment variables
 load_dotenv()
@@ -21,19 +42,102 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 CUSTOMER_HISTORY_PATH = os.path.join(DATA_DIR, 'customer_history.json')
 CALL_HISTORY_PATH = os.path.join(DATA_DIR, 'call_history.json')
-WORD_DOC_PATH = os.path.join(DATA_DIR, 'restaurant_info.docx')
+HISTORY_STORE_PATH = os.getenv('HISTORY_STORE_PATH', os.path.join(DATA_DIR, 'history.db'))
+WORD_DOC_PATH = os.getenv('RESTAURANT_DOC_PATH', os.path.join(DATA_DIR, 'restaurant_info.docx'))
+DOC_CACHE_DIR = os.getenv('DOC_CACHE_DIR', os.path.join(DATA_DIR, 'doc_cache'))
+DOC_RELOAD_INTERVAL = float(os.getenv('DOC_RELOAD_INTERVAL', '5'))
+RETRIEVAL_INDEX_PATH = os.path.join(DATA_DIR, 'retrieval_index.json')
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', os.path.join(DATA_DIR, 'sessions.db'))
+TRANSCRIPT_ARCHIVE_PATH = os.getenv('TRANSCRIPT_ARCHIVE_PATH', os.path.join(DATA_DIR, 'transcripts.db'))
+# <Play> our own cached recordings instead of <Say> where one exists
+TTS_PLAYBACK = os.getenv('TTS_PLAYBACK', '0') == '1'
+TTS_PREWARM = os.getenv('TTS_PREWARM', '1') == '1'
+# Prefix for <Play> URLs; Twilio resolves relative URLs against the webhook URL
+TTS_BASE_URL = os.getenv('TTS_BASE_URL', '')
+# 'web' dispatches campaign calls from the web workers; 'external' leaves it to `python campaigns.py dispatch`
+CAMPAIGN_DISPATCHER = os.getenv('CAMPAIGN_DISPATCHER', 'web')
+# Shared secret for /make-call and /campaigns, sent as "Authorization: Bearer <token>" or "X-API-Token"
+CAMPAIGN_API_TOKEN = os.getenv('CAMPAIGN_API_TOKEN', '')
 os.makedirs(DATA_DIR, exist_ok=True)
 
 class DocumentReader:
-    def __init__(self, doc_path=WORD_DOC_PATH):
+    """
+    Parsed restaurant document. The parse result is cached as JSON keyed by
+    the docx content hash, so worker startup normally skips python-docx, and
+    refresh_if_changed() picks up edits to the docx without a restart.
+    """
+
+    def __init__(self, doc_path=WORD_DOC_PATH, cache_dir=DOC_CACHE_DIR, check_interval=DOC_RELOAD_INTERVAL):
         self.doc_path = doc_path
-        self.restaurant_info = self.read_document()
+        self.cache_dir = cache_dir
+        self.check_interval = check_interval
+        self.content_hash = None
+        self._mtime = None
+        self._last_check = time.monotonic()
+        self._reload_lock = threading.Lock()
+        self.restaurant_info = self.load()
+
+    def _stat_mtime(self):
+        try:
+            return os.path.getmtime(self.doc_path)
+        except OSError:
+            return None
+
+    def load(self):
+        """Load the document from the parse cache, parsing the docx only on a cache miss"""
+        self._mtime = self._stat_mtime()
+        if self._mtime is None:
+            self.content_hash = None
+            return {}
+
+        try:
+            with open(self.doc_path, 'rb') as f:
+                self.content_hash = hashlib.sha256(f.read()).hexdigest()
+            cache_path = os.path.join(self.cache_dir, f"{self.content_hash}.json")
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error reading document cache: {e}")
+
+        restaurant_info = self.read_document()
+        if restaurant_info and self.content_hash:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = os.path.join(self.cache_dir, f"{self.content_hash}.json.tmp")
+                with open(tmp_path, 'w') as f:
+                    json.dump(restaurant_info, f)
+                os.replace(tmp_path, os.path.join(self.cache_dir, f"{self.content_hash}.json"))
+            except Exception as e:
+                print(f"Error writing document cache: {e}")
+        return restaurant_info
+
+    def refresh_if_changed(self):
+        """
+        Reload the document if the docx changed on disk. Polls the mtime at
+        most every check_interval seconds; returns True when the content changed.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        with self._reload_lock:
+            if now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+            if self._stat_mtime() == self._mtime:
+                return False
+            previous_hash = self.content_hash
+            self.restaurant_info = self.load()
+            return self.content_hash != previous_hash
 
     def read_document(self):
         try:
             if not os.path.exists(self.doc_path):
                 return {}
 
+            # Imported here so workers loading from the parse cache never import python-docx
+            from docx import Document
+
             doc = Document(self.doc_path)
             restaurant_info = {
                 "menu_items": [],
@@ -89,38 +193,41 @@ class DocumentReader:
         return self.restaurant_info
 
 class CallHistory:
-    def __init__(self, file_path=CALL_HISTORY_PATH):
+    """
+    Call records, an index of calls by phone number and the overall
+    statistics, all kept in the history store. Every update is a
+    read-modify-write in one store transaction (queued and batched when the
+    store is a WriteBehindStore), so workers sharing the store see the same
+    calls and never overwrite each other's records or counts.
+    """
+
+    def __init__(self, file_path=CALL_HISTORY_PATH, store=None):
         self.file_path = file_path
-        self.history = self.load_history()
+        self.store = store or open_store(HISTORY_STORE_PATH)
+        self.load_history()
 
     def load_history(self):
+        """
+        Import the legacy JSON file, then recompute the statistics and phone
+        index once at startup; afterwards statistics are kept as running deltas
+        """
         try:
-            if os.path.exists(self.file_path):
-                with open(self.file_path, 'r') as f:
-                    return json.load(f)
-            return {
-                "calls": [],
-                "statistics": {
-                    "total_calls": 0,
-                    "total_duration": 0,
-                    "average_duration": 0,
-                    "emotions_detected": {
-                        "angry": 0,
-                        "frustrated": 0,
-                        "positive": 0
-                    }
-                }
-            }
+            migrate_legacy_json(self.store, call_history_path=self.file_path)
+            with self.store.transaction() as tx:
+                calls = list(tx.load(CALLS).values())
+                statistics = self._compute_statistics(calls)
+                if tx.get(META, "call_statistics") != statistics:
+                    tx.put(META, "call_statistics", statistics)
+                by_phone = {}
+                for call in calls:
+                    if call.get("phone_number"):
+                        by_phone.setdefault(call["phone_number"], []).append(call["call_sid"])
+                stored = tx.load(CALLS_BY_PHONE)
+                for phone_number, call_sids in by_phone.items():
+                    if stored.get(phone_number) != call_sids:
+                        tx.put(CALLS_BY_PHONE, phone_number, call_sids)
         except Exception as e:
             print(f"Error loading call history: {e}")
-            return {"calls": [], "statistics": {}}
-
-    def save_history(self):
-        try:
-            with open(self.file_path, 'w') as f:
-                json.dump(self.history, f, indent=4)
-        except Exception as e:
-            print(f"Error saving call history: {e}")
 
     def update_call(self, call_data):
         """
@@ -135,28 +242,76 @@ class CallHistory:
         - conversation_summary
         - booking_made (boolean)
         - complaint_filed (boolean)
+
+        With a WriteBehindStore the update is queued and applied by its flusher.
         """
+        try:
+            self.store.mutate(self._apply_call, call_data)
+        except Exception as e:
+            print(f"Error saving call history: {e}")
+
+    @classmethod
+    def _apply_call(cls, tx, call_data):
+        stats = tx.get(META, "call_statistics") or cls._compute_statistics([])
         # Find existing call or create new entry
-        call_entry = next(
-            (call for call in self.history["calls"] if call["call_sid"] == call_data["call_sid"]),
-            None
-        )
+        call_entry = tx.get(CALLS, call_data["call_sid"])
 
         if call_entry:
-            # Update existing call
+            # Update existing call, swapping its old contribution for the new one
+            cls._apply_statistics_delta(stats, call_entry, -1)
+            old_phone = call_entry.get("phone_number")
             call_entry.update(call_data)
+            if call_entry.get("phone_number") != old_phone:
+                cls._index_phone(tx, old_phone, call_entry["call_sid"], add=False)
+                cls._index_phone(tx, call_entry.get("phone_number"), call_entry["call_sid"])
+            cls._apply_statistics_delta(stats, call_entry, 1)
         else:
             # Add new call
-            self.history["calls"].append(call_data)
+            call_entry = dict(call_data)
+            cls._index_phone(tx, call_entry.get("phone_number"), call_entry["call_sid"])
+            stats["total_calls"] += 1
+            cls._apply_statistics_delta(stats, call_entry, 1)
+
+        tx.put(CALLS, call_entry["call_sid"], call_entry)
+        tx.put(META, "call_statistics", stats)
 
-        # Update statistics
-        self._update_statistics()
-        self.save_history()
+    @staticmethod
+    def _index_phone(tx, phone_number, call_sid, add=True):
+        if not phone_number:
+            return
+        call_sids = tx.get(CALLS_BY_PHONE, phone_number) or []
+        if add and call_sid not in call_sids:
+            call_sids.append(call_sid)
+        elif not add and call_sid in call_sids:
+            call_sids.remove(call_sid)
+        tx.put(CALLS_BY_PHONE, phone_number, call_sids)
 
-    def _update_statistics(self):
-        """Update overall statistics based on call history"""
+    @staticmethod
+    def _apply_statistics_delta(stats, call, sign):
+        """Add (sign=1) or remove (sign=-1) a single call's contribution to the statistics"""
+        if "duration" in call:
+            stats["total_duration"] += sign * call["duration"]
+
+        if "emotions_detected" in call:
+            for emotion, count in call["emotions_detected"].items():
+                if emotion in stats["emotions_detected"]:
+                    stats["emotions_detected"][emotion] += sign * count
+
+        if call.get("booking_made", False):
+            stats["bookings_made"] += sign
+        if call.get("complaint_filed", False):
+            stats["complaints_filed"] += sign
+
+        stats["average_duration"] = (
+            stats["total_duration"] / stats["total_calls"]
+            if stats["total_calls"] > 0 else 0
+        )
+
+    @staticmethod
+    def _compute_statistics(calls):
+        """Compute overall statistics by scanning every call"""
         stats = {
-            "total_calls": len(self.history["calls"]),
+            "total_calls": len(calls),
             "total_duration": 0,
             "emotions_detected": {
                 "angry": 0,
@@ -167,7 +322,7 @@ class CallHistory:
             "complaints_filed": 0
         }
 
-        for call in self.history["calls"]:
+        for call in calls:
             if "duration" in call:
                 stats["total_duration"] += call["duration"]
 
@@ -186,330 +341,894 @@ class CallHistory:
             if stats["total_calls"] > 0 else 0
         )
 
-        self.history["statistics"] = stats
+        return stats
+
+    def verify_statistics(self):
+        """
+        Recompute the statistics from scratch and compare them with the running
+        aggregates. Returns {field: (running, recomputed)} for every mismatch.
+        """
+        with self.store.transaction() as tx:
+            running = tx.get(META, "call_statistics") or {}
+            expected = self._compute_statistics(list(tx.load(CALLS).values()))
+        mismatches = {}
+        for field, value in expected.items():
+            if field == "emotions_detected":
+                for emotion, count in value.items():
+                    if running.get(field, {}).get(emotion) != count:
+                        mismatches[f"{field}.{emotion}"] = (running.get(field, {}).get(emotion), count)
+            elif field == "average_duration":
+                if abs(running.get(field, 0) - value) > 1e-9:
+                    mismatches[field] = (running.get(field), value)
+            elif running.get(field) != value:
+                mismatches[field] = (running.get(field), value)
+        return mismatches
 
     def get_call_history(self, call_sid=None, phone_number=None):
         """Get call history for specific call or phone number"""
         if call_sid:
-            return next(
-                (call for call in self.history["calls"] if call["call_sid"] == call_sid),
-                None
-            )
+            return self.store.get(CALLS, call_sid)
         elif phone_number:
-            return [
-                call for call in self.history["calls"]
-                if call["phone_number"] == phone_number
-            ]
-        return self.history
+            call_sids = self.store.get(CALLS_BY_PHONE, phone_number) or []
+            return [call for call in (self.store.get(CALLS, sid) for sid in call_sids) if call]
+        return {
+            "calls": list(self.store.load(CALLS).values()),
+            "statistics": self.store.get(META, "call_statistics")
+        }
 
 class CustomerHistory:
-    def __init__(self, file_path=CUSTOMER_HISTORY_PATH):
+    """
+    Compact per-customer profiles (preferences, counters, recent turns and a
+    summary of older calls) keyed by a hash of the phone number. Profiles
+    are read from the history store on each turn and updated in a store
+    transaction, queued for the write-behind flusher when there is one, so
+    every worker sharing the store sees the same profile.
+    Every turn is also appended to the transcript archive, which is only
+    read when a transcript is paged or old turns are rolled up into the
+    profile.
+    """
+
+    def __init__(self, file_path=CUSTOMER_HISTORY_PATH, store=None, archive=None):
         self.file_path = file_path
-        self.history = self.load_history()
-        
+        self.store = store or open_store(HISTORY_STORE_PATH)
+        self.archive = archive or TranscriptArchive(TRANSCRIPT_ARCHIVE_PATH)
+        self.rollup_every = int(os.getenv('CUSTOMER_ROLLUP_EVERY', '20'))
+        self.load_history()
+
     def load_history(self):
+        """Import the legacy JSON file and convert records from before the profile split"""
         try:
-            if os.path.exists(self.file_path):
-                with open(self.file_path, 'r') as f:
-                    return json.load(f)
-            return {}
+            migrate_legacy_json(self.store, customer_history_path=self.file_path)
+            outdated = [
+                customer_key for customer_key, record in self.store.load(CUSTOMERS).items()
+                if "conversations" in record or record.get("context") is None
+            ]
         except Exception as e:
             print(f"Error loading history: {e}")
-            return {}
+            return
 
-    def save_history(self):
-        try:
-            with open(self.file_path, 'w') as f:
-                json.dump(self.history, f, indent=4)
-        except Exception as e:
-            print(f"Error saving history: {e}")
+        for customer_key in outdated:
+            try:
+                with self.store.transaction() as tx:
+                    record = tx.get(CUSTOMERS, customer_key)
+                    if "conversations" in record:
+                        # Records from before the profile split hold every turn inline; archive them once.
+                        # Turns already archived mean an earlier conversion stopped before saving the profile
+                        if not self.archive.count(customer_key):
+                            self.archive.append_many(customer_key, record["conversations"])
+                        profile = CustomerProfile.from_legacy_record(record)
+                    elif record.get("context") is None:
+                        profile = CustomerProfile.from_dict(record)
+                        profile.refresh_context()
+                    else:
+                        # Converted by another worker in the meantime
+                        continue
+                    tx.put(CUSTOMERS, customer_key, profile.to_dict())
+            except Exception as e:
+                print(f"Error converting customer history: {e}")
 
     def get_customer_history(self, phone_number):
+        """The customer's CustomerProfile, or None for a first-time caller"""
         customer_key = hashlib.md5(phone_number.encode()).hexdigest()
-        return self.history.get(customer_key, {})
+        record = self.store.get(CUSTOMERS, customer_key)
+        return CustomerProfile.from_dict(record) if record else None
+
+    def get_transcript_page(self, phone_number, before=None, limit=20):
+        """A page of archived (turn_number, turn) pairs, newest first"""
+        customer_key = hashlib.md5(phone_number.encode()).hexdigest()
+        return self.archive.page(customer_key, before=before, limit=limit)
 
     def update_customer_history(self, phone_number, conversation_data):
+        """
+        Archive a turn, then fold it into the caller's profile; with a
+        WriteBehindStore the profile update is queued. The archive is its own
+        database, so it is written before the profile transaction rather
+        than inside it, and the profile's turn count follows the archive.
+        """
         customer_key = hashlib.md5(phone_number.encode()).hexdigest()
-        
-        if customer_key not in self.history:
-            self.history[customer_key] = {
-                "phone": phone_number,
-                "first_interaction": datetime.now(pytz.UTC).strftime("%Y-%m-%d %H:%M:%S"),
-                "conversations": [],
-                "preferences": {
-                    "seating_preference": None,
-                    "dietary_restrictions": [],
-                    "favorite_dishes": [],
-                    "special_requests": []
-                },
-                "bookings": [],
-                "complaints": [],
-                "satisfaction_score": None,
-                "total_visits": 0,
-                "total_spent": 0
-            }
-        
-        self.history[customer_key]["conversations"].append(conversation_data)
-        self.history[customer_key]["last_interaction"] = datetime.now(pytz.UTC).strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Update preferences based on conversation
-        if "preferences" in conversation_data:
-            self.history[customer_key]["preferences"].update(conversation_data["preferences"])
-        
-        # Update bookings if applicable
-        if "booking" in conversation_data:
-            self.history[customer_key]["bookings"].append(conversation_data["booking"])
-            self.history[customer_key]["total_visits"] += 1
-        
-        # Update complaints if applicable
-        if "complaint" in conversation_data:
-            self.history[customer_key]["complaints"].append(conversation_data["complaint"])
-        
-        self.save_history()
+        try:
+            turn_number = self.archive.append(customer_key, conversation_data)
+        except Exception as e:
+            print(f"Error archiving transcript: {e}")
+            turn_number = None
+        try:
+            self.store.mutate(self._apply_turn, customer_key, phone_number, conversation_data, turn_number)
+        except Exception as e:
+            print(f"Error saving history: {e}")
+
+    def _apply_turn(self, tx, customer_key, phone_number, conversation_data, turn_number):
+        record = tx.get(CUSTOMERS, customer_key)
+        profile = CustomerProfile.from_dict(record) if record else CustomerProfile(phone=phone_number)
+        profile.record_turn(conversation_data, turn_number=turn_number)
+
+        # Keep the summary current without a separate job for regular callers
+        if profile.total_turns - RECENT_TURNS - profile.rolled_up_through >= self.rollup_every:
+            try:
+                rollup_profile(profile, customer_key, self.archive)
+            except Exception as e:
+                print(f"Error rolling up customer history: {e}")
+
+        tx.put(CUSTOMERS, customer_key, profile.to_dict())
+
+    def rollup(self, keep_recent=RECENT_TURNS):
+        """Summarize archived turns into every profile; returns how many changed"""
+        changed = 0
+        for customer_key in self.store.load(CUSTOMERS):
+            with self.store.transaction() as tx:
+                profile = CustomerProfile.from_dict(tx.get(CUSTOMERS, customer_key))
+                if rollup_profile(profile, customer_key, self.archive, keep_recent):
+                    tx.put(CUSTOMERS, customer_key, profile.to_dict())
+                    changed += 1
+        return changed
+
+class RestaurantContext:
+    """
+    Read-only state derived from the restaurant document: the parsed info,
+    the retrieval index, the prompt builder with its static prefix and the
+    intent router.
+    Nothing here holds a connection or a thread, so it can be built in the
+    gunicorn master and shared copy-on-write with the forked workers.
+    """
+
+    def __init__(self, doc_reader=None, retrieval_top_k=None):
+        self.doc_reader = doc_reader or DocumentReader()
+        # Only the top-k relevant document sections go into the prompt; 0 sends the whole document
+        if retrieval_top_k is None:
+            retrieval_top_k = int(os.getenv('PROMPT_RETRIEVAL_TOP_K', '4'))
+        self.retrieval_top_k = retrieval_top_k
+        self.load()
+
+    def load(self):
+        """(Re)build everything derived from the restaurant document"""
+        self.restaurant_info = self.doc_reader.get_info()
+        lines = restaurant_lines_from_info(self.restaurant_info)
+        retrieval_index = None
+        if self.retrieval_top_k > 0:
+            retrieval_index = load_or_build_index(lines, RETRIEVAL_INDEX_PATH, source_path=self.doc_reader.doc_path)
+        self.prompt_builder = PromptBuilder(self.restaurant_info, retrieval_index, self.retrieval_top_k)
+        # Menu prices, policies and contact details, answered without the LLM
+        self.intent_router = IntentRouter(RestaurantIndex.from_lines(lines))
+
+    def refresh_if_changed(self):
+        if self.doc_reader.refresh_if_changed():
+            print(f"Restaurant document changed, reloading {self.doc_reader.doc_path}")
+            self.load()
+            return True
+        return False
+
+
+_restaurant_context = None
+_conversation_manager = None
+_voice_handler = None
+_campaign_dispatcher = None
+_startup_lock = threading.RLock()
+
+
+def warmup():
+    """
+    Load the read-only state every worker needs: the restaurant document,
+    retrieval index and prompt templates, plus the OpenAI SDK, the slowest
+    import by far. Called from the gunicorn master (see gunicorn.conf.py) so
+    workers fork with it already in memory; otherwise runs on first use.
+    """
+    global _restaurant_context
+    if _restaurant_context is None:
+        with _startup_lock:
+            if _restaurant_context is None:
+                import openai  # noqa: F401
+                _restaurant_context = RestaurantContext()
+                if TTS_PLAYBACK and TTS_PREWARM:
+                    synthesized = get_voice_handler().prewarm(STATIC_PROMPTS)
+                    print(f"TTS cache prewarmed, {synthesized} static prompts synthesized")
+    return _restaurant_context
+
+
+def get_voice_handler():
+    """The per-process VoiceHandler; its disk cache is shared by all workers"""
+    global _voice_handler
+    if _voice_handler is None:
+        with _startup_lock:
+            if _voice_handler is None:
+                from voice_handler import VoiceHandler
+                _voice_handler = VoiceHandler()
+    return _voice_handler
+
+
+def get_campaign_dispatcher():
+    """
+    The per-process campaign dispatcher, with its store and Twilio dialer.
+    Its threads are started on first use, in the worker; the rate limit is
+    shared through the store, so every worker may dispatch.
+    """
+    global _campaign_dispatcher
+    if _campaign_dispatcher is None:
+        with _startup_lock:
+            if _campaign_dispatcher is None:
+                _campaign_dispatcher = CampaignDispatcher(CampaignStore(), TwilioDialer.from_env())
+    if CAMPAIGN_DISPATCHER == 'web':
+        _campaign_dispatcher.start()
+    return _campaign_dispatcher
+
+
+def get_conversation_manager():
+    """
+    The per-process ConversationManager. It is created on the first request
+    rather than at import, so its history store, session sweeper and thread
+    pool belong to the worker and are never inherited across a fork.
+    """
+    global _conversation_manager
+    if _conversation_manager is None:
+        with _startup_lock:
+            if _conversation_manager is None:
+                _conversation_manager = ConversationManager()
+    return _conversation_manager
+
 
 class ConversationManager:
     def __init__(self):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.client = OpenAI(api_key=self.openai_api_key)
-        self.customer_history = CustomerHistory()
-        self.call_history = CallHistory()
-        self.doc_reader = DocumentReader()
+        # Pooled OpenAI clients with a deadline, hedging to a fallback model and circuit breakers;
+        # created on first use, in the worker that makes the call
+        self.llm = ResilientLLM.from_env(self.openai_api_key)
+        self.history_store = open_store(HISTORY_STORE_PATH)
+        if os.getenv('HISTORY_WRITE_BEHIND', '1') == '1':
+            # Persist history from a background thread so the webhook doesn't wait on disk
+            self.history_store = WriteBehindStore(self.history_store)
+        self.customer_history = CustomerHistory(store=self.history_store)
+        self.call_history = CallHistory(store=self.history_store)
         # Add conversation memory with timeout
-        self.conversation_memory = {}
         self.memory_timeout = 300  # 5 minutes in seconds
-        self.restaurant_info = self.doc_reader.get_info()
+        self.conversation_memory = open_session_store(SESSION_STORE_PATH, ttl=self.memory_timeout)
+        # Token budget for the history sent with each request; older turns become a running summary
+        self.conversation_window = ConversationWindow()
+        # Overlaps independent turn stages and enforces per-stage timeouts
+        self.pipeline = TurnPipeline.from_env()
+        # Streamed replies still being generated by this worker, by call_sid; once finished,
+        # the remainder is published to the session store for whichever worker continues the call
+        self.pending_responses = {}
+        # Answers to repeated standalone questions, e.g. opening times or prices
+        self.response_cache = None
+        if os.getenv('RESPONSE_CACHE', '1') == '1':
+            self.response_cache = ResponseCache(ttl=int(os.getenv('RESPONSE_CACHE_TTL', '3600')))
+        # Structured questions (prices, policies, address) answered straight from the document
+        self.intent_routing = os.getenv('INTENT_ROUTER', '1') == '1'
+        # Async serving: blocking routing, memory and history work runs on these threads, while
+        # _call_locks keeps the turns of each call in order
+        self.history_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('HISTORY_WORKERS', '8')), thread_name_prefix="history-io"
+        )
+        self._call_locks = weakref.WeakValueDictionary()
+        # Parsed document and prompt templates, shared with the pre-fork master if warmup() ran there
+        self.restaurant = warmup()
+
+    @property
+    def client(self):
+        return self.llm.client
+
+    @client.setter
+    def client(self, client):
+        self.llm.client = client
+
+    def refresh_document(self):
+        """Hot-reload the restaurant document if the docx changed"""
+        self.restaurant.refresh_if_changed()
 
     def detect_emotion_and_context(self, text):
-        emotion_indicators = {
-            'angry': ['angry', 'furious', 'upset', 'horrible', 'terrible', 'stupid', 'useless'],
-            'frustrated': ['annoying', 'frustrating', 'difficult', 'problem', 'issue'],
-            'urgent': ['immediately', 'urgent', 'asap', 'emergency', 'right now'],
-            'positive': ['happy', 'great', 'wonderful', 'excellent', 'perfect', 'thanks'],
-            'confused': ['confused', 'unsure', 'don\'t understand', 'what do you mean']
-        }
-        
-        text_lower = text.lower()
-        emotions = {
-            emotion: any(word in text_lower for word in words)
-            for emotion, words in emotion_indicators.items()
-        }
-        
-        emotions['is_shouting'] = text.isupper() or text.count('!') > 1
-        emotions['has_interruption'] = '...' in text or '?' in text
-        
-        return emotions
+        """Per-emotion keyword hit counts plus is_shouting / has_interruption flags"""
+        return emotion_detector.score(text)
 
-    def get_response(self, user_input, phone_number=None, call_sid=None):
-        try:
-            # Get or initialize conversation memory
-            current_time = datetime.now(pytz.UTC)
-            if call_sid in self.conversation_memory:
-                last_interaction = self.conversation_memory[call_sid]['timestamp']
-                if (current_time - last_interaction).total_seconds() > self.memory_timeout:
-                    # Reset conversation if timeout exceeded
-                    self.conversation_memory[call_sid] = {
-                        'messages': [],
-                        'timestamp': current_time
-                    }
-            else:
-                self.conversation_memory[call_sid] = {
-                    'messages': [],
-                    'timestamp': current_time
-                }
+    def _fetch_context(self, phone_number, call_sid, trace=NULL_TRACE):
+        """Conversation memory and customer profile for a turn"""
+        with trace.span("history_lookup"):
+            # Get conversation memory; the session store expires it after memory_timeout
+            session = self.conversation_memory.get(call_sid) or {'messages': []}
 
-            # Get customer history and emotional context
-            customer_info = self.customer_history.get_customer_history(phone_number) if phone_number else {}
+            # Customer profile, whose caller context snippet is precomputed on write
+            customer_profile = self.customer_history.get_customer_history(phone_number) if phone_number else None
+        return session, customer_profile
+
+    def _prepare_turn(self, user_input, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        """
+        Refresh conversation memory and build the messages for the LLM.
+        Returns (current_time, emotions, messages, personalized), where
+        personalized says the prompt carries the caller's profile.
+        """
+        current_time = datetime.now(pytz.UTC)
+
+        # Fetch context on the pipeline while emotions are detected here; a slow
+        # session store costs the caller their history for this turn, not the turn
+        context = self.pipeline.start(self._fetch_context, phone_number, call_sid, trace)
+        with trace.span("emotion"):
             emotions = self.detect_emotion_and_context(user_input)
-            
-           
-            my_sample_data = """
-
-________________________________________
-Restaurant Name:
-The Bavarian Bierhaus
-Address:
-22 Beer Street, Leeds, LS1 1AA, UK
-Contact Information:
-•	Phone: +44 113 234 5678
-•	Email: info@bavarianbierhaus.com
-•	Website: www.bavarianbierhaus.com
-•	Social Media: @BavarianBierhaus (Instagram, Twitter, Facebook)
-________________________________________
-Restaurant Overview:
-The Bavarian Bierhaus is a modern homage to the Bavarian beer halls of Munich, located in the heart of Leeds. Offering a warm, welcoming atmosphere, we provide guests with an authentic taste of German cuisine, from hearty sausages and schnitzels to the finest German lagers and weissbiers. Designed to replicate the rustic charm of a traditional beer garden, The Bavarian Bierhaus boasts wooden beams, long communal tables, and iconic Bavarian decor such as blue and white checkered flags. Our mission is to bring the best of Bavarian hospitality to the UK with every dish and drink we serve.
-________________________________________
-Restaurant Design and Ambiance:
-•	Interior: The inside features warm wood paneling, candlelit chandeliers, and rustic brick walls adorned with Bavarian artwork and vintage beer signs. The setting is designed to transport guests straight to Bavaria, creating an immersive atmosphere that pairs perfectly with the German beers and traditional dishes on offer.
-•	Outdoor Beer Garden: The Bierhaus also has a large outdoor seating area, perfect for those who wish to enjoy a refreshing beer or cocktail while soaking in the ambiance. The garden is adorned with large parasols and heaters, allowing guests to enjoy their meals year-round.
-•	Music and Entertainment: Live German folk bands perform every Friday and Saturday evening, adding to the festive atmosphere. During special events, such as Oktoberfest, the Bierhaus hosts lively traditional Bavarian music, dancing, and competitions.
-________________________________________
-History of Bavarian Cuisine:
-Bavarian cuisine is deeply rooted in tradition, with hearty meals designed to satisfy after a long day of work or outdoor activity. The emphasis is on quality meats, fresh ingredients, and dishes designed to be enjoyed with family and friends. Some of the most iconic foods, such as Wiener Schnitzel, Bratwurst, and Sauerbraten, have centuries-old origins and have evolved into staples of the Bavarian food scene.
-•	Sauerbraten: One of Bavaria's most beloved dishes, Sauerbraten is a pot roast that is marinated for several days before being slow-cooked to perfection. The dish is served with potato dumplings or boiled potatoes and red cabbage, creating a satisfying balance of flavors.
-•	Pretzels (Brezn): German pretzels are another hallmark of Bavarian cuisine, often served as an appetizer alongside sausages or as a snack with mustard. The pretzel's signature twisted shape comes from its ancient origins, dating back to early Christian times.
-________________________________________
-Restaurant Policies:
-Reservation Policy:
-We encourage our guests to book a table, especially for weekends, holidays, and special events. Reservations can be made online via our website or by calling the restaurant directly. Group bookings of 8 or more people must be made at least 48 hours in advance to ensure availability.
-Cancellation Policy:
-A 24-hour cancellation notice is required for all reservations. Cancellations within 24 hours will incur a £10 cancellation fee per person, while no-shows will be charged £15 per person.
-Dress Code:
-Casual attire is welcome, but for an authentic Bavarian experience, we encourage guests to wear traditional German clothing (lederhosen or dirndls) on special themed nights or for Oktoberfest.
-Payment Methods:
-We accept all major credit cards (Visa, MasterCard, American Express), debit cards, and cash. Contactless payments are also available for a quicker checkout process.
-Children and Pets:
-•	We offer a kid-friendly menu and high chairs for families. Children under the age of 5 eat for free when accompanied by an adult.
-•	Well-behaved pets are welcome in our outdoor beer garden. Please keep them on a leash and be mindful of other guests.
-Accessibility:
-The Bavarian Bierhaus is wheelchair accessible. We also have accessible restrooms for our guests’ convenience.
-________________________________________
-Menu Details:
-Appetizers:
-1.	Pretzel with Mustard – £3.99
-A classic German starter, our soft, freshly baked pretzel is served with a rich, tangy mustard. The perfect way to start your Bavarian journey!
-2.	Bratwurst with Sauerkraut – £5.99
-Juicy, grilled bratwurst sausages paired with homemade sauerkraut. This combination is a German staple, loved for its smoky, spicy flavor and crunchy texture.
-3.	Käsespätzle (Cheese Noodles) – £6.49
-Our take on macaroni and cheese, this dish features homemade spätzle (soft egg noodles) drenched in melted Swiss cheese and topped with crispy fried onions. A comfort food favorite!
-4.	Sauerbraten Meatballs (Königsberger Klopse) – £6.99
-Savory meatballs made with ground beef and pork, served in a rich, creamy gravy with capers. This dish originates from East Prussia and has been a part of German cuisine for centuries.
-5.	Obatzda (Bavarian Cheese Dip) – £4.49
-This creamy cheese dip is a popular Bavarian snack, combining soft cheese with butter, paprika, and other spices. Served with crusty bread or crackers for dipping.
-________________________________________
-Main Dishes:
-1.	Wiener Schnitzel – £12.99
-This traditional Viennese dish consists of a tender, breaded, and fried veal cutlet, served with mashed potatoes and cranberry sauce. A favorite throughout Germany and Austria, it’s perfect for meat lovers.
-2.	Jägerschnitzel (Hunter's Schnitzel) – £13.99
-A variation of the Wiener Schnitzel, this dish is topped with a rich and flavorful mushroom sauce. It’s a savory, comforting meal, best enjoyed with fries or spätzle.
-3.	Sauerbraten (German Pot Roast) – £14.49
-A slow-braised beef dish marinated for several days in a mixture of vinegar, wine, and spices. Served with potato dumplings and red cabbage, this dish offers a perfect balance of sweet, tangy, and savory flavors.
-4.	Bratwurst Platter – £11.99
-Enjoy a sampling of various traditional sausages, including bratwurst, currywurst, and weisswurst. Served with potato salad, sauerkraut, and mustard, it’s a hearty and satisfying meal.
-5.	Kasseler Rippchen (Smoked Pork Chops) – £15.49
-Smoky, tender pork chops, served with mashed potatoes, sauerkraut, and a tangy mustard sauce. The smokiness of the meat pairs perfectly with the acidity of the sauerkraut.
-________________________________________
-Desserts:
-1.	Apfelstrudel (Apple Strudel) – £4.99
-A warm pastry filled with spiced apples and raisins, served with a scoop of vanilla ice cream. It’s a sweet end to any Bavarian meal!
-2.	Black Forest Cake (Schwarzwälder Kirschtorte) – £5.49
-A rich chocolate cake layered with whipped cream, cherries, and Kirsch liqueur. This dessert is as iconic as it is indulgent.
-3.	Kaiserschmarrn (Shredded Pancake) – £5.49
-A fluffy, shredded pancake served with apple compote or plum jam. A true Bavarian classic, it's light and satisfying.
-________________________________________
-Drink Menu:
-Beers:
-1.	Krombacher Lager – £3.49 (330ml)
-A crisp, refreshing lager with a light malt flavor. Krombacher is one of Germany’s most well-known beer brands.
-2.	Paulaner Helles – £3.99 (500ml)
-A traditional Munich lager with a balanced taste of malt and hops, making it perfect for pairing with any dish.
-3.	Weissbier (Wheat Beer) – £4.99 (500ml)
-This wheat beer has a cloudy appearance and is known for its fruity aroma and smooth finish.
-4.	Augustiner Edelstoff – £4.49 (500ml)
-A smooth Munich lager with a mild, hoppy flavor and a slightly sweet aftertaste.
-________________________________________
-Testimonials:
-"A fantastic experience! The atmosphere felt just like a beer hall in Munich, and the food was absolutely delicious. Highly recommend the Wiener Schnitzel." – Sarah M.
-"The best German food I've had outside of Germany! The Sauerbraten was tender, and the pretzel was the perfect start." – John T.
-________________________________________
-Conclusion:
-The Bavarian Bierhaus is more than just a restaurant; it’s an experience. From our traditional German dishes to our world-class beer selection, we aim to transport our guests to the heart of Bavaria. Whether you’re here for a quick bite or a long evening with friends, we guarantee a memorable experience every time.
-
-
-
-            """
-            
-            system_prompt = f"""
-                        You are James, a knowledgeable restaurant assistant for our establishment.
-                        Current time: {current_time.strftime('%Y-%m-%d %H:%M:%S')} UTC
-
-                        Restaurant Information:
-                        {my_sample_data}
-
-                        Key Guidelines:
-                        1. Speak naturally and warmly like a real person
-                        2. Never direct customers to check websites or other sources
-                        3. Only provide information that exists in the restaurant data
-                        4. If information isn't in the reference data, politely say you'll check with the team
-                        5. Don't repeat phrases unless specifically asked
-                        6. Maintain conversation context and reference previous discussion points
-                        7. Be direct and helpful - avoid unnecessarily repeating "How may I assist you"
-                        8. Use the full conversation history to provide context-aware responses
-                        """
-
-
-            # Add emotional context to prompt
-            if emotions['angry'] or emotions['is_shouting']:
-                system_prompt += "\nThe customer seems upset or frustrated. Maintain extra patience and empathy."
-            if emotions['urgent']:
-                system_prompt += "\nThe customer has an urgent request. Prioritize efficiency while maintaining friendliness."
+        session, customer_profile = self.pipeline.wait(
+            context, self.pipeline.context_timeout, "context", default=({'messages': []}, None)
+        )
+
+        messages, personalized = self._build_messages(user_input, current_time, emotions, session, customer_profile,
+                                                      trace)
+        return current_time, emotions, messages, personalized
+
+    async def _prepare_turn_async(self, user_input, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        """_prepare_turn for the event loop; the context fetch is awaited with its timeout, not waited on in a thread"""
+        loop = asyncio.get_running_loop()
+        current_time = datetime.now(pytz.UTC)
+
+        context = loop.run_in_executor(self.history_executor, self._fetch_context, phone_number, call_sid, trace)
+        with trace.span("emotion"):
+            emotions = self.detect_emotion_and_context(user_input)
+        try:
+            session, customer_profile = await asyncio.wait_for(context, self.pipeline.context_timeout)
+        except asyncio.TimeoutError:
+            registry.inc("turn_stage_timeouts_total")
+            print(f"Turn stage 'context' timed out after {self.pipeline.context_timeout}s")
+            session, customer_profile = {'messages': []}, None
+
+        messages, personalized = await loop.run_in_executor(
+            self.history_executor, self._build_messages,
+            user_input, current_time, emotions, session, customer_profile, trace
+        )
+        return current_time, emotions, messages, personalized
+
+    def _build_messages(self, user_input, current_time, emotions, session, customer_profile, trace=NULL_TRACE):
+        """(messages, personalized) for the LLM from the turn's context"""
+        with trace.span("prompt_build"):
+            self.refresh_document()
+
+            # Include the previous question so follow-ups ("how much is it?") retrieve the same sections
+            previous_input = next(
+                (m['content'] for m in reversed(session['messages']) if m['role'] == 'user'),
+                ''
+            )
+            customer_context = customer_profile.context if customer_profile else None
+            system_prompt = self.restaurant.prompt_builder.build(
+                current_time, emotions,
+                query=f"{previous_input} {user_input}",
+                customer_context=customer_context
+            )
 
             # Build conversation history
             messages = [{"role": "system", "content": system_prompt}]
-            messages.extend(self.conversation_memory[call_sid]['messages'])
+            messages.extend(self.conversation_window.history(session))
             messages.append({"role": "user", "content": user_input})
 
-            # Get response from OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                max_tokens=200,
-                temperature=0.7
-            )
+        return messages, bool(customer_context)
 
-            assistant_response = response.choices[0].message.content.strip()
+    def _record_turn(self, user_input, assistant_response, emotions, current_time, phone_number=None, call_sid=None,
+                     usage=None, trace=NULL_TRACE):
+        """
+        Store a completed turn in conversation memory and customer/call history.
+        usage is (prompt_tokens, completion_tokens) of the LLM request, or None
+        if the reply didn't come from the LLM. The history writes themselves
+        are timed as the trace's history_persist stage, after the webhook has
+        returned.
+        """
+        # Update conversation memory, keeping it within the token budget
+        session = self.conversation_memory.get(call_sid) or {'messages': []}
+        self.conversation_window.append(session, user_input, assistant_response)
+        if usage is not None:
+            self.conversation_window.record_usage(session, *usage)
+        self.conversation_memory.put(call_sid, session)
 
-            # Update conversation memory
-            self.conversation_memory[call_sid]['messages'].extend([
-                {"role": "user", "content": user_input},
-                {"role": "assistant", "content": assistant_response}
-            ])
-            self.conversation_memory[call_sid]['timestamp'] = current_time
+        # Customer and call history are written concurrently, after the reply has gone out
+        writes = []
 
-            # Keep only last 10 messages to maintain context without overflow
-            if len(self.conversation_memory[call_sid]['messages']) > 20:
-                self.conversation_memory[call_sid]['messages'] = self.conversation_memory[call_sid]['messages'][-20:]
+        # Update customer history
+        if phone_number:
+            conversation_data = {
+                "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "user_input": user_input,
+                "assistant_response": assistant_response,
+                "emotions_detected": emotions,
+                "call_sid": call_sid
+            }
+            writes.append((self.customer_history.update_customer_history, phone_number, conversation_data))
 
-            # Update customer history
-            if phone_number:
-                conversation_data = {
-                    "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+        # Update call history
+        if call_sid:
+            call_data = {
+                "call_sid": call_sid,
+                "phone_number": phone_number,
+                "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "emotions_detected": emotions,
+                "token_usage": dict(session.get('token_usage') or {}),
+                "conversation": {
                     "user_input": user_input,
-                    "assistant_response": assistant_response,
+                    "assistant_response": assistant_response
+                }
+            }
+            writes.append((self.call_history.update_call, call_data))
+
+        self.pipeline.in_background(*[(self._persist, trace, *write) for write in writes])
+
+    @staticmethod
+    def _persist(trace, fn, *args):
+        with trace.span("history_persist"):
+            fn(*args)
+
+    def _complete(self, messages):
+        return self.llm.complete(messages, max_tokens=200, temperature=0.7)
+
+    def _degraded(self, trace, error):
+        """Canned reply for when no model can answer"""
+        print(f"LLM unavailable, answering in degraded mode: {error}")
+        registry.inc("llm_degraded_replies_total")
+        trace.set("llm_degraded", True)
+        return DEGRADED_UTTERANCE
+
+    @staticmethod
+    def _error_reply(error):
+        # Still a reply, so the webhook can speak it rather than fail the call
+        return {"response": DEGRADED_UTTERANCE, "error": str(error), "has_more": False}
+
+    def _fallback(self, trace, user_input, emotions, messages, personalized, llm_start):
+        """Reply for an LLM call that missed its latency budget"""
+        registry.inc("turn_llm_fallbacks_total")
+        trace.set("llm_fallback", True)
+
+        def late_reply(done):
+            # The caller is asked to repeat themselves; cache the late answer so the repeat is instant
+            try:
+                response = done.result()
+                late_text = response.choices[0].message.content.strip()
+            except Exception as e:
+                print(f"Late LLM reply failed: {e}")
+                return
+            self._cache_store(user_input, emotions, messages, personalized, late_text,
+                              time.perf_counter() - llm_start)
+
+        return late_reply
+
+    @staticmethod
+    def _usage(response, messages, assistant_response):
+        """(prompt_tokens, completion_tokens) as reported by the API, else counted locally"""
+        usage = getattr(response, 'usage', None)
+        if usage is not None and getattr(usage, 'prompt_tokens', None) is not None:
+            return usage.prompt_tokens, usage.completion_tokens
+        return estimate_usage(messages, assistant_response)
+
+    def _document_version(self):
+        return self.restaurant.doc_reader.content_hash
+
+    def _cacheable(self, user_input, emotions, messages, personalized):
+        # The cache is shared by every caller, so replies written with one caller's profile in the prompt stay out
+        if self.response_cache is None or personalized:
+            return False
+        # messages is [system, *history, user], so a length of 2 means this is the first turn
+        return ResponseCache.is_cacheable(user_input, emotions, first_turn=len(messages) == 2)
+
+    def _cache_lookup(self, user_input, emotions, messages, personalized):
+        """Cached reply for a standalone FAQ-style question, or None"""
+        if not self._cacheable(user_input, emotions, messages, personalized):
+            return None
+        self.response_cache.check_version(self._document_version())
+        cached = self.response_cache.get(user_input)
+        return cached[0] if cached else None
+
+    def _cache_store(self, user_input, emotions, messages, personalized, assistant_response, llm_seconds):
+        if self._cacheable(user_input, emotions, messages, personalized):
+            self.response_cache.put(user_input, assistant_response, llm_seconds)
+            if TTS_PLAYBACK:
+                # FAQ answers get asked again; have the recording ready by then
+                get_voice_handler().synthesize_in_background(assistant_response)
+
+    def _route(self, user_input, call_sid=None, trace=NULL_TRACE):
+        """
+        (RoutedAnswer, emotions) if the intent router can answer without the
+        LLM, else None. Like the response cache, only the first turn of a call
+        is routed: later turns may answer or build on the conversation, which
+        a canned reply would ignore.
+        """
+        if not self.intent_routing:
+            return None
+        session = self.conversation_memory.get(call_sid) if call_sid else None
+        if session and session.get('messages'):
+            return None
+        with trace.span("intent_route"):
+            self.refresh_document()
+            emotions = self.detect_emotion_and_context(user_input)
+            routed = self.restaurant.intent_router.answer(user_input, emotions)
+        trace.set("intent", routed.intent if routed else None)
+        return (routed, emotions) if routed else None
+
+    def _routed_turn(self, routed, user_input, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        answer, emotions = routed
+        current_time = datetime.now(pytz.UTC)
+        with trace.span("history_write"):
+            self._record_turn(user_input, answer.text, emotions, current_time, phone_number, call_sid, trace=trace)
+        return {
+            "response": answer.text,
+            "intent": answer.intent,
+            "has_more": False,
+            "emotions_detected": emotions,
+            "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def answer_digits(self, digits, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        """Reply to a keypad shortcut, recorded as a turn; None for digits with no shortcut"""
+        self.refresh_document()
+        reply = self.restaurant.intent_router.answer_digits(digits)
+        if reply is None:
+            return None
+        trace.set("intent", f"dtmf {digits}")
+        with trace.span("history_write"):
+            self._record_turn(f"(pressed {digits})", reply, self.detect_emotion_and_context(""),
+                              datetime.now(pytz.UTC), phone_number, call_sid, trace=trace)
+        return reply
+
+    def get_response(self, user_input, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        try:
+            routed = self._route(user_input, call_sid, trace)
+            if routed is not None:
+                return self._routed_turn(routed, user_input, phone_number, call_sid, trace)
+
+            current_time, emotions, messages, personalized = self._prepare_turn(
+                user_input, phone_number, call_sid, trace
+            )
+
+            with trace.span("cache_lookup"):
+                assistant_response = self._cache_lookup(user_input, emotions, messages, personalized)
+            trace.set("cache_hit", assistant_response is not None)
+            usage = None
+            if assistant_response is None:
+                # Get response from OpenAI
+                llm_start = time.perf_counter()
+                with trace.span("llm"):
+                    llm_call = self.pipeline.start(self._complete, messages)
+                    try:
+                        response = self.pipeline.wait(llm_call, self.pipeline.llm_budget, "llm")
+                    except LLMUnavailable as e:
+                        response, assistant_response = None, self._degraded(trace, e)
+
+                if response is not None:
+                    trace.add_usage(getattr(response, 'usage', None))
+                    assistant_response = response.choices[0].message.content.strip()
+                    usage = self._usage(response, messages, assistant_response)
+                    self._cache_store(user_input, emotions, messages, personalized, assistant_response,
+                                      time.perf_counter() - llm_start)
+                elif assistant_response is None:
+                    llm_call.add_done_callback(self._fallback(trace, user_input, emotions, messages, personalized, llm_start))
+                    assistant_response = self.pipeline.fallback_text
+
+            with trace.span("history_write"):
+                self._record_turn(user_input, assistant_response, emotions, current_time, phone_number, call_sid, usage,
+                                  trace)
+
+            return {
+                "response": assistant_response,
+                "emotions_detected": emotions,
+                "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+
+        except Exception as e:
+            print(f"Error in get_response: {e}")
+            trace.set("error", str(e))
+            return self._error_reply(e)
+
+    async def get_response_async(self, user_input, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        """
+        Async variant of get_response for the ASGI app. The completion is
+        awaited on a shared pooled client, so one worker can hold many calls
+        in flight; routing (which may reload the menu document), memory and
+        history work run on history_executor. Turns of the same call are
+        serialized by a per-call lock, so one call's updates never race.
+        """
+        lock = self._call_locks.get(call_sid)
+        if lock is None:
+            lock = self._call_locks[call_sid] = asyncio.Lock()
+        async with lock:
+            return await self._get_response_async(user_input, phone_number, call_sid, trace)
+
+    async def _get_response_async(self, user_input, phone_number=None, call_sid=None, trace=NULL_TRACE):
+        try:
+            loop = asyncio.get_running_loop()
+            routed = await loop.run_in_executor(self.history_executor, self._route, user_input, call_sid, trace)
+            if routed is not None:
+                return await loop.run_in_executor(
+                    self.history_executor, self._routed_turn, routed, user_input, phone_number, call_sid, trace
+                )
+
+            current_time, emotions, messages, personalized = await self._prepare_turn_async(
+                user_input, phone_number, call_sid, trace
+            )
+
+            with trace.span("cache_lookup"):
+                assistant_response = self._cache_lookup(user_input, emotions, messages, personalized)
+            trace.set("cache_hit", assistant_response is not None)
+            usage = None
+            if assistant_response is None:
+                llm_start = time.perf_counter()
+                with trace.span("llm"):
+                    llm_call = asyncio.ensure_future(
+                        self.llm.complete_async(messages, max_tokens=200, temperature=0.7)
+                    )
+                    try:
+                        response = await asyncio.wait_for(asyncio.shield(llm_call), self.pipeline.llm_budget)
+                    except asyncio.TimeoutError:
+                        registry.inc("turn_stage_timeouts_total")
+                        response = None
+                    except LLMUnavailable as e:
+                        response, assistant_response = None, self._degraded(trace, e)
+
+                if response is not None:
+                    trace.add_usage(getattr(response, 'usage', None))
+                    assistant_response = response.choices[0].message.content.strip()
+                    usage = self._usage(response, messages, assistant_response)
+                    self._cache_store(user_input, emotions, messages, personalized, assistant_response,
+                                      time.perf_counter() - llm_start)
+                elif assistant_response is None:
+                    llm_call.add_done_callback(self._fallback(trace, user_input, emotions, messages, personalized, llm_start))
+                    assistant_response = self.pipeline.fallback_text
+
+            with trace.span("history_write"):
+                await loop.run_in_executor(
+                    self.history_executor, self._record_turn,
+                    user_input, assistant_response, emotions, current_time, phone_number, call_sid, usage, trace
+                )
+
+            return {
+                "response": assistant_response,
+                "emotions_detected": emotions,
+                "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+
+        except Exception as e:
+            print(f"Error in get_response_async: {e}")
+            trace.set("error", str(e))
+            return self._error_reply(e)
+
+    def get_response_streaming(self, user_input, phone_number=None, call_sid=None, first_sentence_timeout=None,
+                               trace=NULL_TRACE):
+        """
+        Stream the completion and return as soon as the first sentence is
+        complete. The rest of the reply keeps streaming in the background into
+        a PendingResponse that /continue-response picks up; the turn is
+        recorded in history once the stream finishes.
+
+        The first sentence gets the same LLM budget as get_response (never
+        more, whatever first_sentence_timeout asks for); past it the caller
+        hears the fallback utterance and the late reply only fills the cache.
+        """
+        pending = None
+        try:
+            start = time.perf_counter()
+            routed = self._route(user_input, call_sid, trace)
+            if routed is not None:
+                reply = self._routed_turn(routed, user_input, phone_number, call_sid, trace)
+                reply["time_to_first_audio"] = time.perf_counter() - start
+                registry.observe("time_to_first_audio_seconds", reply["time_to_first_audio"])
+                return reply
+
+            current_time, emotions, messages, personalized = self._prepare_turn(
+                user_input, phone_number, call_sid, trace
+            )
+
+            with trace.span("cache_lookup"):
+                cached_response = self._cache_lookup(user_input, emotions, messages, personalized)
+            trace.set("cache_hit", cached_response is not None)
+            if cached_response is not None:
+                with trace.span("history_write"):
+                    self._record_turn(user_input, cached_response, emotions, current_time, phone_number, call_sid,
+                                      trace=trace)
+                registry.observe("time_to_first_audio_seconds", time.perf_counter() - start)
+                return {
+                    "response": cached_response,
+                    "has_more": False,
+                    "time_to_first_audio": time.perf_counter() - start,
                     "emotions_detected": emotions,
-                    "call_sid": call_sid
+                    "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S")
                 }
-                self.customer_history.update_customer_history(phone_number, conversation_data)
-
-            # Update call history
-            if call_sid:
-                call_data = {
-                    "call_sid": call_sid,
-                    "phone_number": phone_number,
-                    "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+
+            def on_complete(full_text):
+                self._cache_store(user_input, emotions, messages, personalized, full_text, time.perf_counter() - start)
+                on_finished(full_text)
+
+            def on_finished(text):
+                if pending.abandoned:
+                    return
+                self._publish_remainder(call_sid, pending)
+                # Lands in the stage histogram even though the webhook has already returned
+                with trace.span("history_write"):
+                    self._record_turn(
+                        user_input, text, emotions, current_time, phone_number, call_sid,
+                        estimate_usage(messages, text), trace
+                    )
+
+            with trace.span("llm_first_sentence"):
+                stream = self.llm.stream(messages, max_tokens=200, temperature=0.7)
+
+                pending = PendingResponse()
+                self.pending_responses[call_sid] = pending
+                # A stream that fails after the first sentence still records what was said
+                pending.consume_in_background(stream, on_complete, on_error=on_finished)
+
+                budget = min(first_sentence_timeout or self.pipeline.llm_budget, self.pipeline.llm_budget)
+                got_first_sentence = pending.wait_first_sentence(budget)
+            if not got_first_sentence:
+                registry.inc("turn_stage_timeouts_total")
+                print(f"Turn stage 'llm_first_sentence' timed out after {budget}s")
+                self._drop_pending(call_sid, pending)
+                with trace.span("history_write"):
+                    self._record_turn(user_input, self.pipeline.fallback_text, emotions, current_time, phone_number,
+                                      call_sid, trace=trace)
+                registry.observe("time_to_first_audio_seconds", time.perf_counter() - start)
+                return {
+                    "response": self.pipeline.fallback_text,
+                    "has_more": False,
+                    "time_to_first_audio": time.perf_counter() - start,
                     "emotions_detected": emotions,
-                    "conversation": {
-                        "user_input": user_input,
-                        "assistant_response": assistant_response
-                    }
+                    "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S")
                 }
-                self.call_history.update_call(call_data)
+            if pending.first_sentence is None:
+                raise pending.error or RuntimeError("Response stream ended without a reply")
+
+            time_to_first_audio = time.perf_counter() - start
+            registry.observe("time_to_first_audio_seconds", time_to_first_audio)
+
+            has_more = not pending.finished_with_first_sentence()
+            if not has_more:
+                self.pending_responses.pop(call_sid, None)
+                self.conversation_memory.delete(self._pending_key(call_sid))
 
             return {
-                "response": assistant_response,
+                "response": pending.first_sentence,
+                "has_more": has_more,
+                "time_to_first_audio": time_to_first_audio,
                 "emotions_detected": emotions,
                 "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S")
             }
 
+        except LLMUnavailable as e:
+            if pending is not None:
+                self._drop_pending(call_sid, pending)
+            trace.set("error", str(e))
+            self._degraded(trace, e)
+            return self._error_reply(e)
         except Exception as e:
-            print(f"Error in get_response: {e}")
-            return {"error": str(e)}
+            if pending is not None:
+                self._drop_pending(call_sid, pending)
+            print(f"Error in get_response_streaming: {e}")
+            trace.set("error", str(e))
+            return self._error_reply(e)
 
+    @staticmethod
+    def _pending_key(call_sid):
+        return f"{call_sid}:pending"
 
-# Initialize manager
-conversation_manager = ConversationManager()
+    def _publish_remainder(self, call_sid, pending):
+        """Share the rest of a finished streamed reply with whichever worker gets /continue-response"""
+        self.conversation_memory.put(self._pending_key(call_sid), {"remainder": pending.remainder()})
+        if self.pending_responses.get(call_sid) is pending:
+            self.pending_responses.pop(call_sid, None)
 
-@app.route("/incoming-call", methods=['POST'])
-def incoming_call():
+    def _drop_pending(self, call_sid, pending):
+        """Forget a streamed reply the caller will never hear the rest of"""
+        pending.abandoned = True
+        if self.pending_responses.get(call_sid) is pending:
+            self.pending_responses.pop(call_sid, None)
+        self.conversation_memory.delete(self._pending_key(call_sid))
+
+    def take_pending_response(self, call_sid, timeout=15, poll_interval=0.1):
+        """Wait for the rest of a streamed reply; returns the remaining text or None"""
+        deadline = time.monotonic() + timeout
+        pending = self.pending_responses.get(call_sid)
+        if pending is not None:
+            pending.wait_done(timeout)
+        key = self._pending_key(call_sid)
+        while True:
+            published = self.conversation_memory.get(key)
+            if published is not None:
+                self.conversation_memory.delete(key)
+                return published["remainder"]
+            # Another worker may still be streaming it; only a shared store would show it finishing
+            if not self.conversation_memory.shared or time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+
+# Speak the first sentence of each reply while the rest is still being generated
+STREAMING_RESPONSES = os.getenv('STREAMING_RESPONSES', '0') == '1'
+
+def shutdown():
+    """Flush pending history writes; called from the gunicorn worker_exit hook"""
+    if _conversation_manager is not None:
+        # Let in-flight history writes reach the store before it is closed
+        _conversation_manager.pipeline.shutdown()
+        _conversation_manager.history_store.close()
+        _conversation_manager.customer_history.archive.close()
+    if _campaign_dispatcher is not None:
+        # Calls already handed to Twilio are recorded; queued ones wait for the next dispatcher
+        _campaign_dispatcher.stop()
+        _campaign_dispatcher.store.close()
+
+_analytics_refresh = None
+
+def refresh_analytics():
+    """
+    Start an incremental analytics export on a background thread, unless one
+    is already running in this process; the exporter's file lock keeps
+    other workers and the CLI from exporting at the same time
+    """
+    global _analytics_refresh
+    with _startup_lock:
+        if _analytics_refresh is not None and _analytics_refresh.is_alive():
+            return
+        _analytics_refresh = threading.Thread(target=_export_analytics, name="analytics-export", daemon=True)
+        _analytics_refresh.start()
+
+def _export_analytics():
+    try:
+        AnalyticsExporter(TRANSCRIPT_ARCHIVE_PATH, ANALYTICS_DIR).export(wait=False)
+    except Exception as e:
+        print(f"Error exporting analytics: {e}")
+
+@app.route("/analytics", methods=['GET'])
+def analytics_summary():
+    """
+    Call, emotion, booking and complaint aggregates over the columnar export
+    (see analytics.py), optionally for ?from=YYYY-MM-DD&to=YYYY-MM-DD.
+    ?refresh=1 starts exporting turns added since the last export in the
+    background; the report covers what has been exported so far.
+    """
+    start, end = request.args.get('from'), request.args.get('to')
+    for day in (start, end):
+        if day and not re.match(r"^\d{4}-\d{2}-\d{2}$", day):
+            return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    if request.args.get('refresh') == '1':
+        refresh_analytics()
+    return jsonify(analytics_report(ANALYTICS_DIR, start, end))
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    return Response(registry.render_prometheus(), mimetype='text/plain')
+
+GREETING_TEXT = "Hello! I'm James, your restaurant assistant. How may I help you today?"
+
+def speak(verb, text, voice="man", language="en-GB"):
+    """<Play> the cached recording of text if there is one, otherwise <Say> it"""
+    if TTS_PLAYBACK:
+        name = get_voice_handler().cached_name(text, language)
+        if name:
+            verb.play(f"{TTS_BASE_URL}/tts/{name}")
+            return
+    verb.say(text, voice=voice, language=language)
+
+@app.route("/tts/<name>", methods=['GET'])
+def tts_audio(name):
+    """Cached TTS audio for <Play>; content-addressed, so it never changes"""
+    audio = get_voice_handler().cache.get(name)
+    if audio is None:
+        return Response("Not found", status=404, mimetype='text/plain')
+    return Response(
+        iter_chunks(audio),
+        mimetype=MIMETYPES.get(name.rsplit('.', 1)[-1], 'application/octet-stream'),
+        headers={
+            "Content-Length": str(len(audio)),
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": name
+        }
+    )
+
+def greeting_twiml():
     response = VoiceResponse()
     gather = Gather(
         input='speech dtmf',
@@ -523,18 +1242,37 @@ def incoming_call():
     )
     
     # Warm, friendly greeting
-    gather.say(
-        "Hello! I'm James, your restaurant assistant. How may I help you today?",
-        voice="Polly.Brian",
-        language="en-GB"
-    )
+    speak(gather, GREETING_TEXT, voice="Polly.Brian")
     
     response.append(gather)
     return str(response)
 
+@app.route("/incoming-call", methods=['POST'])
+def incoming_call():
+    return greeting_twiml()
+
 
 
 
+def reply_gather(text=None):
+    """Gather for the caller's next utterance, optionally speaking text first"""
+    gather = Gather(
+        input='speech dtmf',
+        action='/handle-input',
+        method='POST',
+        language='en-GB',
+        speechTimeout='auto',
+        enhanced=True
+    )
+    if text:
+        speak(gather, text)
+    return gather
+
+REPROMPT_TEXT = "I didn't quite catch that. Could you please repeat what you said?"
+
+# Spoken on every call or whenever something goes wrong; synthesized before the first call
+STATIC_PROMPTS = (GREETING_TEXT, REPROMPT_TEXT, FALLBACK_UTTERANCE, DEGRADED_UTTERANCE)
+
 @app.route("/handle-input", methods=['POST'])
 def handle_input():
     response = VoiceResponse()
@@ -542,71 +1280,170 @@ def handle_input():
     phone_number = request.form.get('From', '')
     call_sid = request.form.get('CallSid', '')
     user_speech = request.form.get('SpeechResult', '')
+    # Keypad shortcuts; the Gather takes 'speech dtmf'
+    digits = request.form.get('Digits', '')
 
-    if user_speech:
-        chat_response = conversation_manager.get_response(
-            user_speech,
-            phone_number=phone_number,
-            call_sid=call_sid
-        )
-        
-        gather = Gather(
-            input='speech dtmf',
-            action='/handle-input',
-            method='POST',
-            language='en-GB',
-            speechTimeout='auto',
-            enhanced=True
-        )
-        
-        gather.say(
-            chat_response['response'],
-            voice="man",
-            language="en-GB"
-        )
-        
-        response.append(gather)
-    else:
-        gather = Gather(
-            input='speech dtmf',
-            action='/handle-input',
-            method='POST',
-            language='en-GB',
-            speechTimeout='auto',
-            enhanced=True
-        )
-        
-        gather.say(
-            "I didn't quite catch that. Could you please repeat what you said?",
-            voice="man",
-            language="en-GB"
-        )
-        
-        response.append(gather)
+    # One trace per turn, keyed by the CallSid so every turn of a call can be correlated
+    trace = tracer.start(call_sid)
+    try:
+        if user_speech:
+            if STREAMING_RESPONSES:
+                chat_response = get_conversation_manager().get_response_streaming(
+                    user_speech,
+                    phone_number=phone_number,
+                    call_sid=call_sid,
+                    trace=trace
+                )
+                if chat_response.get('has_more'):
+                    # Speak the first sentence now and fetch the rest while it plays
+                    with trace.span("twiml_render"):
+                        speak(response, chat_response['response'])
+                        response.redirect('/continue-response', method='POST')
+                        return str(response)
+            else:
+                chat_response = get_conversation_manager().get_response(
+                    user_speech,
+                    phone_number=phone_number,
+                    call_sid=call_sid,
+                    trace=trace
+                )
+
+            with trace.span("twiml_render"):
+                response.append(reply_gather(chat_response['response']))
+                return str(response)
+
+        if digits:
+            reply = get_conversation_manager().answer_digits(digits, phone_number, call_sid, trace)
+            with trace.span("twiml_render"):
+                response.append(reply_gather(reply or REPROMPT_TEXT))
+                return str(response)
+
+        with trace.span("twiml_render"):
+            response.append(reply_gather(REPROMPT_TEXT))
+            return str(response)
+    finally:
+        trace.finish()
+
+@app.route("/continue-response", methods=['POST'])
+def continue_response():
+    response = VoiceResponse()
+    call_sid = request.form.get('CallSid', '')
+
+    remainder = get_conversation_manager().take_pending_response(call_sid)
+    response.append(reply_gather(remainder))
 
     return str(response)
 
+def require_api_token(view):
+    """Refuse the request unless it carries CAMPAIGN_API_TOKEN; outbound calling is off while it isn't set"""
+    @wraps(view)
+    def checked(*args, **kwargs):
+        if not CAMPAIGN_API_TOKEN:
+            return jsonify({"error": "CAMPAIGN_API_TOKEN is not set"}), 503
+        token = request.headers.get('X-API-Token', '')
+        authorization = request.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+        if not hmac.compare_digest(token.strip().encode(), CAMPAIGN_API_TOKEN.encode()):
+            return jsonify({"error": "Invalid or missing API token"}), 401
+        return view(*args, **kwargs)
+    return checked
+
 @app.route('/make-call', methods=['POST'])
+@require_api_token
 def make_call():
+    """
+    Call one number. The call is queued as a one-number campaign, so it
+    goes through the dispatcher's shared call-rate bucket like any other,
+    but is placed even if the number was called recently. Answers 202 with
+    the campaign_id at once; GET /campaigns/<campaign_id>?jobs=placed has
+    the call_sid once the call is placed.
+    """
     try:
         data = request.json
         if not data or 'phone_number' not in data:
             return jsonify({"error": "Phone number is required"}), 400
+        phone_number = normalize_number(data['phone_number'])
+        if phone_number is None:
+            return jsonify({"error": "Invalid phone number"}), 400
 
-        call = twilio_client.calls.create(
-            to=data['phone_number'],
-            from_=TWILIO_PHONE_NUMBER,
-            url=request.url_root + 'incoming-call'
-        )
-        
-        return jsonify({
-            "status": "success",
-            "call_sid": call.sid
-        })
+        dispatcher = get_campaign_dispatcher()
+        campaign_id, _ = dispatcher.store.create([phone_number], name=f"call {phone_number}",
+                                                 url=request.url_root + 'incoming-call', dedupe=False)
+        dispatcher.wake()
+        return jsonify({"status": "queued", "campaign_id": campaign_id}), 202
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/campaigns', methods=['POST'])
+@require_api_token
+def create_campaign():
+    """
+    Queue calls to many numbers: JSON {"numbers": [...], "name", "message"},
+    or a form upload with a "numbers" file (one per line, or CSV). With a
+    message, callees hear it before the usual conversation starts.
+    """
+    if request.is_json:
+        data = request.json
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        numbers = data.get('numbers') or []
+        if not isinstance(numbers, list):
+            return jsonify({"error": "numbers must be a list"}), 400
+    else:
+        data = request.form
+        upload = request.files.get('numbers')
+        numbers = list(parse_numbers(upload.read().decode('utf-8', errors='replace'))) if upload else []
+    if not numbers:
+        return jsonify({"error": "numbers is required"}), 400
+
+    message = data.get('message')
+    url = request.url_root + ('campaign-call/{campaign_id}' if message else 'incoming-call')
+    dispatcher = get_campaign_dispatcher()
+    campaign_id, counts = dispatcher.store.create(numbers, name=data.get('name'), url=url, message=message)
+    dispatcher.wake()
+    return jsonify({"campaign_id": campaign_id, **counts}), 201
+
+@app.route('/campaigns', methods=['GET'])
+@require_api_token
+def list_campaigns():
+    return jsonify(get_campaign_dispatcher().store.campaigns())
+
+@app.route('/campaigns/<campaign_id>', methods=['GET'])
+@require_api_token
+def campaign_progress(campaign_id):
+    """Progress counts and throughput; ?jobs=failed (or any status) lists those numbers too"""
+    store = get_campaign_dispatcher().store
+    progress = store.progress(campaign_id)
+    if progress is None:
+        return jsonify({"error": "Campaign not found"}), 404
+    if request.args.get('jobs'):
+        progress['jobs'] = store.jobs(campaign_id, request.args['jobs'])
+    return jsonify(progress)
+
+@app.route('/campaigns/<campaign_id>/<action>', methods=['POST'])
+@require_api_token
+def campaign_action(campaign_id, action):
+    states = {"pause": "paused", "resume": "running", "cancel": "cancelled"}
+    if action not in states:
+        return jsonify({"error": f"Unknown action {action}"}), 404
+    dispatcher = get_campaign_dispatcher()
+    if not dispatcher.store.set_status(campaign_id, states[action]):
+        return jsonify({"error": "No active campaign with that id"}), 404
+    dispatcher.wake()
+    return jsonify(dispatcher.store.progress(campaign_id))
+
+@app.route('/campaign-call/<campaign_id>', methods=['POST'])
+def campaign_call(campaign_id):
+    """TwiML for an answered campaign call: the campaign's message, then the usual conversation"""
+    campaign = get_campaign_dispatcher().store.campaign(campaign_id)
+    if campaign is None or not campaign['message']:
+        return greeting_twiml()
+    response = VoiceResponse()
+    response.append(reply_gather(campaign['message']))
+    return str(response)
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8080))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,153 @@
+"""
+ASGI entry point. /incoming-call and /handle-input are served natively on
+the event loop via ConversationManager.get_response_async, so a single
+worker can keep many calls in flight while OpenAI is generating. Every
+other route (and /handle-input when STREAMING_RESPONSES is on) is passed
+through to the Flask app on a thread.
+
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+import asyncio
+import io
+import sys
+from urllib.parse import parse_qs
+
+import app as flask_module
+from app import get_conversation_manager, greeting_twiml, reply_gather, REPROMPT_TEXT
+from twilio.twiml.voice_response import VoiceResponse
+from tracing import tracer
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def send_response(send, status, body, headers):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_twiml(send, twiml):
+    await send_response(send, 200, twiml.encode("utf-8"), [("Content-Type", "text/xml; charset=utf-8")])
+
+
+def parse_form(body):
+    return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+async def handle_input(form):
+    response = VoiceResponse()
+    user_speech = form.get('SpeechResult', '')
+    call_sid = form.get('CallSid', '')
+
+    trace = tracer.start(call_sid)
+    try:
+        if user_speech:
+            chat_response = await get_conversation_manager().get_response_async(
+                user_speech,
+                phone_number=form.get('From', ''),
+                call_sid=call_sid,
+                trace=trace
+            )
+            text = chat_response['response']
+        elif form.get('Digits'):
+            manager = get_conversation_manager()
+            text = await asyncio.get_running_loop().run_in_executor(
+                manager.history_executor, manager.answer_digits,
+                form['Digits'], form.get('From', ''), call_sid, trace
+            ) or REPROMPT_TEXT
+        else:
+            text = REPROMPT_TEXT
+
+        with trace.span("twiml_render"):
+            response.append(reply_gather(text))
+            return str(response)
+    finally:
+        trace.finish()
+
+
+def call_wsgi(scope, body):
+    """Run one request through the Flask WSGI app and collect the response"""
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            environ[f"HTTP_{name}"] = value
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    chunks = flask_module.app.wsgi_app(environ, start_response)
+    try:
+        response_body = b"".join(chunks)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return started["status"], started["headers"], response_body
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Open this worker's history and session stores before the first call arrives
+            await asyncio.get_running_loop().run_in_executor(None, flask_module.get_conversation_manager)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.get_running_loop().run_in_executor(None, flask_module.shutdown)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = await read_body(receive)
+    method, path = scope["method"], scope["path"]
+
+    if method == "POST" and path == "/incoming-call":
+        await send_twiml(send, greeting_twiml())
+    elif method == "POST" and path == "/handle-input" and not flask_module.STREAMING_RESPONSES:
+        await send_twiml(send, await handle_input(parse_form(body)))
+    else:
+        status, headers, response_body = await asyncio.get_running_loop().run_in_executor(
+            None, call_wsgi, scope, body
+        )
+        await send_response(send, status, response_body, headers)
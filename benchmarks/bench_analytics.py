@@ -0,0 +1,196 @@
+"""
+Benchmark: reporting over a synthetic multi-million-turn transcript
+archive. Compares the old way, loading every turn's JSON and walking the
+dicts, with the columnar export (one-off and incremental) and a report
+over the exported columns. The two reports must agree; a mismatch exits
+with 1.
+
+Calls follow a lunch and dinner peak; some callers book, most bookings are
+confirmed, a few complain, and emotions show up on a share of turns.
+
+    python benchmarks/bench_analytics.py --turns 2000000 --days 30
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import analytics  # noqa: E402
+from analytics import AnalyticsExporter, report  # noqa: E402
+from customer_profile import TranscriptArchive  # noqa: E402
+
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 2, 3, 4, 6, 10, 9, 5, 3, 4, 7, 10, 9, 6, 3, 1, 0]
+QUESTIONS = ["What time do you open on Saturday?", "How much is the Wiener Schnitzel?",
+             "Do you have vegetarian options?", "Can I bring my dog?", "Where are you located?"]
+BOOKING = "I'd like to book a table for four on Friday at seven"
+CONFIRMED = "Lovely, I've booked a table for four on Friday at seven. See you then!"
+COMPLAINT = "I want to make a complaint, my food was cold last night"
+NEUTRAL = {"angry": 0, "frustrated": 0, "urgent": 0, "positive": 0, "confused": 0,
+           "is_shouting": False, "has_interruption": False}
+
+
+def generate(path, turns, days, seed, start_day="2026-09-01"):
+    """Write about `turns` archive turns over `days` days; returns the number written"""
+    rng = random.Random(seed)
+    archive = TranscriptArchive(path)
+    start = time.mktime(time.strptime(start_day, "%Y-%m-%d")) - time.timezone
+    written = 0
+    # Turns generated per caller, to give every call a distinct CallSid
+    turn_counts = {}
+    callers = max(1, turns // 20)
+    while written < turns:
+        phone = f"+4477009{rng.randrange(callers):05d}"
+        key = hashlib.md5(phone.encode()).hexdigest()
+        batch = []
+        seq = turn_counts.get(key, 0)
+        for _ in range(rng.randint(1, 3)):
+            when = start + rng.randrange(days) * 86400 + rng.choices(range(24), HOUR_WEIGHTS)[0] * 3600 \
+                + rng.randrange(3600)
+            call_sid = "CA" + hashlib.md5(f"{key}{seq}{seed}".encode()).hexdigest()
+            booking, complaint = rng.random() < 0.3, rng.random() < 0.05
+            for turn_index in range(rng.randint(2, 6)):
+                emotions = dict(NEUTRAL)
+                if complaint:
+                    emotions["angry"] = rng.randint(0, 2)
+                    emotions["frustrated"] = rng.randint(0, 1)
+                elif rng.random() < 0.08:
+                    emotions[rng.choice(("positive", "confused", "urgent"))] = 1
+                emotions["is_shouting"] = complaint and rng.random() < 0.2
+                if turn_index == 0 and booking:
+                    user, reply = BOOKING, CONFIRMED if rng.random() < 0.7 else "Sorry, we're fully booked then."
+                elif turn_index == 0 and complaint:
+                    user, reply = COMPLAINT, "I'm so sorry to hear that. Let me help."
+                else:
+                    user, reply = rng.choice(QUESTIONS), "Certainly, here's what I can tell you."
+                batch.append({
+                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(when + turn_index * 40)),
+                    "user_input": user,
+                    "assistant_response": reply,
+                    "emotions_detected": emotions,
+                    "call_sid": call_sid,
+                })
+                seq += 1
+        turn_counts[key] = seq
+        archive.append_many(key, batch)
+        written += len(batch)
+    archive.close()
+    return written
+
+
+def legacy_report(path):
+    """The same aggregates by loading every turn and walking the dicts"""
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT customer_key, seq, turn FROM transcripts ORDER BY customer_key, seq").fetchall()
+    conn.close()
+    calls, last_call = 0, {}
+    per_hour, per_day = [0] * 24, {}
+    requested, confirmed, complained = set(), set(), set()
+    emotion_calls = {emotion: set() for emotion in (*analytics.EMOTIONS, "shouting")}
+    for key, _, payload in rows:
+        turn = json.loads(payload)
+        call_sid = turn["call_sid"]
+        if last_call.get(key) != call_sid:
+            calls += 1
+            per_hour[int(turn["timestamp"][11:13])] += 1
+            day = turn["timestamp"][:10]
+            per_day[day] = per_day.get(day, 0) + 1
+        last_call[key] = call_sid
+        words = set(analytics.WORD_RE.findall(turn["user_input"].lower()))
+        if words & analytics.BOOKING_WORDS:
+            requested.add(call_sid)
+        if analytics.BOOKING_CONFIRMED_RE.search(turn["assistant_response"]):
+            confirmed.add(call_sid)
+        if words & analytics.COMPLAINT_WORDS:
+            complained.add(call_sid)
+        for emotion, value in turn["emotions_detected"].items():
+            emotion = "shouting" if emotion == "is_shouting" else emotion
+            if value and emotion in emotion_calls:
+                emotion_calls[emotion].add(call_sid)
+    return {
+        "turns": len(rows),
+        "calls": calls,
+        "calls_per_hour": per_hour,
+        "calls_per_day": dict(sorted(per_day.items())),
+        "booked": len(requested & confirmed),
+        "requested": len(requested),
+        "complained": len(complained),
+        "emotion_calls": {emotion: len(sids) for emotion, sids in emotion_calls.items()},
+    }
+
+
+def comparable(columnar):
+    return {
+        "turns": columnar["turns"],
+        "calls": columnar["calls"],
+        "calls_per_hour": columnar["calls_per_hour"],
+        "calls_per_day": columnar["calls_per_day"],
+        "booked": columnar["bookings"]["confirmed_calls"],
+        "requested": columnar["bookings"]["requested_calls"],
+        "complained": columnar["complaints"]["calls"],
+        "emotion_calls": {emotion: counts["calls"] for emotion, counts in columnar["emotions"].items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar analytics benchmark")
+    parser.add_argument("--turns", type=int, default=2000000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"aggregation: {'numpy' if analytics.np is not None else 'stdlib arrays'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, "transcripts.db")
+        out_dir = os.path.join(tmp, "analytics")
+        start = time.perf_counter()
+        written = generate(archive_path, args.turns, args.days, args.seed)
+        print(f"{written} turns over {args.days} days generated in {time.perf_counter() - start:.1f}s, "
+              f"archive {os.path.getsize(archive_path) / 1e6:.0f}MB")
+
+        start = time.perf_counter()
+        legacy = legacy_report(archive_path)
+        legacy_seconds = time.perf_counter() - start
+        print(f"  load and walk every turn     {legacy_seconds:7.2f}s per report")
+
+        start = time.perf_counter()
+        AnalyticsExporter(archive_path, out_dir).export()
+        export_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(out_dir) for name in names)
+        print(f"  full export                  {export_seconds:7.2f}s once, {size / 1e6:.0f}MB of columns")
+
+        result = report(out_dir)
+        print(f"  columnar report, all days    {result['query_seconds']:7.2f}s per report")
+        week = sorted(result["calls_per_day"])[-7:]
+        print(f"  columnar report, last 7 days {report(out_dir, week[0], week[-1])['query_seconds']:7.2f}s")
+
+        # A day of new calls, then an incremental export
+        added = generate(archive_path, max(1, args.turns // args.days), 1, args.seed + 1,
+                         start_day=time.strftime("%Y-%m-%d", time.gmtime(time.mktime(time.strptime(
+                             week[-1], "%Y-%m-%d")) - time.timezone + 86400)))
+        start = time.perf_counter()
+        exported = AnalyticsExporter(archive_path, out_dir).export()
+        print(f"  incremental export           {time.perf_counter() - start:7.2f}s for {exported} new turns")
+
+        result = report(out_dir)
+        legacy = legacy_report(archive_path)
+        print(f"  {result['calls']} calls, {result['turns_per_call']} turns per call, booking conversion "
+              f"{result['bookings']['conversion']}, complaint rate {result['complaints']['rate']}, angry calls "
+              f"{result['emotions']['angry']['call_rate']}")
+        if exported != added or comparable(result) != legacy:
+            print(f"FAIL: columnar report disagrees with the dict walk ({exported} of {added} new turns exported)")
+            for key, value in legacy.items():
+                if comparable(result)[key] != value:
+                    print(f"  {key}: {comparable(result)[key]} != {value}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: placing a campaign of outbound calls against the stub Twilio
+API (tools/fake_twilio_server.py), with request latency and injected
+failures. Compares the old /make-call approach, one blocking request per
+call on a fresh client, with the CampaignDispatcher at several worker
+counts under the shared rate limit.
+
+Checks that every valid number was called exactly once, that failed
+requests were retried, and that no one-second window went over the rate
+limit plus the burst; a violation exits with 1.
+
+    python benchmarks/bench_campaigns.py --numbers 200 --rate 20
+"""
+import argparse
+import bisect
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from campaigns import CampaignDispatcher, CampaignStore, TwilioDialer  # noqa: E402
+from fake_twilio_server import serve_in_thread  # noqa: E402
+
+ACCOUNT_SID = "AC" + "0" * 32
+FROM_NUMBER = "+441130000000"
+
+
+def numbers(count, seed):
+    """count distinct UK mobile numbers in mixed formats, plus 5% repeats and a few invalid entries"""
+    rng = random.Random(seed)
+    unique = [f"07700 9{index:05d}" for index in range(count)]
+    listed = unique + [rng.choice(unique).replace(" ", "") for _ in range(count // 20)] + ["n/a", "12345"]
+    rng.shuffle(listed)
+    return listed, count
+
+
+def busiest_second(calls):
+    times = sorted(arrived for arrived, _, _ in calls)
+    return max((bisect.bisect_left(times, start + 1.0) - index for index, start in enumerate(times)), default=0)
+
+
+def sequential(server, count):
+    # As /make-call did: a new client, and so a new connection, for every call
+    from twilio.rest import Client
+    start = time.perf_counter()
+    for index in range(count):
+        client = Client(ACCOUNT_SID, "test")
+        client.api.base_url = server.base_url
+        client.calls.create(to=f"+4477009{index:05d}", from_=FROM_NUMBER, url="http://localhost/incoming-call")
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbound campaign dispatch benchmark")
+    parser.add_argument("--numbers", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20.0, help="Calls per second allowed")
+    parser.add_argument("--burst", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.25, help="Stub Twilio request latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--workers", default="4,16")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    listed, distinct = numbers(args.numbers, args.seed)
+    print(f"{len(listed)} listed numbers, {distinct} distinct and valid; stub latency {args.latency * 1000:.0f}ms, "
+          f"{args.error_rate:.0%} errors; limit {args.rate:g}/s, burst {args.burst:g}")
+
+    server = serve_in_thread(latency=args.latency, seed=args.seed)
+    print(f"  sequential /make-call     {sequential(server, min(30, distinct)):6.1f} calls/s (first 30 calls)")
+    server.shutdown()
+
+    ok = True
+    for workers in (int(count) for count in args.workers.split(",")):
+        server = serve_in_thread(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CampaignStore(os.path.join(tmp, "campaigns.db"), calls_per_second=args.rate, burst=args.burst)
+            campaign_id, counts = store.create(listed, name="bench", url="http://localhost/incoming-call")
+            dispatcher = CampaignDispatcher(
+                store, TwilioDialer(ACCOUNT_SID, "test", FROM_NUMBER, base_url=server.base_url),
+                workers=workers, backoff_base=0.5
+            )
+            start = time.perf_counter()
+            dispatcher.run_until_idle()
+            elapsed = time.perf_counter() - start
+            dispatcher.stop()
+            progress = store.progress(campaign_id)
+            store.close()
+        server.shutdown()
+
+        per_number = Counter(to for _, to, _ in server.calls)
+        repeats = sum(calls - 1 for calls in per_number.values())
+        peak = busiest_second(server.calls)
+        print(f"  dispatcher x{workers:<3d}          {progress['placed'] / elapsed:6.1f} calls/s  "
+              f"{progress['placed']}/{distinct} placed  {progress['failed']} failed  {progress['retries']} retries  "
+              f"peak {peak}/s  {server.max_in_flight} in flight  {repeats} repeats")
+        if counts["duplicate"] + counts["invalid"] != len(listed) - distinct:
+            print(f"FAIL: dedupe counted {counts}")
+            ok = False
+        if repeats or len(per_number) != progress["placed"]:
+            print(f"FAIL: {repeats} numbers called more than once")
+            ok = False
+        if peak > args.rate + args.burst:
+            print(f"FAIL: {peak} calls in one second, over the {args.rate:g}/s limit")
+            ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: history tokens sent per request over a long call, with the old
+fixed 20-message truncation versus the token-budgeted ConversationWindow
+(running summary of older turns). Some turns are long rambles, as happens
+with speech recognition on a noisy line.
+
+    python benchmarks/bench_conversation_window.py --turns 60
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_window import ConversationWindow  # noqa: E402
+from prompt_builder import count_tokens  # noqa: E402
+
+SHORT_TURNS = [
+    "Do you have a table for four on Friday?",
+    "How much is the Wiener Schnitzel?",
+    "Is the beer garden open in the evening?",
+    "Can I change that to half past seven?",
+]
+LONG_TURN = (
+    "So the thing is we're coming up from Sheffield with my parents and my sister's kids and one of them "
+    "has a nut allergy and the other one only eats plain pasta and my dad can't really do stairs so I "
+    "wanted to check about the seating and whether there's a lift and also what time the kitchen closes "
+)
+REPLY = (
+    "Of course! We can seat your party on the ground floor near the entrance, and our chefs can prepare "
+    "a nut-free meal. The kitchen closes at ten. Would you like me to note all of that on the booking?"
+)
+
+
+def legacy_history(session, user_input, assistant_response):
+    session['messages'].extend([
+        {"role": "user", "content": user_input},
+        {"role": "assistant", "content": assistant_response}
+    ])
+    if len(session['messages']) > 20:
+        session['messages'] = session['messages'][-20:]
+
+
+def run(turns, seed):
+    rng = random.Random(seed)
+    script = [LONG_TURN * rng.randint(1, 4) if rng.random() < 0.2 else rng.choice(SHORT_TURNS) for _ in range(turns)]
+
+    legacy_session = {'messages': []}
+    legacy_tokens = []
+    for user_input in script:
+        legacy_tokens.append(sum(count_tokens(m['content']) for m in legacy_session['messages']))
+        legacy_history(legacy_session, user_input, REPLY)
+
+    window = ConversationWindow()
+    session = {'messages': []}
+    window_tokens, seconds = [], []
+    for user_input in script:
+        start = time.perf_counter()
+        history = window.history(session)
+        window.append(session, user_input, REPLY)
+        seconds.append(time.perf_counter() - start)
+        window_tokens.append(sum(count_tokens(m['content']) for m in history))
+    return legacy_tokens, window_tokens, seconds, session
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversation window token benchmark")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    legacy, budgeted, seconds, session = run(args.turns, args.seed)
+    print(f"{args.turns}-turn call, window budget {ConversationWindow().max_tokens} tokens")
+    for label, tokens in (("20-message cap", legacy), ("token window", budgeted)):
+        print(f"  {label:15s} history tokens/request: median {statistics.median(tokens):6.0f}  "
+              f"p95 {sorted(tokens)[int(0.95 * (len(tokens) - 1))]:6.0f}  max {max(tokens):6d}  "
+              f"stdev {statistics.pstdev(tokens):6.0f}  total {sum(tokens):7d}")
+    print(f"  window bookkeeping {statistics.fmean(seconds) * 1e6:.1f} us/turn, "
+          f"{session.get('summarized_turns', 0)} exchanges summarized, {len(session['summary'])} summary lines kept")
+
+
+if __name__ == "__main__":
+    main()
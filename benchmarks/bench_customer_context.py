@@ -0,0 +1,93 @@
+"""
+Benchmark: personalizing the prompt with the precomputed caller context
+versus serializing the raw customer history into it.
+
+Builds synthetic regulars with growing histories, then checks that every
+context snippet fits the token budget (exit 1 if not) and compares prompt
+tokens and per-turn prompt construction time for no context, the snippet,
+and the raw history.
+
+    python benchmarks/bench_customer_context.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from customer_profile import CONTEXT_TOKEN_BUDGET, CustomerProfile  # noqa: E402
+from prompt_builder import PromptBuilder, count_tokens, restaurant_lines_from_info  # noqa: E402
+from retrieval import RetrievalIndex, chunk_sections  # noqa: E402
+
+QUESTIONS = [
+    "Do you have a table for four on Friday at seven?",
+    "I'm vegetarian, what can I eat?",
+    "How much is the Wiener Schnitzel?",
+    "Is there parking near you?",
+    "I want to complain, my booking was cancelled!",
+    "Can I bring my dog to the beer garden?",
+]
+
+
+def synthetic_customer(turns, seed):
+    rng = random.Random(seed)
+    legacy = {"phone": f"+44{seed:010d}", "conversations": [], "bookings": [], "complaints": []}
+    profile = CustomerProfile(phone=legacy["phone"])
+    for turn in range(turns):
+        data = {
+            "timestamp": f"2026-01-{1 + turn // 50:02d} 19:00:00",
+            "user_input": rng.choice(QUESTIONS),
+            "assistant_response": "Of course! Let me help you with that. " * 3,
+            "emotions_detected": {"angry": rng.random() < 0.05, "positive": rng.random() < 0.3},
+            "call_sid": f"CA{seed}-{turn // 5}",
+        }
+        if turn % 25 == 0:
+            data["booking"] = {"date": "2026-02-14", "time": "19:30", "party_size": 4}
+        if turn % 40 == 0:
+            data["preferences"] = {"seating_preference": "beer garden", "dietary_restrictions": ["vegetarian"]}
+        legacy["conversations"].append(data)
+        if "booking" in data:
+            legacy["bookings"].append(data["booking"])
+        profile.record_turn(data, turn_number=turn)
+    return profile, legacy
+
+
+def per_call_us(fn, iterations=2000):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    lines = restaurant_lines_from_info(None)
+    builder = PromptBuilder(None, RetrievalIndex(chunk_sections(lines)), top_k=4)
+    query = "How much is the schnitzel?"
+    baseline = count_tokens(builder.build(query=query))
+
+    print(f"context budget {CONTEXT_TOKEN_BUDGET} tokens, prompt without caller context {baseline} tokens")
+    print(f"{'turns':>6} {'snippet tok':>11} {'raw tok':>9} {'build none':>11} {'build snippet':>14} {'build raw':>10} {'update':>9}")
+    over_budget = 0
+    for turns in (10, 100, 1000):
+        profile, legacy = synthetic_customer(turns, seed=turns)
+        snippet_tokens = count_tokens(profile.context)
+        over_budget += snippet_tokens > CONTEXT_TOKEN_BUDGET
+        raw_tokens = count_tokens(json.dumps(legacy))
+
+        none_us = per_call_us(lambda: builder.build(query=query))
+        snippet_us = per_call_us(lambda: builder.build(query=query, customer_context=profile.context))
+        raw_us = per_call_us(lambda: builder.build(query=query, customer_context=json.dumps(legacy)), 200)
+        update_us = per_call_us(profile.refresh_context, 500)
+        print(f"{turns:6d} {snippet_tokens:11d} {raw_tokens:9d} {none_us:9.1f}us {snippet_us:12.1f}us "
+              f"{raw_us:8.1f}us {update_us:7.1f}us")
+
+    if over_budget:
+        print(f"FAIL: {over_budget} context snippet(s) over the {CONTEXT_TOKEN_BUDGET} token budget")
+        sys.exit(1)
+    print("all context snippets within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: restaurant document parse time and worker startup time, with
+the parse cache cold (every start parses the docx with python-docx, as
+before) and warm (start loads the cached JSON and skips python-docx).
+
+    python benchmarks/bench_doc_startup.py [path/to/restaurant_info.docx]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DOC = os.path.join(REPO_DIR, "data", "example_data.docx")
+
+STARTUP_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import app
+app.warmup()
+print(time.perf_counter() - start, 'docx' in sys.modules)
+"""
+
+
+def time_startup(env, runs):
+    timings, imported_docx = [], False
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SNIPPET], cwd=REPO_DIR, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[-2]))
+        imported_docx = imported_docx or output[-1] == "True"
+    return statistics.median(timings), imported_docx
+
+
+def main(runs=5):
+    doc_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DOC
+    sys.path.insert(0, REPO_DIR)
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "doc_cache")
+        env = dict(
+            os.environ,
+            RESTAURANT_DOC_PATH=doc_path,
+            DOC_CACHE_DIR=cache_dir,
+            HISTORY_STORE_PATH=os.path.join(tmp, "history.db"),
+        )
+        os.environ.update(env)
+
+        from app import DocumentReader
+
+        cold, warm = [], []
+        for _ in range(runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            start = time.perf_counter()
+            DocumentReader(doc_path, cache_dir=cache_dir)
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            DocumentReader(doc_path, cache_dir=cache_dir)
+            warm.append(time.perf_counter() - start)
+        print(f"document load: parse with python-docx {statistics.median(cold) * 1000:7.1f} ms, "
+              f"from parse cache {statistics.median(warm) * 1000:6.2f} ms")
+
+        cold_startups = []
+        for _ in range(runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            seconds, cold_docx = time_startup(env, 1)
+            cold_startups.append(seconds)
+        warm_startup, warm_docx = time_startup(env, runs)
+        print(f"import app:    cold cache {statistics.median(cold_startups) * 1000:7.1f} ms (python-docx imported: {cold_docx}), "
+              f"warm cache {warm_startup * 1000:7.1f} ms (python-docx imported: {warm_docx})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: emotion detection over a corpus of call-sized utterances.
+
+"before" is the per-keyword substring scan that used to live in
+ConversationManager.detect_emotion_and_context; "after" is the compiled
+EmotionDetector, per utterance and through the batch transcript API.
+
+    python benchmarks/bench_emotion.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion import EMOTION_INDICATORS, detector  # noqa: E402
+
+FILLER = (
+    "hello I was wondering if you could tell me about the table for four on friday evening and "
+    "whether the schnitzel comes with potatoes we might also bring a tissue for the kids as they "
+    "have a cold and my wife would like to know about the dress code and parking near the restaurant"
+).split()
+KEYWORDS = [word for words in EMOTION_INDICATORS.values() for word in words]
+
+
+def legacy_detect(text):
+    emotion_indicators = {
+        'angry': ['angry', 'furious', 'upset', 'horrible', 'terrible', 'stupid', 'useless'],
+        'frustrated': ['annoying', 'frustrating', 'difficult', 'problem', 'issue'],
+        'urgent': ['immediately', 'urgent', 'asap', 'emergency', 'right now'],
+        'positive': ['happy', 'great', 'wonderful', 'excellent', 'perfect', 'thanks'],
+        'confused': ['confused', 'unsure', 'don\'t understand', 'what do you mean']
+    }
+
+    text_lower = text.lower()
+    emotions = {
+        emotion: any(word in text_lower for word in words)
+        for emotion, words in emotion_indicators.items()
+    }
+
+    emotions['is_shouting'] = text.isupper() or text.count('!') > 1
+    emotions['has_interruption'] = '...' in text or '?' in text
+
+    return emotions
+
+
+def make_corpus(transcripts=2000, turns=8, seed=7):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(transcripts):
+        transcript = []
+        for _ in range(turns):
+            words = rng.choices(FILLER, k=rng.randint(8, 40))
+            if rng.random() < 0.4:
+                words.insert(rng.randrange(len(words)), rng.choice(KEYWORDS))
+            transcript.append(" ".join(words) + rng.choice([".", "?", "!"]))
+        corpus.append(transcript)
+    return corpus
+
+
+def main():
+    corpus = make_corpus()
+    utterances = [text for transcript in corpus for text in transcript]
+    print(f"{len(corpus)} transcripts, {len(utterances)} utterances, "
+          f"{sum(len(text) for text in utterances) / len(utterances):.0f} chars/utterance")
+
+    for name, detect in (("before", legacy_detect), ("after", detector.score)):
+        start = time.perf_counter()
+        for text in utterances:
+            detect(text)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>6}: {elapsed / len(utterances) * 1e6:6.2f} us/utterance")
+
+    start = time.perf_counter()
+    for transcript in corpus:
+        detector.score_transcript(transcript)
+    elapsed = time.perf_counter() - start
+    print(f" batch: {elapsed / len(utterances) * 1e6:6.2f} us/utterance via score_transcript")
+
+    tissue = sum(1 for text in utterances if "tissue" in text and legacy_detect(text)["frustrated"])
+    fixed = sum(1 for text in utterances if "tissue" in text and legacy_detect(text)["frustrated"]
+                and not detector.score(text)["frustrated"])
+    print(f"false 'issue' matches inside 'tissue': before {tissue}, after {tissue - fixed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark: how many caller questions the intent router answers without the
+LLM, and how often it is wrong, on a labeled set of questions about the
+sample restaurant document. Each question is labeled with the intent that
+should answer it and a fragment the answer must contain, or with None when
+it must be left to the LLM (bookings, complaints, advice, follow-ups,
+questions sharing only a generic word such as "where" or "pay" with an
+intent, anything the document can't answer).
+
+Reports per-intent precision and recall, the share of turns that skip the
+LLM, and routing latency. Exits with 1 if precision falls below --min-precision.
+
+    python benchmarks/bench_intent_router.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from intent_router import IntentRouter, RestaurantIndex  # noqa: E402
+from prompt_builder import restaurant_lines_from_info  # noqa: E402
+
+LABELED = [
+    ("How much is the Wiener Schnitzel?", "price", "£12.99"),
+    ("how much is the schnitzel", "price", "£13.99"),
+    ("What's the price of the apfelstrudel", "price", "£4.99"),
+    ("how much does the strudel cost", "price", None),
+    ("How much is a pint of Paulaner", "price", "£3.99"),
+    ("what do the pretzels cost", "price", "£3.99"),
+    ("how much is the black forest cake", "price", "£5.49"),
+    ("price of the kaiserschmarrn please", "price", "£"),
+    ("How much is the Jägerschnitzel", "price", "£13.99"),
+    ("how much for the cheese noodles", "price", "£6.49"),
+    ("What is the Kasseler Rippchen?", "describe", "£"),
+    ("tell me about the obatzda", "describe", "cheese"),
+    ("what does the sauerbraten come with", "describe", "£"),
+    ("What desserts do you have?", "menu", "Apfelstrudel"),
+    ("what beers do you have", "menu", "Krombacher"),
+    ("what starters do you have", "menu", "Obatzda"),
+    ("what main courses do you serve", "menu", "Wiener Schnitzel"),
+    ("what drinks do you have on the menu", "menu", "Weissbier"),
+    ("What's your cancellation policy?", "cancellation", "24-hour"),
+    ("Is there a cancellation fee", "cancellation", "£10"),
+    ("what happens if I cancel late", "cancellation", "24"),
+    ("what do you charge for a no show", "cancellation", "£15"),
+    ("Do I need to book in advance?", "reservations", "48 hours"),
+    ("do you take walk ins", "reservations", "book"),
+    ("How far ahead do we need to book for a large group", "reservations", "48 hours"),
+    ("Is there a dress code?", "dress_code", "Casual"),
+    ("what should I wear", "dress_code", "attire"),
+    ("can I come in lederhosen", "dress_code", "lederhosen"),
+    ("Do you take cards?", "payment", "credit cards"),
+    ("can I pay with american express", "payment", "American Express"),
+    ("do you accept cash", "payment", "cash"),
+    ("is contactless ok", "payment", "Contactless"),
+    ("Can I bring my dog?", "pets", "pets"),
+    ("are dogs allowed", "pets", "leash"),
+    ("are pets welcome", "pets", "beer garden"),
+    ("Do you have high chairs?", "children", "high chairs"),
+    ("is it ok to bring the kids", "children", "kid-friendly"),
+    ("do children eat free", "children", "under the age of 5"),
+    ("Is the restaurant wheelchair accessible?", "accessibility", "wheelchair"),
+    ("do you have disabled toilets", "accessibility", "accessible"),
+    ("Where are you located?", "address", "22 Beer Street"),
+    ("what's your address", "address", "LS1 1AA"),
+    ("where are you", "address", "Leeds"),
+    ("What's your phone number?", "phone", "+44 113"),
+    ("what number can I ring you on", "phone", "234 5678"),
+    ("what's your email address", "email", "info@"),
+    # Left to the LLM
+    ("I'd like to book a table for four tomorrow at seven", None, None),
+    ("Can I book a table for tonight", None, None),
+    ("I need to cancel my booking for Friday", None, None),
+    ("can I change my reservation to 8pm", None, None),
+    ("I want to make a complaint about my meal", None, None),
+    ("the food was cold and the waiter was rude", None, None),
+    ("can I speak to the manager", None, None),
+    ("what would you recommend", None, None),
+    ("what's your most popular dish", None, None),
+    ("do you have vegetarian options", None, None),
+    ("I'm allergic to nuts, is the strudel safe", None, None),
+    ("is the schnitzel gluten free", None, None),
+    ("how much is that one", None, None),
+    ("and what does that come with", None, None),
+    ("what about those", None, None),
+    ("What time do you open?", None, None),
+    ("are you open on Sunday", None, None),
+    ("Hello", None, None),
+    ("thank you, that's all", None, None),
+    ("yes please", None, None),
+    ("what's the weather like in Leeds", None, None),
+    ("do you have parking nearby", None, None),
+    ("who is playing on Friday", None, None),
+    # Off-intent questions sharing one generic word with an intent
+    ("Where is my order?", None, None),
+    ("Where can I park my car?", None, None),
+    ("where do I leave my coat", None, None),
+    ("I want to pay", None, None),
+    ("can I pay the deposit now", None, None),
+    ("my card was charged twice", None, None),
+    ("Can I cancel?", None, None),
+    ("the concert got cancelled so we might come later", None, None),
+    ("can you tell me a bit about the history of the restaurant and why it was opened and who runs it "
+     "these days and whether they are German", None, None),
+]
+EMOTIONAL = [
+    ("HOW MUCH IS THE SCHNITZEL", {"is_shouting": True}),
+    ("what is your cancellation policy, I'm furious", {"angry": True}),
+    ("I need your address now, it's urgent", {"urgent": True}),
+]
+
+
+def evaluate(router):
+    per_intent = {}
+    wrong = []
+    for question, expected, fragment in LABELED:
+        routed = router.answer(question)
+        got = routed.intent if routed else None
+        correct = got == expected and (routed is None or fragment is None or fragment in routed.text)
+        for intent in {expected, got} - {None}:
+            per_intent.setdefault(intent, {"tp": 0, "fp": 0, "fn": 0})
+        if got is not None:
+            per_intent[got]["tp" if correct else "fp"] += 1
+        if expected is not None and not correct:
+            per_intent[expected]["fn"] += 1
+        if not correct:
+            wrong.append((question, expected, routed))
+    for question, emotions in EMOTIONAL:
+        routed = router.answer(question, emotions)
+        if routed is not None:
+            wrong.append((question, None, routed))
+            per_intent.setdefault(routed.intent, {"tp": 0, "fp": 0, "fn": 0})["fp"] += 1
+    return per_intent, wrong
+
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent router accuracy and latency benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the question set for timing")
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    router = IntentRouter(RestaurantIndex.from_lines(restaurant_lines_from_info(None)))
+    build = time.perf_counter() - start
+    per_intent, wrong = evaluate(router)
+
+    print(f"{len(LABELED) + len(EMOTIONAL)} questions, "
+          f"{sum(1 for _, expected, _ in LABELED if expected)} answerable; router built in {build * 1000:.1f}ms")
+    print(f"  {'intent':14s} {'precision':>9s} {'recall':>7s} {'answered':>9s}")
+    for intent, counts in sorted(per_intent.items()):
+        print(f"  {intent:14s} {ratio(counts['tp'], counts['tp'] + counts['fp']):9.2f} "
+              f"{ratio(counts['tp'], counts['tp'] + counts['fn']):7.2f} {counts['tp'] + counts['fp']:9d}")
+    tp = sum(counts["tp"] for counts in per_intent.values())
+    fp = sum(counts["fp"] for counts in per_intent.values())
+    fn = sum(counts["fn"] for counts in per_intent.values())
+    precision = ratio(tp, tp + fp)
+    print(f"  {'overall':14s} {precision:9.2f} {ratio(tp, tp + fn):7.2f} {tp + fp:9d}")
+    print(f"  LLM calls avoided: {tp + fp} of {len(LABELED) + len(EMOTIONAL)} turns "
+          f"({(tp + fp) / (len(LABELED) + len(EMOTIONAL)):.0%})")
+    for question, expected, routed in wrong:
+        got = f"{routed.intent}: {routed.text[:60]}" if routed else "LLM"
+        print(f"  miss: {question!r} expected {expected or 'LLM'}, got {got}")
+
+    seconds = []
+    for _ in range(args.repeat):
+        for question, _, _ in LABELED:
+            begin = time.perf_counter()
+            router.answer(question)
+            seconds.append(time.perf_counter() - begin)
+    seconds.sort()
+    print(f"  routing: mean {statistics.fmean(seconds) * 1e6:.0f}us  p50 {seconds[len(seconds) // 2] * 1e6:.0f}us  "
+          f"p99 {seconds[int(len(seconds) * 0.99)] * 1e6:.0f}us per turn")
+
+    if precision < args.min_precision:
+        print(f"FAIL: precision {precision:.2f} below {args.min_precision:.2f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
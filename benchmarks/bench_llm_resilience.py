@@ -0,0 +1,133 @@
+"""
+Benchmark: LLM call latency and failures with injected faults, calling the
+primary model directly (one request with a deadline, as before) versus
+through ResilientLLM (hedging to a faster fallback model, circuit breakers).
+
+Two scenarios against the in-process stub client:
+
+  tail    a share of requests stall or fail; reports p50/p95/p99 and how
+          many calls got no reply at all
+  outage  every request fails after error_latency; reports how long calls
+          take once the breakers have opened and the reply is canned
+
+    python benchmarks/bench_llm_resilience.py
+    python benchmarks/bench_llm_resilience.py --requests 1000 --slow-rate 0.1
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from llm_client import LLMUnavailable, ResilientLLM  # noqa: E402
+from metrics import registry  # noqa: E402
+from stub_openai import StubOpenAI  # noqa: E402
+
+MESSAGES = [
+    {"role": "system", "content": "You are James, the assistant of The Bavarian Bierhaus."},
+    {"role": "user", "content": "How much is the Wiener Schnitzel?"},
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def direct_call(stub, args):
+    return stub.chat.completions.create(model="gpt-4", messages=MESSAGES, max_tokens=200, timeout=args.deadline)
+
+
+def run(call, requests, concurrency):
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(requests)))
+    return [seconds for seconds, _ in results], sum(not ok for _, ok in results)
+
+
+def report(label, seconds, failed, extra=""):
+    print(f"  {label:10s} p50 {percentile(seconds, 50) * 1000:7.0f}ms  p95 {percentile(seconds, 95) * 1000:7.0f}ms  "
+          f"p99 {percentile(seconds, 99) * 1000:7.0f}ms  max {max(seconds) * 1000:7.0f}ms  "
+          f"no reply {failed:4d}/{len(seconds)}{extra}")
+
+
+def make_stub(args, **overrides):
+    options = dict(
+        latency=args.latency, model_latency={"gpt-3.5-turbo": args.fallback_latency}, error_rate=args.error_rate,
+        error_latency=args.error_latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=args.seed
+    )
+    options.update(overrides)
+    return StubOpenAI(**options)
+
+
+def make_llm(args, stub):
+    llm = ResilientLLM(deadline=args.deadline, hedge_after=args.hedge_after, max_workers=2 * args.concurrency,
+                       failure_threshold=args.breaker_failures, reset_timeout=args.breaker_cooldown)
+    llm.client = stub
+    return llm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM resilience benchmark")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="Primary model latency (s)")
+    parser.add_argument("--fallback-latency", type=float, default=0.1, help="Fallback model latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--error-latency", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=2.0)
+    parser.add_argument("--hedge-after", type=float, default=0.5)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-cooldown", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"tail: {args.requests} requests x{args.concurrency}, primary {args.latency}s, fallback "
+          f"{args.fallback_latency}s, {args.slow_rate:.0%} stall {args.slow_latency}s, {args.error_rate:.0%} fail, "
+          f"deadline {args.deadline}s, hedge after {args.hedge_after}s")
+    stub = make_stub(args)
+    report("direct", *run(lambda: direct_call(stub, args), args.requests, args.concurrency))
+
+    stub = make_stub(args)
+    llm = make_llm(args, stub)
+    hedged, failovers = registry.counter("llm_hedged_requests_total"), registry.counter("llm_failovers_total")
+    seconds, failed = run(lambda: llm.complete(MESSAGES, max_tokens=200), args.requests, args.concurrency)
+    report("resilient", seconds, failed,
+           f"  hedged {registry.counter('llm_hedged_requests_total') - hedged}, "
+           f"failed over {registry.counter('llm_failovers_total') - failovers}, "
+           f"{stub.request_count - args.requests} extra requests")
+
+    outage_latency = max(args.error_latency, 0.5)
+    print(f"outage: every request fails after {outage_latency}s")
+    stub = make_stub(args, error_rate=1.0, error_latency=outage_latency)
+    report("direct", *run(lambda: direct_call(stub, args), args.requests // 4, args.concurrency))
+
+    stub = make_stub(args, error_rate=1.0, error_latency=outage_latency)
+    llm = make_llm(args, stub)
+    seconds, failed = run(lambda: llm.complete(MESSAGES, max_tokens=200), args.requests // 4, args.concurrency)
+    states = ", ".join(f"{name} {breaker.state}" for name, breaker in llm.breakers.items())
+    report("resilient", seconds, failed, f"  {stub.request_count} requests sent, breakers: {states}")
+
+    try:
+        llm.complete(MESSAGES)
+    except LLMUnavailable as e:
+        print(f"  degraded mode: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Microbenchmark: system prompt assembly cost and size per turn.
+
+"before" reproduces the old inline f-string from ConversationManager.get_response,
+"after" uses PromptBuilder. Run from the repository root:
+
+    python benchmarks/bench_prompt.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import PromptBuilder, SAMPLE_RESTAURANT_DATA, count_tokens  # noqa: E402
+
+EMOTIONS = {'angry': True, 'urgent': False, 'is_shouting': False}
+
+
+def legacy_build(current_time, emotions):
+    my_sample_data = "\n\n" + SAMPLE_RESTAURANT_DATA + "\n\n\n\n            "
+    system_prompt = f"""
+                        You are James, a knowledgeable restaurant assistant for our establishment.
+                        Current time: {current_time.strftime('%Y-%m-%d %H:%M:%S')} UTC
+
+                        Restaurant Information:
+                        {my_sample_data}
+
+                        Key Guidelines:
+                        1. Speak naturally and warmly like a real person
+                        2. Never direct customers to check websites or other sources
+                        3. Only provide information that exists in the restaurant data
+                        4. If information isn't in the reference data, politely say you'll check with the team
+                        5. Don't repeat phrases unless specifically asked
+                        6. Maintain conversation context and reference previous discussion points
+                        7. Be direct and helpful - avoid unnecessarily repeating "How may I assist you"
+                        8. Use the full conversation history to provide context-aware responses
+                        """
+    if emotions['angry'] or emotions['is_shouting']:
+        system_prompt += "\nThe customer seems upset or frustrated. Maintain extra patience and empathy."
+    if emotions['urgent']:
+        system_prompt += "\nThe customer has an urgent request. Prioritize efficiency while maintaining friendliness."
+    return system_prompt
+
+
+def shared_prefix_length(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+def main(number=20000):
+    builder = PromptBuilder({})
+    now = datetime.now(pytz.UTC)
+    later = now.replace(second=(now.second + 1) % 60)
+
+    for name, build in (("before", legacy_build), ("after", builder.build)):
+        seconds = timeit.timeit(lambda: build(now, EMOTIONS), number=number)
+        prompt = build(now, EMOTIONS)
+        stable = shared_prefix_length(prompt, build(later, EMOTIONS))
+        print(
+            f"{name:>6}: {seconds / number * 1e6:7.2f} us/build  "
+            f"{len(prompt):5d} chars  {count_tokens(prompt):5d} tokens  "
+            f"{stable / len(prompt):6.1%} byte-identical prefix across turns"
+        )
+
+
+if __name__ == "__main__":
+    main()
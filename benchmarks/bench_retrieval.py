@@ -0,0 +1,93 @@
+"""
+Benchmark: prompt tokens and end-to-end turn latency with and without
+document retrieval, over a fixed set of caller questions.
+
+By default the LLM is simulated with a latency model of
+  base_ms + per_token_ms * prompt_tokens
+so the benchmark runs offline. Pass --live to call OpenAI instead
+(requires OPENAI_API_KEY). Run from the repository root:
+
+    python benchmarks/bench_retrieval.py [--live]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import PromptBuilder, restaurant_lines_from_info, count_tokens  # noqa: E402
+from retrieval import load_or_build_index  # noqa: E402
+
+QUESTIONS = [
+    "What are your opening hours?",
+    "How much is the Wiener Schnitzel?",
+    "Can I bring my dog?",
+    "What's the cancellation fee?",
+    "Do you have a dress code?",
+    "Where are you located?",
+    "Which beers do you have on tap?",
+    "Can I pay by card?",
+    "Is the restaurant wheelchair accessible?",
+    "Do kids eat free?",
+    "I'd like to book a table for ten people on Saturday",
+    "What desserts do you have?",
+]
+
+SIMULATED_BASE_MS = 350
+SIMULATED_PER_TOKEN_MS = 0.12
+
+
+def simulated_llm(messages):
+    prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+    time.sleep((SIMULATED_BASE_MS + SIMULATED_PER_TOKEN_MS * prompt_tokens) / 1000)
+
+
+def live_llm(messages):
+    from openai import OpenAI
+    client = live_llm.client = getattr(live_llm, "client", None) or OpenAI()
+    client.chat.completions.create(model="gpt-4", messages=messages, max_tokens=200, temperature=0.7)
+
+
+def run(builder, llm, use_query):
+    tokens, latencies, build_us = [], [], []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        system_prompt = builder.build(query=question if use_query else None)
+        build_us.append((time.perf_counter() - start) * 1e6)
+        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": question}]
+        tokens.append(sum(count_tokens(message["content"]) for message in messages))
+        llm(messages)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return tokens, latencies, build_us
+
+
+def main():
+    llm = live_llm if "--live" in sys.argv else simulated_llm
+    lines = restaurant_lines_from_info({})
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = load_or_build_index(lines, os.path.join(tmp, "index.json"))
+        cold_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        load_or_build_index(lines, os.path.join(tmp, "index.json"))
+        warm_ms = (time.perf_counter() - start) * 1000
+    print(f"index: {len(index.chunks)} sections, build {cold_ms:.2f} ms, load from disk {warm_ms:.2f} ms")
+
+    variants = (
+        ("full document", PromptBuilder({}), False),
+        ("top-4 retrieval", PromptBuilder({}, index, top_k=4), True),
+        ("top-2 retrieval", PromptBuilder({}, index, top_k=2), True),
+    )
+    for name, builder, use_query in variants:
+        tokens, latencies, build_us = run(builder, llm, use_query)
+        print(
+            f"{name:>16}: prompt tokens mean {statistics.mean(tokens):6.0f} max {max(tokens):5d}  "
+            f"turn latency mean {statistics.mean(latencies):7.1f} ms  "
+            f"prompt build {statistics.mean(build_us):6.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: worker startup cost. Reports the slowest imports of `app` from
+`python -X importtime`, then spawns gunicorn with the repo config
+(preload_app + warmup in the master) and with an empty config (every
+worker imports and loads everything itself), and times how long it takes
+until the first /incoming-call and /handle-input requests are answered.
+
+    python benchmarks/bench_startup.py --workers 4 --runs 3
+"""
+import argparse
+import http.client
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+from fake_openai_server import serve_in_thread  # noqa: E402
+from load_test import free_port  # noqa: E402
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def slowest_imports(env, top=10):
+    """Top-level and direct imports of app by cumulative microseconds"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # Depth 0 is a top-level import, depth 1 is imported directly by one
+        if match and len(match.group(3)) <= 3:
+            rows.append((int(match.group(2)), match.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def post(port, path, form, timeout=30):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("POST", path, body=urlencode(form),
+                     headers={"Content-Type": "application/x-www-form-urlencoded"})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def time_to_first_request(config, env, workers, timeout=60):
+    """Seconds from spawning gunicorn until the first greeting and the first answered turn"""
+    port = free_port()
+    command = ["gunicorn", "app:app", "-c", config, "--workers", str(workers), "--bind", f"127.0.0.1:{port}"]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        while True:
+            try:
+                if post(port, "/incoming-call", {"CallSid": "CAstartup", "From": "+440000000000"}) == 200:
+                    break
+            except OSError:
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"gunicorn did not answer within {timeout}s")
+            time.sleep(0.01)
+        first_greeting = time.perf_counter() - start
+        form = {"CallSid": "CAstartup", "From": "+440000000000", "SpeechResult": "When do you open?"}
+        post(port, "/handle-input", form)
+        return first_greeting, time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker startup benchmark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    fake_llm = serve_in_thread(first_token_latency=0.0, token_delay=0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=fake_llm.base_url,
+            HISTORY_STORE_PATH=os.path.join(tmp, "history.db"),
+            SESSION_STORE_PATH=os.path.join(tmp, "sessions.db"),
+        )
+
+        print("slowest imports of app (cumulative):")
+        for micros, module in slowest_imports(env):
+            print(f"  {micros / 1000:8.1f} ms  {module}")
+
+        empty_config = os.path.join(tmp, "empty.conf.py")
+        open(empty_config, "w").close()
+        configs = [
+            ("no preload", empty_config),
+            ("preload + warmup", os.path.join(REPO_DIR, "gunicorn.conf.py")),
+        ]
+        print(f"\ntime to first request, gunicorn --workers {args.workers} (median of {args.runs}):")
+        try:
+            for label, config in configs:
+                timings = [time_to_first_request(config, env, args.workers) for _ in range(args.runs)]
+                greeting = statistics.median(t[0] for t in timings)
+                turn = statistics.median(t[1] for t in timings)
+                print(f"  {label:18s} first greeting {greeting * 1000:7.0f} ms, first answered turn {turn * 1000:7.0f} ms")
+        finally:
+            fake_llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: transcription throughput (audio seconds per wall second) for a
+backlog of call recordings. Compares the old approach, one recognition
+request per whole file including its silences, with the chunked
+STTPipeline at several worker counts, against the stub recognizer.
+
+The synthetic recordings are 8 kHz 16-bit mono, like Twilio's: bursts of
+"speech" (a loud noisy tone) separated by pauses on a hissy line. The VAD
+should find exactly one segment per burst; a mismatch exits with 1.
+
+    python benchmarks/bench_stt.py --recordings 10 --seconds 30
+"""
+import argparse
+import array
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import wave
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from stt_pipeline import STTPipeline, wav_frames  # noqa: E402
+from stub_stt import StubRecognizer  # noqa: E402
+
+SAMPLE_RATE = 8000
+
+
+def block(seconds, amplitude, noise, rng, tone_hz=220):
+    samples = array.array("h", (
+        int(amplitude * math.sin(2 * math.pi * tone_hz * i / SAMPLE_RATE) + rng.uniform(-noise, noise))
+        for i in range(int(SAMPLE_RATE * seconds))
+    ))
+    return samples.tobytes()
+
+
+def write_recording(path, seconds, rng, speech, hiss):
+    """A recording alternating 1-4 s speech bursts and 0.6-2 s pauses; returns the number of bursts"""
+    bursts, written = 0, 0.0
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        while written < seconds:
+            pause = rng.uniform(0.6, 2.0)
+            out.writeframes(hiss[:int(pause * SAMPLE_RATE) * 2])
+            talk = rng.uniform(1.0, 4.0)
+            out.writeframes(speech[:int(talk * SAMPLE_RATE) * 2])
+            written += pause + talk
+            bursts += 1
+        out.writeframes(hiss[:SAMPLE_RATE * 2])
+    return bursts
+
+
+def whole_file(recognizer, paths):
+    # As VoiceHandler used to: read everything, one blocking request per file
+    for path in paths:
+        audio = b"".join(frame for _, _, frame in wav_frames(path))
+        recognizer.recognize(audio, SAMPLE_RATE, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STT pipeline throughput benchmark")
+    parser.add_argument("--recordings", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of each recording")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub recognizer latency per request (s)")
+    parser.add_argument("--realtime-factor", type=float, default=0.05,
+                        help="Stub recognizer time per second of audio")
+    parser.add_argument("--workers", default="1,4,16")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    speech = block(4.0, 6000, 1500, rng)
+    hiss = block(2.0, 0, 150, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, bursts = [], 0
+        for index in range(args.recordings):
+            path = os.path.join(tmp, f"call-{index:04d}.wav")
+            bursts += write_recording(path, args.seconds, rng, speech, hiss)
+            paths.append(path)
+        audio_seconds = sum(os.path.getsize(path) - 44 for path in paths) / (SAMPLE_RATE * 2)
+        print(f"{args.recordings} recordings, {audio_seconds:.0f}s of audio, {bursts} utterances; recognizer "
+              f"{args.latency * 1000:.0f}ms + {args.realtime_factor:.2f}s per audio second")
+
+        start = time.perf_counter()
+        pipeline = STTPipeline(StubRecognizer(), workers=1)
+        segments = sum(len(transcript.segments) for _, transcript in pipeline.transcribe_batch(paths))
+        vad_seconds = time.perf_counter() - start
+        print(f"  framing + VAD only: {audio_seconds / vad_seconds:8.0f}x real time, {segments} segments found")
+
+        recognizer = StubRecognizer(args.latency, args.realtime_factor)
+        start = time.perf_counter()
+        whole_file(recognizer, paths)
+        elapsed = time.perf_counter() - start
+        print(f"  whole file         {audio_seconds / elapsed:8.1f}x real time  {recognizer.request_count:5d} requests  "
+              f"{recognizer.audio_seconds:7.0f}s sent")
+
+        for workers in (int(count) for count in args.workers.split(",")):
+            recognizer = StubRecognizer(args.latency, args.realtime_factor)
+            pipeline = STTPipeline(recognizer, workers=workers)
+            start = time.perf_counter()
+            for _ in pipeline.transcribe_batch(paths):
+                pass
+            elapsed = time.perf_counter() - start
+            pipeline.shutdown()
+            print(f"  pipeline x{workers:<3d}      {audio_seconds / elapsed:8.1f}x real time  "
+                  f"{recognizer.request_count:5d} requests  {recognizer.audio_seconds:7.0f}s sent")
+
+    if segments != bursts:
+        print(f"FAIL: VAD found {segments} segments for {bursts} utterances")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
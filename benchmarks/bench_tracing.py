@@ -0,0 +1,80 @@
+"""
+Benchmark: per-turn cost of the tracing instrumentation. Times the span
+bookkeeping of one turn (start, seven spans, token usage, finish) with
+tracing disabled and enabled, then a whole get_response turn against a stub
+OpenAI client under each setting. Turns slow down as call history grows,
+so the two settings are measured in alternating rounds.
+
+    python benchmarks/bench_tracing.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracing import Tracer  # noqa: E402
+
+STAGES = ("history_lookup", "emotion", "prompt_build", "cache_lookup", "llm", "history_write", "twiml_render")
+USAGE = types.SimpleNamespace(prompt_tokens=420, completion_tokens=35)
+
+
+def instrumented_turn(tracer):
+    trace = tracer.start("CAbench")
+    for stage in STAGES:
+        with trace.span(stage):
+            pass
+    trace.set("cache_hit", False)
+    trace.add_usage(USAGE)
+    trace.finish()
+
+
+class StubCompletions:
+    def create(self, **kwargs):
+        message = types.SimpleNamespace(content="We open at noon every day.")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=USAGE)
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations=100000, turns=2000, rounds=10):
+    for label, tracer in (("disabled", Tracer(enabled=False)), ("enabled", Tracer(enabled=True))):
+        print(f"span bookkeeping, tracing {label:8s} {per_call_us(lambda: instrumented_turn(tracer), iterations):6.2f} us/turn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        os.environ["HISTORY_STORE_PATH"] = os.path.join(tmp, "history.db")
+        os.environ["RESPONSE_CACHE"] = "0"
+        import app
+
+        manager = app.get_conversation_manager()
+        manager.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=StubCompletions()))
+        counter = iter(range(10 ** 9))
+
+        def turn(tracer):
+            trace = tracer.start("CAbench")
+            caller = next(counter) % 500
+            manager.get_response("What time do you open?", f"+44{caller:010d}", f"CA{caller}", trace=trace)
+            trace.finish()
+
+        tracers = (("disabled", Tracer(enabled=False)), ("enabled", Tracer(enabled=True)))
+        results = {label: [] for label, _ in tracers}
+        for _ in range(rounds):
+            for label, tracer in tracers:
+                results[label].append(per_call_us(lambda: turn(tracer), turns // rounds))
+        for label, timings in results.items():
+            print(f"get_response turn, tracing {label:8s} {statistics.median(timings):8.1f} us/turn")
+        manager.pipeline.flush()
+        manager.history_store.close()
+
+
+if __name__ == "__main__":
+    main()
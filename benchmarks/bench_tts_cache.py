@@ -0,0 +1,114 @@
+"""
+Benchmark: text-to-speech over a day of calls with and without the TTS
+cache, against the stub backend (latency modelled on a remote service).
+
+Each call hears the greeting, a few replies (some of them FAQ answers that
+recur across calls, the rest unique) and sometimes the reprompt. Reports
+backend requests and per-utterance latency with no cache, a cold cache and
+a fresh process on a warm disk cache, then time to first audio for a
+multi-sentence reply synthesized whole versus sentence by sentence.
+
+    python benchmarks/bench_tts_cache.py --calls 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from stub_tts import StubTTS  # noqa: E402
+from tts_cache import TTSCache  # noqa: E402
+from voice_handler import VoiceHandler  # noqa: E402
+
+GREETING = "Hello! I'm James, your restaurant assistant. How may I help you today?"
+REPROMPT = "I didn't quite catch that. Could you please repeat what you said?"
+FAQ_ANSWERS = [
+    "We're open from noon until eleven every day, and the kitchen closes at ten.",
+    "The Wiener Schnitzel is £12.99 and comes with mashed potatoes and cranberry sauce.",
+    "Yes, dogs are welcome in the beer garden, and we keep water bowls by the door.",
+    "There's a public car park two minutes away on Station Road.",
+    "We have several vegetarian dishes, including the Käsespätzle and a mushroom goulash.",
+]
+LONG_REPLY = (
+    "Of course, I can help with that booking. We have a table for four at half past seven on Friday. "
+    "It's by the window, near the beer garden. Would you like me to put it under your name?"
+)
+
+
+def script(calls, seed):
+    rng = random.Random(seed)
+    utterances = []
+    for call in range(calls):
+        utterances.append(GREETING)
+        for turn in range(rng.randint(2, 5)):
+            if rng.random() < 0.1:
+                utterances.append(REPROMPT)
+            elif rng.random() < 0.5:
+                utterances.append(rng.choice(FAQ_ANSWERS))
+            else:
+                utterances.append(f"Certainly, I've noted that for call {call}, turn {turn}.")
+    return utterances
+
+
+def run(handler, utterances, use_cache=True):
+    seconds = []
+    for text in utterances:
+        start = time.perf_counter()
+        if use_cache:
+            handler.synthesize(text)
+        else:
+            handler.tts.synthesize(text, handler.voice, handler.language)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def report(label, seconds, backend):
+    print(f"  {label:22s} backend requests {backend.request_count:5d}  mean {statistics.fmean(seconds) * 1000:7.2f}ms  "
+          f"p50 {statistics.median(seconds) * 1000:7.2f}ms  total {sum(seconds):6.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS cache benchmark")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub TTS request latency (s)")
+    parser.add_argument("--per-word", type=float, default=0.004, help="Stub TTS time per word (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    utterances = script(args.calls, args.seed)
+    print(f"{args.calls} calls, {len(utterances)} utterances, {len(set(utterances))} distinct")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        backend = StubTTS(args.latency, args.per_word)
+        report("no cache", run(VoiceHandler(backend, TTSCache(cache_dir)), utterances, use_cache=False), backend)
+
+        backend = StubTTS(args.latency, args.per_word)
+        handler = VoiceHandler(backend, TTSCache(cache_dir))
+        prewarmed = handler.prewarm([GREETING, REPROMPT])
+        report(f"cold cache (+{prewarmed} prewarm)", run(handler, utterances), backend)
+
+        # A new worker: empty memory tier, clips mapped in from disk
+        backend = StubTTS(args.latency, args.per_word)
+        report("warm disk, new process", run(VoiceHandler(backend, TTSCache(cache_dir)), utterances), backend)
+
+        backend = StubTTS(args.latency, args.per_word)
+        handler = VoiceHandler(backend, TTSCache(None))
+        start = time.perf_counter()
+        handler.tts.synthesize(LONG_REPLY)
+        whole = time.perf_counter() - start
+        start = time.perf_counter()
+        stream = handler.synthesize_stream(word + " " for word in LONG_REPLY.split(" "))
+        next(stream)
+        first = time.perf_counter() - start
+        sentences = 1 + sum(1 for _ in stream)
+        print(f"  {len(LONG_REPLY.split())}-word reply: whole {whole * 1000:.0f}ms to audio, "
+              f"streamed first of {sentences} sentences after {first * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Load test: N simulated Twilio callers hitting /incoming-call and then
+/handle-input in parallel, against a stub LLM. Reports p50/p95/p99 webhook
+latency and throughput.
+
+Either spawn the app under gunicorn with the fake OpenAI server wired in:
+
+    python benchmarks/load_test.py --serve sync --callers 20 --turns 5
+    python benchmarks/load_test.py --serve asgi --callers 20 --turns 5
+    python benchmarks/load_test.py --serve sync --llm-error-rate 0.1 --llm-slow-rate 0.05
+
+or point it at an already running server:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --callers 20
+"""
+import argparse
+import http.client
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from fake_openai_server import serve_in_thread  # noqa: E402
+
+UTTERANCES = [
+    "Hi, how much is the Wiener Schnitzel?",
+    "Can I bring my dog to the beer garden?",
+    "What's your cancellation policy?",
+    "Do you have any vegetarian dishes?",
+    "I'd like to book a table for four on Friday",
+    "Thanks, that's great",
+]
+
+SERVE_COMMANDS = {
+    "sync": ["gunicorn", "app:app", "--workers", "1"],
+    "asgi": ["gunicorn", "asgi:app", "--workers", "1", "-k", "uvicorn.workers.UvicornWorker"],
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not start within {timeout}s")
+
+
+def run_caller(url, caller_id, turns, latencies, errors):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    call_sid = f"CA{caller_id:032d}"
+    phone_number = f"+4470000{caller_id:05d}"
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    def post(path, form):
+        conn.request("POST", path, body=urlencode(form), headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    try:
+        post("/incoming-call", {"CallSid": call_sid, "From": phone_number})
+        for turn in range(turns):
+            form = {
+                "CallSid": call_sid,
+                "From": phone_number,
+                "SpeechResult": UTTERANCES[(caller_id + turn) % len(UTTERANCES)]
+            }
+            start = time.perf_counter()
+            status = post("/handle-input", form)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    except Exception as e:
+        errors.append(repr(e))
+    finally:
+        conn.close()
+
+
+def run_load(url, callers, turns):
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=run_caller, args=(url, caller_id, turns, latencies, errors))
+        for caller_id in range(callers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"callers={callers} turns/caller={turns} requests={len(latencies)} errors={len(errors)}")
+    if latencies:
+        print(
+            f"webhook latency p50={percentile(latencies, 50) * 1000:.0f}ms "
+            f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+            f"p99={percentile(latencies, 99) * 1000:.0f}ms  "
+            f"throughput={len(latencies) / elapsed:.1f} turns/s"
+        )
+    if errors:
+        print(f"first errors: {errors[:5]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel Twilio caller load test")
+    parser.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--serve", choices=sorted(SERVE_COMMANDS), help="Spawn the app under gunicorn")
+    parser.add_argument("--callers", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Stub LLM delay per token (s)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of stub LLM requests that fail")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="Share of stub LLM requests that stall")
+    parser.add_argument("--llm-slow-latency", type=float, default=30.0, help="How long a stalled request takes (s)")
+    args = parser.parse_args()
+
+    if not args.url and not args.serve:
+        parser.error("pass --url or --serve")
+
+    if args.url:
+        run_load(args.url, args.callers, args.turns)
+        return
+
+    fake_llm = serve_in_thread(first_token_latency=args.llm_latency, token_delay=args.token_delay,
+                               error_rate=args.llm_error_rate, slow_rate=args.llm_slow_rate,
+                               slow_latency=args.llm_slow_latency)
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="load-test",
+            OPENAI_BASE_URL=fake_llm.base_url,
+            HISTORY_STORE_PATH=os.path.join(tmp, "history.db"),
+        )
+        command = SERVE_COMMANDS[args.serve] + ["--bind", f"127.0.0.1:{port}"]
+        server = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port("127.0.0.1", port)
+            print(f"serving {args.serve}: {' '.join(command)}")
+            run_load(f"http://127.0.0.1:{port}", args.callers, args.turns)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            fake_llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
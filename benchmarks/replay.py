@@ -0,0 +1,248 @@
+"""
+Offline replay of call scripts through /incoming-call and /handle-input
+with the Flask test client and a deterministic in-process OpenAI stub, so
+the conversation pipeline can be measured without Twilio or OpenAI.
+
+Reports throughput, webhook and per-stage latency (from the turn traces),
+the time spent persisting history per turn, prompt tokens, history store
+growth and memory per call. History is written after the webhook returns,
+on the turn pipeline and the write-behind flusher, so its cost is taken
+from those stages' metrics rather than the webhook's history_write span,
+which only covers handing the writes off. With --baseline it becomes a
+regression gate on the parts we own (history lookup and persistence,
+prompt build, prompt size, storage and memory per call) and exits 1 when
+any of them is worse than the baseline by more than --tolerance.
+
+    python benchmarks/replay.py --calls 500 --turns 6
+    python benchmarks/replay.py --script calls.json --save-baseline baseline.json
+    python benchmarks/replay.py --script calls.json --baseline baseline.json
+
+A script file is a JSON list of calls: {"from": "+44...", "turns": ["...", ...]}.
+Baselines are timing-sensitive; record them on the machine that checks them.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+from load_test import UTTERANCES, percentile  # noqa: E402
+from soak_sessions import rss_mb  # noqa: E402
+from stub_openai import StubOpenAI  # noqa: E402
+from metrics import registry  # noqa: E402
+
+GATED_STAGES = ("history_lookup", "prompt_build")
+
+MORE_UTTERANCES = [
+    "What time do you close on Sunday?",
+    "Is there parking near the restaurant?",
+    "How much is the apple strudel?",
+    "Do you do gluten free options?",
+    "I'm really upset, my booking was cancelled!",
+    "Can you change my reservation to seven thirty?",
+]
+
+
+def synthetic_script(calls, turns, callers, seed=0):
+    """Calls from a pool of repeat callers, so customer history grows too"""
+    rng = random.Random(seed)
+    pool = UTTERANCES + MORE_UTTERANCES
+    return [
+        {"from": f"+4477{rng.randrange(callers):08d}", "turns": [rng.choice(pool) for _ in range(turns)]}
+        for _ in range(calls)
+    ]
+
+
+class TraceCollector:
+    """File-like sink for the tracer's JSON turn log"""
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, line):
+        self.records.append(json.loads(line))
+
+
+def persist_seconds():
+    """Seconds spent so far in background history writes and write-behind flushes"""
+    snapshot = registry.snapshot()
+    stage = snapshot["histograms"].get("voice_turn_stage_seconds", {}).get((("stage", "history_persist"),), {})
+    flush = snapshot["summaries"].get("history_flush_seconds", {})
+    return stage.get("sum", 0.0) + flush.get("sum", 0.0)
+
+
+def store_bytes(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal", "-journal") if os.path.exists(path + suffix))
+
+
+def replay(script, llm_latency, token_delay, tmp):
+    os.environ.setdefault("OPENAI_API_KEY", "replay")
+    os.environ["HISTORY_STORE_PATH"] = os.path.join(tmp, "history.db")
+    os.environ["SESSION_STORE_PATH"] = os.path.join(tmp, "sessions.db")
+    os.environ["TRANSCRIPT_ARCHIVE_PATH"] = os.path.join(tmp, "transcripts.db")
+    os.environ["TRACING"] = "1"
+    import app
+    from tracing import Tracer
+
+    collector = TraceCollector()
+    app.tracer = Tracer(enabled=True, log_stream=collector)
+    manager = app.get_conversation_manager()
+    stub = manager.client = StubOpenAI(latency=llm_latency, token_delay=token_delay)
+    client = app.app.test_client()
+
+    # Warm up imports and caches outside the measured window
+    client.post("/handle-input", data={"CallSid": "CAwarmup", "From": "+440000000000", "SpeechResult": "Hello"})
+    manager.pipeline.flush()
+    manager.history_store.flush()
+    collector.records.clear()
+    bytes_before, rss_before = store_bytes(os.environ["HISTORY_STORE_PATH"]), rss_mb()
+    archive_before = store_bytes(os.environ["TRANSCRIPT_ARCHIVE_PATH"])
+    persist_before = persist_seconds()
+
+    webhook_seconds, errors = [], 0
+    start = time.perf_counter()
+    for number, call in enumerate(script):
+        call_sid = f"CA{number:032d}"
+        client.post("/incoming-call", data={"CallSid": call_sid, "From": call["from"]})
+        for utterance in call["turns"]:
+            turn_start = time.perf_counter()
+            response = client.post("/handle-input", data={"CallSid": call_sid, "From": call["from"], "SpeechResult": utterance})
+            webhook_seconds.append(time.perf_counter() - turn_start)
+            if response.status_code != 200:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    manager.pipeline.flush()
+    manager.history_store.flush()
+
+    persist = persist_seconds() - persist_before
+
+    calls = len(script)
+    stages = {}
+    for record in collector.records:
+        for stage, ms in record["spans_ms"].items():
+            # Mostly ends after the turn's log line is written; reported as history_persist_ms_per_turn
+            if stage != "history_persist":
+                stages.setdefault(stage, []).append(ms / 1000)
+    prompt_tokens = [record["prompt_tokens"] for record in collector.records if "prompt_tokens" in record]
+    return {
+        "calls": calls,
+        "turns": len(webhook_seconds),
+        "errors": errors,
+        "llm_requests": stub.request_count,
+        "turns_per_second": len(webhook_seconds) / elapsed,
+        "webhook_p50_ms": percentile(webhook_seconds, 50) * 1000,
+        "webhook_p95_ms": percentile(webhook_seconds, 95) * 1000,
+        "stages": {
+            stage: {
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "mean_ms": statistics.fmean(values) * 1000
+            }
+            for stage, values in sorted(stages.items())
+        },
+        "history_persist_ms_per_turn": persist / max(1, len(webhook_seconds)) * 1000,
+        "prompt_tokens_mean": statistics.fmean(prompt_tokens) if prompt_tokens else 0,
+        "history_bytes_per_call": (store_bytes(os.environ["HISTORY_STORE_PATH"]) - bytes_before) / calls,
+        "archive_bytes_per_call": (store_bytes(os.environ["TRANSCRIPT_ARCHIVE_PATH"]) - archive_before) / calls,
+        "rss_kb_per_call": (rss_mb() - rss_before) * 1024 / calls,
+    }
+
+
+def print_report(result):
+    print(f"calls={result['calls']} turns={result['turns']} errors={result['errors']} "
+          f"llm_requests={result['llm_requests']}")
+    print(f"throughput {result['turns_per_second']:.1f} turns/s, webhook p50 {result['webhook_p50_ms']:.2f} ms "
+          f"p95 {result['webhook_p95_ms']:.2f} ms")
+    for stage, timing in result["stages"].items():
+        print(f"  {stage:18s} p50 {timing['p50_ms']:8.3f} ms  p95 {timing['p95_ms']:8.3f} ms  mean {timing['mean_ms']:8.3f} ms")
+    print(f"history persisted in background: {result.get('history_persist_ms_per_turn', 0):.3f} ms/turn")
+    print(f"prompt tokens/turn {result['prompt_tokens_mean']:.0f}, history growth {result['history_bytes_per_call'] / 1024:.1f} KiB/call "
+          f"(+{result.get('archive_bytes_per_call', 0) / 1024:.1f} KiB/call transcript archive), "
+          f"memory {result['rss_kb_per_call']:.1f} KiB/call")
+
+
+def gated_values(result):
+    values = {f"{stage}_p95_ms": result["stages"].get(stage, {}).get("p95_ms", 0.0) for stage in GATED_STAGES}
+    values["history_persist_ms_per_turn"] = result.get("history_persist_ms_per_turn")
+    values["prompt_tokens_mean"] = result["prompt_tokens_mean"]
+    values["history_bytes_per_call"] = result["history_bytes_per_call"]
+    values["rss_kb_per_call"] = result["rss_kb_per_call"]
+    return values
+
+
+def check_regressions(result, baseline, tolerance, min_ms=0.05, min_kb=16):
+    """Names of gated values worse than baseline by more than tolerance"""
+    regressions = []
+    current = gated_values(result)
+    for name, base in gated_values(baseline).items():
+        if base is None:
+            # Recorded before this value was gated; save a new baseline to include it
+            print(f"baseline has no {name}; re-record it with --save-baseline")
+            continue
+        value = current[name]
+        # Ignore differences that are below timer / RSS page resolution
+        floor = min_kb if name == "rss_kb_per_call" else min_ms if name.endswith("_ms") else 0
+        if value > base * (1 + tolerance) and value - base > floor:
+            regressions.append(f"{name}: {base:.3f} -> {value:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline call replay benchmark")
+    parser.add_argument("--script", help="JSON call script; synthetic calls are generated when omitted")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--callers", type=int, default=50, help="Distinct phone numbers in the synthetic script")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM delay before the reply (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub LLM delay per token (s)")
+    parser.add_argument("--no-response-cache", action="store_true", help="Send every turn to the stub LLM")
+    parser.add_argument("--json", action="store_true", help="Print the raw result as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="Fail if gated values regress against this result")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    else:
+        script = synthetic_script(args.calls, args.turns, args.callers, args.seed)
+
+    if args.no_response_cache:
+        os.environ["RESPONSE_CACHE"] = "0"
+    with tempfile.TemporaryDirectory() as tmp:
+        result = replay(script, args.llm_latency, args.token_delay, tmp)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = check_regressions(result, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSION (tolerance {:.0%}):".format(args.tolerance))
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Soak test for the in-process session store: replays synthetic calls
+(several turns each, then the caller hangs up) and samples RSS, so a leak
+shows up as a rising curve. TTL, caps and sweep interval are shortened so
+expiry and eviction happen within the run.
+
+    python benchmarks/soak_sessions.py --calls 100000
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import registry  # noqa: E402
+from session_store import LRUSessionStore  # noqa: E402
+
+USER_TURN = "Could you tell me how much the Wiener Schnitzel is and whether you have a table for four on Friday? " * 2
+ASSISTANT_TURN = "Of course! The Wiener Schnitzel is £12.99 and we do have a table for four on Friday evening. " * 2
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best we can do off Linux (KiB on Linux, bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store soak test")
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrent", type=int, default=200, help="Calls in progress at once")
+    parser.add_argument("--ttl", type=float, default=0.2)
+    parser.add_argument("--max-entries", type=int, default=20000)
+    parser.add_argument("--max-bytes", type=int, default=16 * 1024 * 1024)
+    args = parser.parse_args()
+
+    store = LRUSessionStore(ttl=args.ttl, max_entries=args.max_entries, max_bytes=args.max_bytes, sweep_interval=0.1)
+    samples = []
+    start = time.perf_counter()
+    sample_every = max(1, args.calls // 10)
+
+    # Interleave calls: each slot runs one call's turns before moving to the next call
+    for batch_start in range(0, args.calls, args.concurrent):
+        batch = range(batch_start, min(batch_start + args.concurrent, args.calls))
+        for turn in range(args.turns):
+            for call_number in batch:
+                call_sid = f"CA{call_number:032d}"
+                session = store.get(call_sid) or {'messages': []}
+                session['messages'].extend([
+                    {"role": "user", "content": f"{USER_TURN} ({call_number}/{turn})"},
+                    {"role": "assistant", "content": ASSISTANT_TURN}
+                ])
+                session['messages'] = session['messages'][-20:]
+                store.put(call_sid, session)
+        if batch_start // sample_every != (batch_start + args.concurrent) // sample_every:
+            samples.append((batch.stop, rss_mb(), len(store), store.memory_bytes()))
+
+    elapsed = time.perf_counter() - start
+    print(f"{args.calls} calls x {args.turns} turns in {elapsed:.1f}s")
+    print(f"{'calls':>8} {'rss MB':>8} {'sessions':>9} {'est. MB':>8}")
+    for calls, rss, sessions, held in samples:
+        print(f"{calls:>8} {rss:>8.1f} {sessions:>9} {held / 1024 / 1024:>8.1f}")
+
+    counters = registry.snapshot()["counters"]
+    for name in ("session_evictions_expired_total", "session_evictions_lru_total", "session_evictions_memory_total"):
+        print(f"{name} {counters.get(name, 0)}")
+
+    growth = samples[-1][1] - samples[len(samples) // 2][1] if len(samples) > 1 else 0
+    print(f"RSS change over second half of run: {growth:+.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
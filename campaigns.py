@@ -0,0 +1,598 @@
+"""
+Bulk outbound calling, e.g. booking reminders. A campaign is a list of
+numbers queued as jobs in a SQLite table; a dispatcher claims due jobs and
+places the calls on a worker pool through pooled Twilio REST clients.
+
+The call rate is a token bucket kept in the same database and taken from
+in the transaction that claims jobs, so it holds across every process
+dispatching from that database (gunicorn workers, or a separate
+`python campaigns.py dispatch`). Failed calls are retried with exponential
+backoff; a number is only queued once per campaign and is skipped if it
+was called by any campaign within the dedupe window.
+
+    python campaigns.py create numbers.txt --name "Friday reminders" --url https://example.com/incoming-call
+    python campaigns.py dispatch
+    python campaigns.py status
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CAMPAIGN_STORE_PATH = os.getenv('CAMPAIGN_STORE_PATH', os.path.join(BASE_DIR, 'data', 'campaigns.db'))
+# Twilio's default is 1 call per second per account; raise it only if the account's CPS was raised too
+CALLS_PER_SECOND = float(os.getenv('CAMPAIGN_CALLS_PER_SECOND', '1'))
+CALL_BURST = float(os.getenv('CAMPAIGN_CALL_BURST', '1'))
+CAMPAIGN_WORKERS = int(os.getenv('CAMPAIGN_WORKERS', '8'))
+MAX_ATTEMPTS = int(os.getenv('CAMPAIGN_MAX_ATTEMPTS', '4'))
+# A number called by any campaign this recently is skipped
+DEDUPE_WINDOW = float(os.getenv('CAMPAIGN_DEDUPE_HOURS', '24')) * 3600
+DEFAULT_COUNTRY_CODE = os.getenv('CAMPAIGN_COUNTRY_CODE', '44')
+
+QUEUED, DIALING, PLACED, FAILED, SKIPPED = "queued", "dialing", "placed", "failed", "skipped"
+E164_RE = re.compile(r"^\+[1-9]\d{7,14}$")
+
+
+def normalize_number(raw, country_code=DEFAULT_COUNTRY_CODE):
+    """E.164 form of a phone number ('07700 900123' -> '+447700900123'), or None if it isn't one"""
+    number = re.sub(r"[\s\-().]", "", str(raw or ""))
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    elif number.startswith("0"):
+        number = f"+{country_code}{number[1:]}"
+    elif number and not number.startswith("+"):
+        number = "+" + number
+    return number if E164_RE.match(number) else None
+
+
+def parse_numbers(text):
+    """Numbers from an uploaded file: one per line, or CSV with the number in the first column"""
+    for row in csv.reader(io.StringIO(text)):
+        if row and row[0].strip() and not row[0].lstrip().startswith("#"):
+            yield row[0].strip()
+
+
+class DialerNotConfigured(RuntimeError):
+    """Twilio credentials are missing; no retry will place the call until they are set"""
+
+
+def retryable(error):
+    # Connection errors and throttling or server errors may succeed later; a rejected number or
+    # missing credentials won't
+    if isinstance(error, DialerNotConfigured):
+        return False
+    status = getattr(error, 'status', None)
+    return status is None or status >= 500 or status == 429
+
+
+class CampaignStore:
+    """
+    Campaigns, their jobs and the shared call-rate bucket, in SQLite (WAL).
+    Claims happen in an IMMEDIATE transaction, so concurrent dispatchers
+    never place the same job twice.
+    """
+
+    def __init__(self, path=CAMPAIGN_STORE_PATH, calls_per_second=CALLS_PER_SECOND, burst=CALL_BURST,
+                 dedupe_window=DEDUPE_WINDOW, clock=time.time):
+        self.path = path
+        self.calls_per_second = calls_per_second
+        self.burst = max(burst, 1.0)
+        self.dedupe_window = dedupe_window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                url TEXT NOT NULL,
+                message TEXT,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                campaign_id TEXT NOT NULL,
+                number TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                call_sid TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (campaign_id, number)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_attempt_at);
+            CREATE INDEX IF NOT EXISTS jobs_number ON jobs (number, status, updated_at);
+            CREATE TABLE IF NOT EXISTS rate_bucket (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+
+    def _transaction(self):
+        return _Immediate(self._conn, self._lock)
+
+    def create(self, numbers, name=None, url="", message=None, country_code=DEFAULT_COUNTRY_CODE, dedupe=True):
+        """
+        Queue a campaign. Returns (campaign_id, counts) where counts has how
+        many numbers were queued, were duplicates within the list, were called
+        recently by another campaign, or weren't valid numbers. dedupe=False
+        queues numbers called within the dedupe window too, e.g. for a call
+        someone asked for explicitly.
+        """
+        campaign_id = uuid.uuid4().hex[:16]
+        # "{campaign_id}" in the URL lets the call's TwiML look the campaign up, e.g. for its message
+        url = url.replace("{campaign_id}", campaign_id)
+        now = self.clock()
+        counts = {"queued": 0, "duplicate": 0, "recently_called": 0, "invalid": 0}
+        seen = set()
+        rows = []
+        for raw in numbers:
+            number = normalize_number(raw, country_code)
+            if number is None:
+                counts["invalid"] += 1
+            elif number in seen:
+                counts["duplicate"] += 1
+            else:
+                seen.add(number)
+                rows.append(number)
+        with self._transaction() as conn:
+            recent = set()
+            if dedupe and self.dedupe_window > 0:
+                for start in range(0, len(rows), 500):
+                    chunk = rows[start:start + 500]
+                    recent.update(number for (number,) in conn.execute(
+                        f"SELECT DISTINCT number FROM jobs WHERE number IN ({','.join('?' * len(chunk))}) "
+                        "AND status IN (?, ?) AND updated_at >= ?",
+                        (*chunk, PLACED, DIALING, now - self.dedupe_window)
+                    ))
+            conn.execute(
+                "INSERT INTO campaigns (id, name, url, message, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (campaign_id, name or f"campaign {campaign_id}", url, message,
+                 "running" if len(rows) > len(recent) else "done", now)
+            )
+            conn.executemany(
+                "INSERT INTO jobs (campaign_id, number, status, next_attempt_at, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(campaign_id, number, SKIPPED if number in recent else QUEUED, now,
+                  "Called recently" if number in recent else None, now) for number in rows]
+            )
+        counts["recently_called"] = len(recent)
+        counts["queued"] = len(rows) - len(recent)
+        return campaign_id, counts
+
+    def _take_tokens(self, conn, wanted, now):
+        # Token bucket refilled at calls_per_second, shared by every process using this database
+        row = conn.execute("SELECT tokens, updated_at FROM rate_bucket WHERE id = 1").fetchone()
+        tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.calls_per_second)
+        granted = min(wanted, int(tokens))
+        conn.execute(
+            "INSERT INTO rate_bucket (id, tokens, updated_at) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+            (tokens - granted, now)
+        )
+        return granted
+
+    def claim(self, limit):
+        """
+        Mark up to limit due jobs of running campaigns as dialing and return
+        them as (campaign_id, number, attempts, url) rows. Fewer are returned
+        when the rate bucket is short of tokens.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            due = conn.execute(
+                "SELECT j.campaign_id, j.number, j.attempts, c.url FROM jobs j "
+                "JOIN campaigns c ON c.id = j.campaign_id "
+                "WHERE j.status = ? AND j.next_attempt_at <= ? AND c.status = 'running' "
+                "ORDER BY j.next_attempt_at LIMIT ?",
+                (QUEUED, now, limit)
+            ).fetchall()
+            if not due:
+                return []
+            due = due[:self._take_tokens(conn, len(due), now)]
+            conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE campaign_id = ? AND number = ?",
+                [(DIALING, now, campaign_id, number) for campaign_id, number, _, _ in due]
+            )
+        return [(campaign_id, number, attempts + 1, url) for campaign_id, number, attempts, url in due]
+
+    def next_due(self):
+        """Seconds until the next queued job is due, or None if nothing is queued"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(j.next_attempt_at) FROM jobs j JOIN campaigns c ON c.id = j.campaign_id "
+                "WHERE j.status = ? AND c.status = 'running'",
+                (QUEUED,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - self.clock())
+
+    def pending(self):
+        """Jobs still to be placed: queued in running campaigns, or being dialed"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs j JOIN campaigns c ON c.id = j.campaign_id "
+                "WHERE (j.status = ? AND c.status = 'running') OR j.status = ?",
+                (QUEUED, DIALING)
+            ).fetchone()[0]
+
+    def _finish(self, campaign_id, number, status, call_sid=None, error=None, next_attempt_at=None):
+        now = self.clock()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, call_sid = COALESCE(?, call_sid), error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ? WHERE campaign_id = ? AND number = ?",
+                (status, call_sid, error, next_attempt_at, now, campaign_id, number)
+            )
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE campaign_id = ? AND status IN (?, ?)",
+                (campaign_id, QUEUED, DIALING)
+            ).fetchone()[0]
+            if not remaining:
+                conn.execute("UPDATE campaigns SET status = 'done' WHERE id = ? AND status = 'running'",
+                             (campaign_id,))
+
+    def placed(self, campaign_id, number, call_sid):
+        self._finish(campaign_id, number, PLACED, call_sid=call_sid)
+
+    def retry_later(self, campaign_id, number, error, delay):
+        self._finish(campaign_id, number, QUEUED, error=error, next_attempt_at=self.clock() + delay)
+
+    def failed(self, campaign_id, number, error):
+        self._finish(campaign_id, number, FAILED, error=error)
+
+    def recover(self, stale_after=300):
+        """Requeue jobs left dialing by a dispatcher that died mid-call; returns how many"""
+        cutoff = self.clock() - stale_after
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, next_attempt_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, self.clock(), DIALING, cutoff)
+            ).rowcount
+
+    def set_status(self, campaign_id, status):
+        """Pause, resume (running) or cancel a campaign; returns False if it doesn't exist"""
+        with self._transaction() as conn:
+            updated = conn.execute("UPDATE campaigns SET status = ? WHERE id = ? AND status NOT IN ('done', 'cancelled')",
+                                   (status, campaign_id)).rowcount
+            if status == "cancelled":
+                conn.execute("UPDATE jobs SET status = ?, error = 'Campaign cancelled' WHERE campaign_id = ? "
+                             "AND status = ?", (SKIPPED, campaign_id, QUEUED))
+        return bool(updated)
+
+    def campaign(self, campaign_id):
+        with self._lock:
+            row = self._conn.execute("SELECT id, name, url, message, status, created_at FROM campaigns WHERE id = ?",
+                                     (campaign_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "name", "url", "message", "status", "created_at"), row))
+
+    def campaigns(self, limit=50):
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM campaigns ORDER BY created_at DESC LIMIT ?", (limit,))]
+        return [self.progress(campaign_id) for campaign_id in ids]
+
+    def progress(self, campaign_id):
+        """Counts by job status, retries, and the rate calls are going out at, with an ETA"""
+        campaign = self.campaign(campaign_id)
+        if campaign is None:
+            return None
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE campaign_id = ? GROUP BY status", (campaign_id,)
+            ).fetchall())
+            retries, first, last = self._conn.execute(
+                "SELECT COALESCE(SUM(MAX(attempts - 1, 0)), 0), "
+                "MIN(CASE WHEN status = ? THEN updated_at END), MAX(CASE WHEN status = ? THEN updated_at END) "
+                "FROM jobs WHERE campaign_id = ?",
+                (PLACED, PLACED, campaign_id)
+            ).fetchone()
+        placed = counts.get(PLACED, 0)
+        remaining = counts.get(QUEUED, 0) + counts.get(DIALING, 0)
+        calls_per_minute = None
+        if placed > 1 and last > first:
+            calls_per_minute = (placed - 1) / (last - first) * 60
+        eta = None
+        if remaining:
+            # The bucket caps the rate whatever has been achieved so far
+            per_second = min(calls_per_minute / 60 if calls_per_minute else self.calls_per_second,
+                             self.calls_per_second)
+            eta = remaining / per_second
+        return {
+            **campaign,
+            "total": sum(counts.values()),
+            **{status: counts.get(status, 0) for status in (QUEUED, DIALING, PLACED, FAILED, SKIPPED)},
+            "retries": retries,
+            "calls_per_minute": round(calls_per_minute, 1) if calls_per_minute else None,
+            "eta_seconds": round(eta) if eta is not None else None
+        }
+
+    def jobs(self, campaign_id, status=None):
+        query = "SELECT number, status, attempts, call_sid, error FROM jobs WHERE campaign_id = ?"
+        params = [campaign_id]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY rowid", params).fetchall()
+        return [dict(zip(("number", "status", "attempts", "call_sid", "error"), row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT under the store's lock; rolls back on error"""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class TwilioDialer:
+    """
+    Places calls through the Twilio REST API. Each dispatching thread keeps
+    its own Client, whose HTTP session pools connections, so calls reuse
+    TLS connections instead of opening one per call. base_url points the
+    client at tools/fake_twilio_server.py for testing.
+    """
+
+    def __init__(self, account_sid, auth_token, from_number, base_url=None, timeout=10):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.base_url = base_url
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv('TWILIO_ACCOUNT_SID'),
+            os.getenv('TWILIO_AUTH_TOKEN'),
+            os.getenv('TWILIO_PHONE_NUMBER'),
+            base_url=os.getenv('TWILIO_API_BASE_URL') or None,
+            timeout=float(os.getenv('TWILIO_REQUEST_TIMEOUT', '10')),
+        )
+
+    @property
+    def configured(self):
+        return bool(self.account_sid and self.auth_token and self.from_number)
+
+    @property
+    def client(self):
+        # One per thread and process: a forked worker must not share its parent's sockets
+        client = getattr(self._local, 'client', None)
+        if client is None or self._local.pid != os.getpid():
+            from twilio.rest import Client
+            from twilio.http.http_client import TwilioHttpClient
+            client = Client(self.account_sid, self.auth_token,
+                            http_client=TwilioHttpClient(pool_connections=True, timeout=self.timeout))
+            if self.base_url:
+                client.api.base_url = self.base_url
+            self._local.client, self._local.pid = client, os.getpid()
+        return client
+
+    def dial(self, to, url):
+        """Place one call; returns its CallSid"""
+        if not self.configured:
+            raise DialerNotConfigured("TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER must be set")
+        return self.client.calls.create(to=to, from_=self.from_number, url=url).sid
+
+
+class CampaignDispatcher:
+    """
+    Claims due jobs from a CampaignStore and places them on a worker pool.
+    At most `workers` calls are in flight in this process; the store's rate
+    bucket decides how many may start. A call that fails with a retryable
+    error is requeued after backoff_base * 2^(attempt - 1) seconds (with
+    jitter, capped at backoff_max) until max_attempts is reached.
+    """
+
+    def __init__(self, store, dialer, workers=CAMPAIGN_WORKERS, max_attempts=MAX_ATTEMPTS, backoff_base=30.0,
+                 backoff_max=900.0, poll_interval=1.0):
+        self.store = store
+        self.dialer = dialer
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self._executor = None
+        self._thread = None
+        self._pid = None
+        self._slots = threading.Semaphore(workers)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+        registry.describe("campaign_calls_placed_total", "Campaign calls accepted by Twilio")
+        registry.describe("campaign_call_retries_total", "Campaign calls requeued after a retryable failure")
+        registry.describe("campaign_call_failures_total", "Campaign calls given up on")
+        registry.histogram("campaign_dial_seconds", "Time for Twilio to accept one outbound call")
+        registry.set_gauge("campaign_calls_in_flight", lambda: self._in_flight)
+
+    def start(self):
+        """Start dispatching in the background; safe to call repeatedly"""
+        # Created on first use so the threads belong to the worker, not a pre-fork master
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._slots = threading.Semaphore(self.workers)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="campaign")
+            self._stopping = False
+            recovered = self.store.recover()
+            if recovered:
+                print(f"Requeued {recovered} campaign calls left dialing")
+            self._thread = threading.Thread(target=self._run, name="campaign-dispatcher", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Check for due jobs now, e.g. after queuing a campaign"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                dispatched = self.dispatch_once()
+            except Exception as e:
+                print(f"Campaign dispatch error: {e}")
+                dispatched = 0
+            if not dispatched:
+                delay = self.store.next_due()
+                # Short of tokens or waiting on backoff; never sleep past the next token
+                wait = self.poll_interval if delay is None else min(self.poll_interval,
+                                                                    max(delay, 1.0 / self.store.calls_per_second))
+                self._wake.wait(wait)
+                self._wake.clear()
+
+    def dispatch_once(self, block=True):
+        """Claim as many due jobs as there are free workers and start them; returns how many"""
+        if not self._slots.acquire(blocking=block, timeout=self.poll_interval if block else None):
+            return 0
+        free = 1
+        while free < self.workers and self._slots.acquire(blocking=False):
+            free += 1
+        jobs = self.store.claim(free)
+        for _ in range(free - len(jobs)):
+            self._slots.release()
+        for job in jobs:
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._place, *job)
+        return len(jobs)
+
+    def _place(self, campaign_id, number, attempt, url):
+        start = time.perf_counter()
+        try:
+            call_sid = self.dialer.dial(number, url)
+        except Exception as e:
+            registry.observe_histogram("campaign_dial_seconds", time.perf_counter() - start)
+            if retryable(e) and attempt < self.max_attempts:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                registry.inc("campaign_call_retries_total")
+                self.store.retry_later(campaign_id, number, str(e), delay)
+            else:
+                print(f"Campaign call to {number} failed after {attempt} attempt(s): {e}")
+                registry.inc("campaign_call_failures_total")
+                self.store.failed(campaign_id, number, str(e))
+        else:
+            registry.observe_histogram("campaign_dial_seconds", time.perf_counter() - start)
+            registry.inc("campaign_calls_placed_total")
+            self.store.placed(campaign_id, number, call_sid)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            self._wake.set()
+
+    def run_until_idle(self, timeout=None):
+        """Dispatch until nothing is queued or in flight (CLI and benchmarks); returns True if idle"""
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            if not self.store.pending():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk outbound calling campaigns")
+    parser.add_argument("--db", default=CAMPAIGN_STORE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Queue a campaign from a file of numbers (one per line, or CSV)")
+    create.add_argument("path", help="File of numbers, or - for stdin")
+    create.add_argument("--name")
+    create.add_argument("--url", required=True, help="TwiML URL Twilio fetches when the call connects")
+    dispatch = commands.add_parser("dispatch", help="Place queued calls until interrupted")
+    dispatch.add_argument("--workers", type=int, default=CAMPAIGN_WORKERS)
+    dispatch.add_argument("--until-idle", action="store_true", help="Exit once nothing is left to dial")
+    status = commands.add_parser("status", help="Progress of one campaign, or of the most recent ones")
+    status.add_argument("campaign_id", nargs="?")
+    for command, state in (("pause", "paused"), ("resume", "running"), ("cancel", "cancelled")):
+        commands.add_parser(command, help=f"Set a campaign {state}").add_argument("campaign_id")
+    args = parser.parse_args(argv)
+
+    store = CampaignStore(args.db)
+    if args.command == "create":
+        text = sys.stdin.read() if args.path == "-" else open(args.path, encoding="utf-8").read()
+        campaign_id, counts = store.create(parse_numbers(text), name=args.name, url=args.url)
+        print(campaign_id, " ".join(f"{key}={value}" for key, value in counts.items()))
+    elif args.command == "dispatch":
+        dispatcher = CampaignDispatcher(store, TwilioDialer.from_env(), workers=args.workers)
+        try:
+            if args.until_idle:
+                dispatcher.run_until_idle()
+            else:
+                dispatcher.start()
+                while True:
+                    time.sleep(60)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.stop()
+    elif args.command == "status":
+        for progress in ([store.progress(args.campaign_id)] if args.campaign_id else store.campaigns()):
+            if progress is None:
+                print(f"No campaign {args.campaign_id}", file=sys.stderr)
+                sys.exit(1)
+            print(f"{progress['id']}  {progress['status']:9s} {progress['placed']}/{progress['total']} placed, "
+                  f"{progress['failed']} failed, {progress['skipped']} skipped, {progress['queued']} queued, "
+                  f"{progress['retries']} retries, {progress['calls_per_minute'] or '-'} calls/min, "
+                  f"ETA {progress['eta_seconds'] if progress['eta_seconds'] is not None else '-'}s  {progress['name']}")
+    else:
+        state = {"pause": "paused", "resume": "running", "cancel": "cancelled"}[args.command]
+        if not store.set_status(args.campaign_id, state):
+            print(f"No active campaign {args.campaign_id}", file=sys.stderr)
+            sys.exit(1)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
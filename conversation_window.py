@@ -0,0 +1,125 @@
+import os
+
+from metrics import registry
+from prompt_builder import count_tokens
+
+# Budget for the conversation history sent with each request, on top of the system prompt
+WINDOW_TOKENS = int(os.getenv('CONVERSATION_WINDOW_TOKENS', '600'))
+# Budget for the running summary of turns that fell out of the window
+SUMMARY_TOKENS = int(os.getenv('CONVERSATION_SUMMARY_TOKENS', '150'))
+# No single stored message may exceed this, so one rambling turn can't crowd out the rest
+MESSAGE_TOKENS = int(os.getenv('CONVERSATION_MESSAGE_TOKENS', '250'))
+
+TOKEN_BUCKETS = (50, 100, 200, 400, 800, 1600, 3200, 6400)
+
+
+def truncate_to_tokens(text, max_tokens):
+    tokens = count_tokens(text)
+    while tokens > max_tokens and text:
+        # Cut proportionally at a word boundary, then re-check
+        keep = max(1, int(len(text) * max_tokens / tokens) - 1)
+        text = text[:keep].rsplit(" ", 1)[0].rstrip() + "…"
+        tokens = count_tokens(text)
+    return text
+
+
+def _recap(text, max_words):
+    words = (text or "").split()
+    return " ".join(words[:max_words]) + ("…" if len(words) > max_words else "")
+
+
+def summarize_exchange(user_input, assistant_response):
+    """One line for a turn leaving the window: the question and the gist of the answer"""
+    answer = (assistant_response or "").strip()
+    for end in (". ", "! ", "? "):
+        if end in answer:
+            answer = answer.split(end, 1)[0] + end.strip()
+            break
+    return f"Caller: \"{_recap(user_input, 15)}\" Assistant: {_recap(answer, 15)}"
+
+
+class ConversationWindow:
+    """
+    Keeps the conversation history of a call inside a token budget. Each
+    message's token count is stored in the session alongside it, so the
+    budget check is a sum rather than a re-tokenization. When the history
+    outgrows max_tokens the oldest exchanges are folded into a running
+    summary, itself capped at summary_tokens, which is sent ahead of the
+    remaining messages. Per-call token usage is accumulated in the session.
+    """
+
+    def __init__(self, max_tokens=WINDOW_TOKENS, summary_tokens=SUMMARY_TOKENS, message_tokens=MESSAGE_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.message_tokens = message_tokens
+
+        registry.histogram("conversation_window_tokens", "History tokens sent with a request", TOKEN_BUCKETS)
+        registry.histogram("llm_prompt_tokens_per_turn", "Prompt tokens of one LLM request", TOKEN_BUCKETS)
+        registry.describe("conversation_turns_summarized_total", "Exchanges folded into a call's running summary")
+
+    @staticmethod
+    def _token_counts(session):
+        counts = session.get('message_tokens')
+        if counts is None or len(counts) != len(session['messages']):
+            # Sessions written before token counts were stored
+            counts = session['message_tokens'] = [count_tokens(m['content'] or '') for m in session['messages']]
+        return counts
+
+    def history(self, session):
+        """Messages to send ahead of the new user turn: the summary, then the window"""
+        counts = self._token_counts(session)
+        messages = list(session['messages'])
+        tokens = sum(counts)
+        if session.get('summary'):
+            summary = (
+                f"Earlier in this call ({session.get('summarized_turns', 0)} exchanges, summarized):\n- "
+                + "\n- ".join(session['summary'])
+            )
+            messages.insert(0, {"role": "system", "content": summary})
+            tokens += session.get('summary_token_count', 0)
+        registry.observe_histogram("conversation_window_tokens", tokens)
+        return messages
+
+    def append(self, session, user_input, assistant_response):
+        """Add a finished exchange, then fold the oldest ones into the summary until within budget"""
+        counts = self._token_counts(session)
+        for role, content in (("user", user_input), ("assistant", assistant_response)):
+            content = truncate_to_tokens(content or '', self.message_tokens)
+            session['messages'].append({"role": role, "content": content})
+            counts.append(count_tokens(content))
+
+        summarized = 0
+        # Always keep the latest exchange verbatim
+        while sum(counts) > self.max_tokens and len(session['messages']) > 2:
+            oldest = session['messages'][:2]
+            del session['messages'][:2]
+            del counts[:2]
+            user_text = next((m['content'] for m in oldest if m['role'] == 'user'), '')
+            assistant_text = next((m['content'] for m in oldest if m['role'] == 'assistant'), '')
+            session.setdefault('summary', []).append(summarize_exchange(user_text, assistant_text))
+            summarized += 1
+
+        if summarized:
+            session['summarized_turns'] = session.get('summarized_turns', 0) + summarized
+            registry.inc("conversation_turns_summarized_total", summarized)
+            summary = session['summary']
+            summary_counts = [count_tokens(line) + 1 for line in summary]
+            # Oldest summary lines go first; the count above still records them
+            while len(summary) > 1 and sum(summary_counts) > self.summary_tokens:
+                summary.pop(0)
+                summary_counts.pop(0)
+            session['summary_token_count'] = sum(summary_counts) + 12
+
+    def record_usage(self, session, prompt_tokens, completion_tokens):
+        """Add one request's token usage to the call's running totals; returns the totals"""
+        usage = session.setdefault('token_usage', {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        usage["requests"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        registry.observe_histogram("llm_prompt_tokens_per_turn", prompt_tokens)
+        return usage
+
+
+def estimate_usage(messages, completion):
+    """(prompt_tokens, completion_tokens) counted locally, for streamed replies without usage"""
+    return sum(count_tokens(m['content'] or '') + 4 for m in messages), count_tokens(completion or '')
@@ -0,0 +1,338 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field, asdict, fields
+
+from prompt_builder import count_tokens
+
+# Turns kept verbatim on the hot profile; older ones live only in the archive
+RECENT_TURNS = int(os.getenv('CUSTOMER_RECENT_TURNS', '6'))
+
+# Words that mark what a call was about, folded into the profile by the rollup
+TOPIC_KEYWORDS = {
+    "booking": ("book", "booking", "reservation", "reserve", "table"),
+    "menu": ("menu", "dish", "schnitzel", "strudel", "sausage", "dessert", "drinks", "beer"),
+    "prices": ("price", "cost", "much", "£"),
+    "opening_hours": ("open", "opening", "close", "closing", "hours"),
+    "dietary": ("vegetarian", "vegan", "gluten", "allergy", "allergic", "halal", "dairy"),
+    "location": ("parking", "address", "directions", "where"),
+    "complaint": ("complaint", "cancelled", "refund", "rude", "cold", "wrong"),
+}
+
+# Cap on the caller context added to each prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CUSTOMER_CONTEXT_TOKENS', '120'))
+
+DIETARY_TERMS = ("vegetarian", "vegan", "gluten free", "nut allergy", "dairy free", "halal")
+
+
+def _now():
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+
+@dataclass(slots=True)
+class CustomerProfile:
+    """
+    The hot per-customer record, read from the history store on every turn:
+    preferences, counters, a rolled-up summary of old calls and only the
+    last RECENT_TURNS turns. Full transcripts go to the TranscriptArchive.
+    """
+    phone: str
+    first_interaction: str = field(default_factory=_now)
+    last_interaction: str = None
+    preferences: dict = field(default_factory=lambda: {
+        "seating_preference": None,
+        "dietary_restrictions": [],
+        "favorite_dishes": [],
+        "special_requests": []
+    })
+    bookings: list = field(default_factory=list)
+    complaints: list = field(default_factory=list)
+    satisfaction_score: float = None
+    total_visits: int = 0
+    total_spent: float = 0
+    total_turns: int = 0
+    total_calls: int = 0
+    last_call_sid: str = None
+    emotion_counts: dict = field(default_factory=dict)
+    recent_turns: list = field(default_factory=list)
+    # Rollup of archived turns up to (not including) turn number rolled_up_through
+    summary: dict = field(default_factory=dict)
+    rolled_up_through: int = 0
+    # Prompt-ready caller context, rebuilt whenever the profile changes; None until first built
+    context: str = None
+
+    @classmethod
+    def from_dict(cls, record):
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in record.items() if key in known})
+
+    @classmethod
+    def from_legacy_record(cls, record, recent_turns=RECENT_TURNS):
+        """Profile for a record that still holds its full conversations list"""
+        profile = cls.from_dict(record)
+        conversations = record.get("conversations", [])
+        profile.total_turns = len(conversations)
+        profile.total_calls = len({turn.get("call_sid") for turn in conversations})
+        if conversations:
+            profile.last_call_sid = conversations[-1].get("call_sid")
+        for turn in conversations:
+            for emotion, value in (turn.get("emotions_detected") or {}).items():
+                if value:
+                    profile.emotion_counts[emotion] = profile.emotion_counts.get(emotion, 0) + int(value)
+        profile.recent_turns = [
+            {
+                "timestamp": turn.get("timestamp"),
+                "call_sid": turn.get("call_sid"),
+                "user_input": turn.get("user_input"),
+                "assistant_response": turn.get("assistant_response")
+            }
+            for turn in conversations[-recent_turns:]
+        ] if recent_turns else []
+        profile.refresh_context()
+        return profile
+
+    def to_dict(self):
+        return asdict(self)
+
+    def record_turn(self, conversation_data, recent_turns=RECENT_TURNS, turn_number=None):
+        """
+        Fold one turn into the counters and the recent-turn window.
+        turn_number is the turn's number in the archive; total_turns follows
+        it, and stays put for a turn that couldn't be archived.
+        """
+        timestamp = conversation_data.get("timestamp") or _now()
+        self.last_interaction = timestamp
+        if turn_number is not None:
+            self.total_turns = turn_number + 1
+        call_sid = conversation_data.get("call_sid")
+        if call_sid != self.last_call_sid:
+            self.total_calls += 1
+            self.last_call_sid = call_sid
+        for emotion, value in (conversation_data.get("emotions_detected") or {}).items():
+            if value:
+                self.emotion_counts[emotion] = self.emotion_counts.get(emotion, 0) + int(value)
+
+        self.recent_turns.append({
+            "timestamp": timestamp,
+            "call_sid": call_sid,
+            "user_input": conversation_data.get("user_input"),
+            "assistant_response": conversation_data.get("assistant_response")
+        })
+        if len(self.recent_turns) > recent_turns:
+            del self.recent_turns[:-recent_turns]
+
+        if "preferences" in conversation_data:
+            self.preferences.update(conversation_data["preferences"])
+        if "booking" in conversation_data:
+            self.bookings.append(conversation_data["booking"])
+            self.total_visits += 1
+        if "complaint" in conversation_data:
+            self.complaints.append(conversation_data["complaint"])
+        self.refresh_context()
+
+    def refresh_context(self, max_tokens=CONTEXT_TOKEN_BUDGET):
+        self.context = build_context(self, max_tokens)
+
+
+def _recap(text, max_words=12):
+    words = (text or "").split()
+    return " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+
+
+def context_lines(profile):
+    """Facts about the caller, most useful first"""
+    lines = []
+    previous_calls = profile.total_calls - 1
+    if previous_calls > 0:
+        lines.append(f"Returning caller: {previous_calls} previous call(s), {profile.total_visits} visit(s) booked.")
+    preferences = profile.preferences
+    if preferences.get("dietary_restrictions"):
+        lines.append("Dietary needs: " + ", ".join(preferences["dietary_restrictions"]) + ".")
+    if preferences.get("seating_preference"):
+        lines.append(f"Prefers seating: {preferences['seating_preference']}.")
+    if preferences.get("favorite_dishes"):
+        lines.append("Favourite dishes: " + ", ".join(preferences["favorite_dishes"][:3]) + ".")
+    if profile.bookings:
+        lines.append(f"Latest booking: {_recap(json.dumps(profile.bookings[-1]), 20)}")
+    if profile.complaints:
+        lines.append(f"Previous complaint: {_recap(str(profile.complaints[-1]))}")
+    if preferences.get("special_requests"):
+        lines.append("Special requests: " + "; ".join(map(str, preferences["special_requests"][-2:])) + ".")
+    if profile.emotion_counts.get("angry", 0) + profile.emotion_counts.get("frustrated", 0) >= 3:
+        lines.append("Has been frustrated on past calls; be especially patient.")
+    topics = list(profile.summary.get("topics", {}))[:3]
+    if topics:
+        lines.append("Usually asks about: " + ", ".join(topic.replace("_", " ") for topic in topics) + ".")
+    # The current call is already in the conversation, so only recap earlier ones
+    earlier = [turn for turn in profile.recent_turns if turn.get("call_sid") != profile.last_call_sid]
+    if earlier:
+        lines.append(f"Last call they asked: \"{_recap(earlier[-1].get('user_input'))}\"")
+    return lines
+
+
+def build_context(profile, max_tokens=CONTEXT_TOKEN_BUDGET):
+    """Join context_lines until the next one would exceed max_tokens"""
+    kept, used = [], 0
+    for line in context_lines(profile):
+        tokens = count_tokens(line) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+def summarize_turns(summary, turns, preferences):
+    """Fold archived turns into a profile summary; returns the updated summary"""
+    topics = dict(summary.get("topics", {}))
+    for turn in turns:
+        text = (turn.get("user_input") or "").lower()
+        words = set(text.replace("?", " ").replace(",", " ").replace(".", " ").split())
+        for topic, keywords in TOPIC_KEYWORDS.items():
+            if any(keyword in words or (not keyword.isalpha() and keyword in text) for keyword in keywords):
+                topics[topic] = topics.get(topic, 0) + 1
+        for term in DIETARY_TERMS:
+            if term in text and term not in preferences["dietary_restrictions"]:
+                preferences["dietary_restrictions"].append(term)
+
+    if not turns:
+        return summary
+    return {
+        "turns": summary.get("turns", 0) + len(turns),
+        "first": summary.get("first") or turns[0].get("timestamp"),
+        "last": turns[-1].get("timestamp"),
+        "topics": dict(sorted(topics.items(), key=lambda item: -item[1]))
+    }
+
+
+def rollup_profile(profile, customer_key, archive, keep_recent=RECENT_TURNS):
+    """
+    Summarize archived turns older than the last keep_recent into the
+    profile's summary and preferences. Returns True if the profile changed.
+    """
+    end = profile.total_turns - keep_recent
+    if end <= profile.rolled_up_through:
+        return False
+    turns = archive.turns_between(customer_key, profile.rolled_up_through, end)
+    profile.summary = summarize_turns(profile.summary, turns, profile.preferences)
+    profile.rolled_up_through = end
+    profile.refresh_context()
+    return True
+
+
+class TranscriptArchive:
+    """
+    Cold, append-only store of every turn, one SQLite row per turn keyed by
+    (customer_key, turn number). Turn numbers are assigned by the database,
+    so every worker can append. Nothing is read at startup; transcripts are
+    paged on demand, newest first, and read in order by the rollup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # Reconnect after fork; SQLite connections must not be shared across processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    customer_key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    turn TEXT NOT NULL,
+                    PRIMARY KEY (customer_key, seq)
+                )
+                """
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def append(self, customer_key, turn):
+        """Archive turn as the customer's next turn; returns its turn number"""
+        return self.append_many(customer_key, [turn])[0]
+
+    def append_many(self, customer_key, turns):
+        """Archive turns, in order, after the customer's last one; returns their turn numbers"""
+        turns = list(turns)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Numbered under SQLite's write lock, so workers sharing the archive never pick the same seq
+                conn.execute("BEGIN IMMEDIATE")
+                start = conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM transcripts WHERE customer_key = ?", (customer_key,)
+                ).fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO transcripts (customer_key, seq, turn) VALUES (?, ?, ?)",
+                    [(customer_key, start + offset, json.dumps(turn)) for offset, turn in enumerate(turns)]
+                )
+        return list(range(start, start + len(turns)))
+
+    def count(self, customer_key):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM transcripts WHERE customer_key = ?", (customer_key,)
+            ).fetchone()[0]
+
+    def page(self, customer_key, before=None, limit=20):
+        """
+        Up to limit (seq, turn) pairs, newest first, with seq < before. Pass
+        the smallest seq of one page as before to get the next one.
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT seq, turn FROM transcripts WHERE customer_key = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (customer_key, before if before is not None else 2 ** 62, limit)
+            ).fetchall()
+        return [(seq, json.loads(turn)) for seq, turn in rows]
+
+    def turns_between(self, customer_key, start, end):
+        """Turns with start <= seq < end, oldest first"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT turn FROM transcripts WHERE customer_key = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (customer_key, start, end)
+            ).fetchall()
+        return [json.loads(turn) for turn, in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    from history_store import CUSTOMERS, open_store
+
+    if len(sys.argv) != 4 or sys.argv[1] != "rollup":
+        print("Usage: python customer_profile.py rollup <history_store_path> <transcripts.db>")
+        sys.exit(1)
+
+    store = open_store(sys.argv[2])
+    archive = TranscriptArchive(sys.argv[3])
+    rolled_up = 0
+    for customer_key, record in store.load(CUSTOMERS).items():
+        if "conversations" in record:
+            # Converted (and archived) by the app on its next start
+            continue
+        # Each profile is re-read under the store's write lock, so running workers' turns aren't lost
+        with store.transaction() as tx:
+            profile = CustomerProfile.from_dict(tx.get(CUSTOMERS, customer_key))
+            if rollup_profile(profile, customer_key, archive):
+                tx.put(CUSTOMERS, customer_key, profile.to_dict())
+                rolled_up += 1
+    print(f"Rolled up {rolled_up} customer profiles")
+    archive.close()
+    store.close()
@@ -0,0 +1,69 @@
+import re
+
+EMOTION_INDICATORS = {
+    'angry': ['angry', 'furious', 'upset', 'horrible', 'terrible', 'stupid', 'useless'],
+    'frustrated': ['annoying', 'frustrating', 'difficult', 'problem', 'issue'],
+    'urgent': ['immediately', 'urgent', 'asap', 'emergency', 'right now'],
+    'positive': ['happy', 'great', 'wonderful', 'excellent', 'perfect', 'thanks'],
+    'confused': ['confused', 'unsure', 'don\'t understand', 'what do you mean']
+}
+
+# Punctuation that can cling to words; replaced by spaces before splitting
+TOKEN_PUNCTUATION = ".,!?;:\"()[]…"
+
+
+class EmotionDetector:
+    """
+    Keyword emotion detector compiled once at startup. Single keywords (and
+    their plural) go into one word -> emotion table, so scoring an utterance
+    is one split plus a C-level map over a dict; multi-word phrases are found
+    with a substring prefilter and confirmed with a word-boundary regex.
+    Matching is on whole words, so "tissue" is not an "issue". Scores are hit
+    counts per emotion.
+    """
+
+    def __init__(self, indicators=EMOTION_INDICATORS):
+        self.emotions = list(indicators)
+        self._words = {}
+        self._phrases = []
+        for emotion, keywords in indicators.items():
+            for keyword in keywords:
+                if " " in keyword:
+                    pattern = re.compile(r"\b" + r"\s+".join(map(re.escape, keyword.split())) + r"\b")
+                    self._phrases.append((keyword.split()[0], pattern, emotion))
+                else:
+                    self._words[keyword] = emotion
+                    self._words.setdefault(keyword + "s", emotion)
+
+    def _count(self, text, counts):
+        lower = text.lower()
+        spaced = lower
+        for char in TOKEN_PUNCTUATION:
+            if char in spaced:
+                spaced = spaced.replace(char, " ")
+        for emotion in filter(None, map(self._words.get, spaced.split())):
+            counts[emotion] += 1
+        for first_word, pattern, emotion in self._phrases:
+            if first_word in lower:
+                counts[emotion] += len(pattern.findall(lower))
+
+    def score(self, text):
+        counts = dict.fromkeys(self.emotions, 0)
+        self._count(text, counts)
+        counts['is_shouting'] = text.isupper() or text.count('!') > 1
+        counts['has_interruption'] = '...' in text or '?' in text
+        return counts
+
+    def score_many(self, texts):
+        """Score a batch of utterances, e.g. when backfilling analytics"""
+        return [self.score(text) for text in texts]
+
+    def score_transcript(self, utterances):
+        """Total hit counts per emotion across a whole stored transcript"""
+        totals = dict.fromkeys(self.emotions, 0)
+        for text in utterances:
+            self._count(text, totals)
+        return totals
+
+
+detector = EmotionDetector()
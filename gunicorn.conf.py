@@ -0,0 +1,23 @@
+# Picked up automatically by `gunicorn app:app` (see Procfile)
+import gc
+import os
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before any worker forks.
+    # Workers inherit the count, however it was set, so they pick a shared session store
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    from app import warmup
+    warmup()
+    # Keep the warmed objects out of future collections so the garbage
+    # collector doesn't write to their pages and break copy-on-write sharing
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Flush queued history writes before the worker process goes away
+    from app import shutdown
+    shutdown()
@@ -0,0 +1,342 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CALLS = "calls"
+CUSTOMERS = "customers"
+META = "meta"
+# call_sids by phone number
+CALLS_BY_PHONE = "calls_by_phone"
+
+LEGACY_MIGRATION_KEY = "legacy_json_migrated"
+
+
+class HistoryStore:
+    """
+    Keyed record storage used by CallHistory and CustomerHistory.
+    Records live in namespaces (calls, customers, meta) and are written
+    one key at a time, so a turn only costs the size of the records it
+    touches instead of the whole history.
+    """
+
+    def load(self, namespace):
+        """Return {key: record} for a namespace, in insertion order"""
+        raise NotImplementedError
+
+    def write_batch(self, rows):
+        """Persist (namespace, key, payload) rows; payload is a JSON string"""
+        raise NotImplementedError
+
+    def get(self, namespace, key):
+        """The record stored under key, or None"""
+        raise NotImplementedError
+
+    def put(self, namespace, key, record):
+        self.write_batch([(namespace, key, json.dumps(record))])
+
+    def transaction(self):
+        """
+        Context manager for read-modify-write: yields an object with
+        get/load/put that sees one consistent view of the store, and whose
+        puts are committed together when the block exits (or discarded if
+        it raises). Transactions are serialized across threads and, for
+        SQLite, across every process sharing the file.
+        """
+        raise NotImplementedError
+
+    def mutate(self, fn, *args):
+        """
+        Run fn(tx, *args) in a transaction. WriteBehindStore queues the call
+        instead and applies it on its flusher thread.
+        """
+        with self.transaction() as tx:
+            fn(tx, *args)
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
+
+
+UPSERT_SQL = """
+    INSERT INTO records (namespace, key, value, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(namespace, key)
+    DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+"""
+
+
+class _SQLiteTransaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get(self, namespace, key):
+        row = self.conn.execute(
+            "SELECT value FROM records WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load(self, namespace):
+        rows = self.conn.execute(
+            "SELECT key, value FROM records WHERE namespace = ? ORDER BY rowid", (namespace,)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def put(self, namespace, key, record):
+        self.conn.execute(UPSERT_SQL, (namespace, key, json.dumps(record), time.time()))
+
+
+class SQLiteStore(HistoryStore):
+    """
+    SQLite store in WAL mode; every batch is a single transaction. The file
+    can be shared by several worker processes: transaction() takes SQLite's
+    write lock up front (BEGIN IMMEDIATE), so concurrent read-modify-writes
+    from different workers queue up instead of overwriting each other.
+    """
+
+    def __init__(self, path, checkpoint_every=500):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self._writes_since_checkpoint = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load(self, namespace):
+        with self._lock:
+            return _SQLiteTransaction(self._conn).load(namespace)
+
+    def get(self, namespace, key):
+        with self._lock:
+            return _SQLiteTransaction(self._conn).get(namespace, key)
+
+    def write_batch(self, rows):
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    UPSERT_SQL,
+                    [(namespace, key, payload, now) for namespace, key, payload in rows]
+                )
+            self._count_writes(len(rows))
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield _SQLiteTransaction(self._conn)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+            self._count_writes(1)
+
+    def _count_writes(self, rows):
+        self._writes_since_checkpoint += rows
+        if self._writes_since_checkpoint >= self.checkpoint_every:
+            # Periodic compaction keeps the WAL file from growing unbounded
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._writes_since_checkpoint = 0
+
+    def compact(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+            self._writes_since_checkpoint = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JournalStore(HistoryStore):
+    """
+    Append-only JSON-lines journal. Each write appends one line per record;
+    loading replays the journal with last-write-wins. The journal is
+    rewritten as a snapshot once it holds too many superseded entries.
+    The journal belongs to one process; use SQLite to share history
+    between workers.
+    """
+
+    def __init__(self, path, compact_ratio=4, compact_min_entries=1000):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_entries = compact_min_entries
+        self._lock = threading.Lock()
+        self._records = {}
+        self._entries = 0
+        self._replay()
+        self._fp = open(self.path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append is skipped
+                    continue
+                self._records.setdefault(entry["ns"], {})[entry["key"]] = entry["value"]
+                self._entries += 1
+
+    def load(self, namespace):
+        with self._lock:
+            return {
+                key: json.loads(value)
+                for key, value in self._records.get(namespace, {}).items()
+            }
+
+    def get(self, namespace, key):
+        with self._lock:
+            payload = self._records.get(namespace, {}).get(key)
+        return json.loads(payload) if payload is not None else None
+
+    def write_batch(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            self._write_locked(rows)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            tx = _JournalTransaction(self._records)
+            yield tx
+            if tx.rows:
+                self._write_locked(tx.rows)
+
+    def _write_locked(self, rows):
+        lines = []
+        for namespace, key, payload in rows:
+            self._records.setdefault(namespace, {})[key] = payload
+            lines.append(json.dumps({"ns": namespace, "key": key, "value": payload}))
+        self._fp.write("\n".join(lines) + "\n")
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._entries += len(rows)
+
+        live = sum(len(records) for records in self._records.values())
+        if self._entries >= max(self.compact_min_entries, live * self.compact_ratio):
+            self._compact_locked()
+
+    def compact(self):
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for namespace, records in self._records.items():
+                for key, payload in records.items():
+                    f.write(json.dumps({"ns": namespace, "key": key, "value": payload}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._fp.close()
+        os.replace(tmp_path, self.path)
+        self._fp = open(self.path, 'a', encoding='utf-8')
+        self._entries = sum(len(records) for records in self._records.values())
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+class _JournalTransaction:
+    """Reads see the journal plus this transaction's own puts, which are appended on commit"""
+
+    def __init__(self, records):
+        self.records = records
+        self.pending = {}
+        self.rows = []
+
+    def get(self, namespace, key):
+        payload = self.pending.get((namespace, key), self.records.get(namespace, {}).get(key))
+        return json.loads(payload) if payload is not None else None
+
+    def load(self, namespace):
+        payloads = dict(self.records.get(namespace, {}))
+        payloads.update({key: payload for (ns, key), payload in self.pending.items() if ns == namespace})
+        return {key: json.loads(payload) for key, payload in payloads.items()}
+
+    def put(self, namespace, key, record):
+        payload = json.dumps(record)
+        self.pending[(namespace, key)] = payload
+        self.rows.append((namespace, key, payload))
+
+
+def open_store(path, backend=None):
+    """Create the history store selected by HISTORY_BACKEND (sqlite or journal)"""
+    backend = backend or os.getenv('HISTORY_BACKEND', 'sqlite')
+    if backend == 'journal':
+        return JournalStore(path)
+    if backend == 'sqlite':
+        return SQLiteStore(path)
+    raise ValueError(f"Unknown history backend: {backend}")
+
+
+def migrate_legacy_json(store, call_history_path=None, customer_history_path=None):
+    """
+    Import the old whole-file call_history.json / customer_history.json into
+    a store. Each file is imported once: a marker in the meta namespace
+    prevents re-imports. The legacy files are left in place.
+    """
+    migrated = store.load(META)
+    rows = []
+
+    call_marker = LEGACY_MIGRATION_KEY + ":" + CALLS
+    if call_history_path and call_marker not in migrated and os.path.exists(call_history_path):
+        with open(call_history_path, 'r') as f:
+            legacy_calls = json.load(f)
+        for call in legacy_calls.get("calls", []):
+            rows.append((CALLS, call["call_sid"], json.dumps(call)))
+        if legacy_calls.get("statistics"):
+            rows.append((META, "call_statistics", json.dumps(legacy_calls["statistics"])))
+        rows.append((META, call_marker, json.dumps({"path": call_history_path, "migrated_at": time.time()})))
+
+    customer_marker = LEGACY_MIGRATION_KEY + ":" + CUSTOMERS
+    if customer_history_path and customer_marker not in migrated and os.path.exists(customer_history_path):
+        with open(customer_history_path, 'r') as f:
+            legacy_customers = json.load(f)
+        for customer_key, record in legacy_customers.items():
+            rows.append((CUSTOMERS, customer_key, json.dumps(record)))
+        rows.append((META, customer_marker, json.dumps({"path": customer_history_path, "migrated_at": time.time()})))
+
+    store.write_batch(rows)
+    return bool(rows)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 5 or sys.argv[1] != "migrate":
+        print("Usage: python history_store.py migrate <store_path> <call_history.json> <customer_history.json>")
+        sys.exit(1)
+
+    target = open_store(sys.argv[2])
+    if migrate_legacy_json(target, sys.argv[3], sys.argv[4]):
+        print(f"Migrated legacy history into {sys.argv[2]}")
+    else:
+        print(f"Nothing to migrate into {sys.argv[2]}")
+    target.close()
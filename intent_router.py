@@ -0,0 +1,391 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from metrics import registry
+
+# "Wiener Schnitzel – £12.99" or "Paulaner Helles – £3.99 (500ml)"
+ITEM_RE = re.compile(r"^(?P<name>.+?)\s+[–—-]\s+£(?P<price>\d+(?:\.\d{1,2})?)(?:\s*\((?P<size>[^)]*)\))?\s*$")
+LIST_PREFIX_RE = re.compile(r"^(?:\d+\.|•|\*|-)\s*")
+HEADER_RE = re.compile(r"^([A-Z][^:.!?£]{1,40}):$")
+FACT_RE = re.compile(r"^([A-Z][^:.!?£]{1,30}):\s+(.+)$")
+WORD_RE = re.compile(r"[a-z0-9£']+")
+
+# Weighted cue phrases per intent; phrases are matched as word n-grams. Generic words ("where",
+# "pay", "cancel", "card") weigh less than min_score, so each needs a second, intent-specific cue
+INTENT_CUES = {
+    "price": {"how much": 2, "price": 2, "price of": 1, "cost": 2, "pound": 1, "expensive": 1, "cheap": 1},
+    "describe": {"what is": 1, "what's": 1, "tell me about": 2, "describe": 2, "come with": 2,
+                 "served with": 2, "what's in": 2},
+    "menu": {"menu": 1.5, "what": 0.5, "which": 0.5, "have": 0.5, "serve": 1, "option": 1, "choice": 1,
+             "list": 1, "kind of": 1},
+    "cancellation": {"cancel": 1, "cancellation": 2, "no show": 2, "fee": 1, "cancel late": 2,
+                     "if i cancel": 1.5},
+    "reservations": {"need to book": 2.5, "have to book": 2.5, "reservation": 1.5, "walk in": 2.5, "walk ins": 2.5,
+                     "group booking": 2.5, "in advance": 1.5, "large group": 2},
+    "dress_code": {"dress": 2, "wear": 2, "attire": 2, "clothe": 2, "smart": 1, "lederhosen": 2, "dirndl": 2},
+    "payment": {"pay": 1, "pay with": 1.5, "pay by": 1.5, "payment": 2, "card": 1, "take card": 1.5,
+                "accept card": 1.5, "credit card": 1.5, "debit card": 1.5, "cash": 2, "contactless": 2, "amex": 2,
+                "american express": 2, "visa": 2, "mastercard": 2},
+    "pets": {"dog": 2, "pet": 2, "cat": 2, "puppy": 2},
+    "children": {"kid": 2, "child": 2, "children": 2, "high chair": 2, "baby": 1.5, "toddler": 2, "family": 1},
+    "accessibility": {"wheelchair": 2, "accessible": 2, "disabled": 2, "accessibility": 2, "step free": 2,
+                      "ramp": 2},
+    "hours": {"open": 2, "opening": 2, "close": 2, "closing": 2, "hour": 2, "what time": 1},
+    "address": {"where": 1, "where are you": 2, "address": 2, "located": 2, "location": 2, "postcode": 2,
+                "find you": 2, "direction": 2},
+    "phone": {"phone number": 2.5, "phone": 1.5, "number": 1, "call you": 1.5, "ring you": 1.5},
+    "email": {"email": 3.5, "e mail": 3.5},
+    # Recognized only so they aren't mistaken for the intents above; always left to the LLM
+    "booking": {"book a table": 3, "book": 1.5, "table for": 3, "reserve": 2, "like to book": 3, "tonight": 1,
+                "tomorrow": 1, "people": 1, "cancel my": 3, "my booking": 2, "my reservation": 2, "change": 1},
+    "complaint": {"complain": 3, "complaint": 3, "manager": 2, "refund": 3, "rude": 2, "cold": 1, "wrong": 1.5},
+    "advice": {"recommend": 3, "suggest": 3, "best": 1.5, "popular": 2, "vegetarian": 2.5, "vegan": 2.5,
+               "gluten": 2.5, "allergy": 3, "allergic": 3, "nut": 2, "halal": 2.5},
+}
+LLM_ONLY = {"booking", "complaint", "advice"}
+# Intents that can't be answered without a slot don't compete without it; a filled slot is evidence for them
+SLOT_BONUS = {"describe": ("items", 1.0), "menu": ("category", 1.5)}
+
+# Document sections answering each policy-style intent, and the bullet to pick within a shared section
+TOPIC_SECTIONS = {
+    "cancellation": (r"cancellation", None),
+    "reservations": (r"reservation", None),
+    "dress_code": (r"\bdress", None),
+    "payment": (r"payment", None),
+    "pets": (r"pet", r"\bpets?\b"),
+    "children": (r"child|kid", r"\b(?:kid|children|child)"),
+    "accessibility": (r"accessib", None),
+    "hours": (r"hours|opening", None),
+}
+CATEGORY_WORDS = {
+    "appetizer": ("appetizer", "starter", "nibble", "snack"),
+    "main": ("main", "main course", "entree"),
+    "dessert": ("dessert", "pudding", "sweet", "afters"),
+    "beer": ("beer", "lager", "drink", "ale", "pint"),
+}
+
+# Questions leaning on earlier turns ("how much is it?") need the conversation, so the LLM
+CONTEXT_WORDS = {"that", "this", "those", "these", "they", "them", "one", "he", "she"}
+EMOTION_FLAGS = ("angry", "frustrated", "urgent", "is_shouting")
+NAME_STOPWORDS = {"with", "and", "the", "of", "a"}
+
+# Keypad shortcuts for Gather(input='speech dtmf'); label, intent, slots
+DTMF_SHORTCUTS = {
+    "1": ("our main dishes", "menu", {"category": "main"}),
+    "2": ("our beers", "menu", {"category": "beer"}),
+    "3": ("desserts", "menu", {"category": "dessert"}),
+    "4": ("our cancellation policy", "cancellation", {}),
+    "5": ("our address and phone number", "contact", {}),
+}
+DTMF_HELP_DIGIT = "0"
+
+
+def fold(text):
+    """Lowercase without accents, so 'Jägerschnitzel' from the document meets 'jagerschnitzel' from speech"""
+    text = unicodedata.normalize("NFKD", text.lower().replace("ß", "ss"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def words(text):
+    result = []
+    for word in WORD_RE.findall(fold(text).replace("-", " ")):
+        word = word.strip("'")
+        # Cheap plural folding, as in retrieval.tokenize
+        if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "'s")):
+            word = word[:-1]
+        if word:
+            result.append(word)
+    return result
+
+
+def ngrams(tokens, n=3):
+    return {" ".join(tokens[i:i + size]) for size in range(1, n + 1) for i in range(len(tokens) - size + 1)}
+
+
+def compile_cues(cue_table=INTENT_CUES):
+    """One n-gram -> {intent: weight} table, with phrases tokenized the same way as utterances"""
+    cues = {}
+    for intent, phrases in cue_table.items():
+        for phrase, weight in phrases.items():
+            cues.setdefault(" ".join(words(phrase)), {})[intent] = weight
+    return cues
+
+
+CUES = compile_cues()
+
+
+def cue_scores(text, grams=None):
+    """{intent: summed cue weight} for an utterance, before any slots are filled"""
+    scores = {}
+    for gram in grams if grams is not None else ngrams(words(text)):
+        for intent, weight in CUES.get(gram, {}).items():
+            scores[intent] = scores.get(intent, 0.0) + weight
+    return scores
+
+
+def sentences(text, limit):
+    return " ".join(re.split(r"(?<=[.!?])\s+", text.strip())[:limit])
+
+
+def spoken_list(names):
+    return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+
+@dataclass(slots=True)
+class MenuItem:
+    name: str
+    price: str
+    category: str
+    size: str = None
+    description: str = ""
+    aliases: list = field(default_factory=list)
+
+    @property
+    def spoken_name(self):
+        return self.aliases[0] if self.aliases else self.name
+
+    def price_text(self):
+        return f"£{self.price}" + (f" for {self.size}" if self.size else "")
+
+
+class RestaurantIndex:
+    """
+    Menu items with prices, document sections and "Key: value" facts,
+    parsed from the restaurant document lines (the same lines the retrieval
+    index is built from).
+    """
+
+    def __init__(self, items=(), sections=None, facts=None):
+        self.items = list(items)
+        self.sections = sections or {}
+        self.facts = facts or {}
+        self.categories = {}
+        for item in self.items:
+            self.categories.setdefault(item.category, []).append(item)
+
+    @classmethod
+    def from_lines(cls, lines):
+        items, sections, facts = [], {}, {}
+        header, previous_item = None, None
+        for paragraph in lines:
+            for line in paragraph.split("\n"):
+                line = LIST_PREFIX_RE.sub("", line.strip()).strip()
+                if not line or set(line) <= set("_-—"):
+                    continue
+                item = ITEM_RE.match(line)
+                if item:
+                    full_name = item.group("name").strip()
+                    # "Käsespätzle (Cheese Noodles)": the parenthesis is an alias callers may use
+                    aliases = re.findall(r"\(([^)]*)\)", full_name)
+                    name = re.sub(r"\s*\([^)]*\)", "", full_name).strip()
+                    previous_item = MenuItem(name, item.group("price"), header or "Menu", item.group("size"),
+                                             aliases=[name] + aliases)
+                    items.append(previous_item)
+                    continue
+                match = HEADER_RE.match(line)
+                if match:
+                    header, previous_item = match.group(1), None
+                    sections.setdefault(header, [])
+                    continue
+                if previous_item is not None and not previous_item.description:
+                    previous_item.description = line
+                    continue
+                match = FACT_RE.match(line)
+                if match:
+                    facts[match.group(1).lower()] = match.group(2).strip()
+                if header is not None:
+                    sections[header].append(line)
+                    facts.setdefault(header.lower(), line)
+        return cls(items, sections, facts)
+
+    def section(self, pattern):
+        for header, lines in self.sections.items():
+            if lines and re.search(pattern, header, re.IGNORECASE):
+                return lines
+        return None
+
+    def fact(self, *keys):
+        for key in keys:
+            for name, value in self.facts.items():
+                if key in name:
+                    return value
+        return None
+
+
+@dataclass(slots=True)
+class RoutedAnswer:
+    intent: str
+    text: str
+    confidence: float
+    slots: dict = field(default_factory=dict)
+
+
+class IntentRouter:
+    """
+    Answers structured questions (prices, policies, contact details) from a
+    RestaurantIndex without calling the LLM.
+
+    Cue phrases are compiled at startup into one n-gram -> {intent: weight}
+    table, so classifying an utterance is a tokenize plus a dict lookup per
+    n-gram. Menu items are found the same way, from their names and
+    aliases. An answer is only given when the winning intent clears
+    min_score, beats the runner-up by margin and has its slots filled;
+    anything conversational, emotional, referring to earlier turns, or
+    about bookings, complaints or advice falls through to the LLM.
+    """
+
+    def __init__(self, index, min_score=2.0, margin=1.0, max_words=25):
+        self.index = index
+        self.min_score = min_score
+        self.margin = margin
+        self.max_words = max_words
+        self._category_words = {}
+        for category in index.categories:
+            for key, synonyms in CATEGORY_WORDS.items():
+                if key in " ".join(words(category)):
+                    for synonym in synonyms:
+                        self._category_words[" ".join(words(synonym))] = category
+        self._item_names = {}
+        for item in index.items:
+            for alias in item.aliases:
+                tokens = [token for token in words(alias) if token not in NAME_STOPWORDS]
+                if tokens:
+                    self._item_names.setdefault(" ".join(tokens), []).append((item, len(tokens)))
+
+        registry.describe("intent_router_answers_total", "Turns answered by the intent router without the LLM")
+        registry.describe("intent_router_fallthrough_total", "Turns the intent router left to the LLM")
+
+    def classify(self, text):
+        """(scores by intent, slots, n-grams) for an utterance"""
+        tokens = words(text)
+        grams = ngrams(tokens)
+        scores = cue_scores(text, grams)
+        slots = {}
+        items = self._match_items(tokens, grams)
+        if items:
+            slots["items"] = items
+        for gram in grams:
+            category = self._category_words.get(gram)
+            if category:
+                slots["category"] = category
+                break
+        return scores, slots, grams
+
+    def _match_items(self, tokens, grams):
+        # Best-covered menu items: the share of an item name's words that were said
+        best, matches = 0.0, []
+        for name, entries in self._item_names.items():
+            said = [token for token in name.split() if token in grams]
+            # "beer" alone names a category, not the Wheat Beer
+            if not said or all(token in self._category_words for token in said):
+                continue
+            for item, length in entries:
+                coverage = len(said) / length
+                if coverage > best:
+                    best, matches = coverage, [item]
+                elif coverage == best and item not in matches:
+                    matches.append(item)
+        return matches if best >= 0.5 and len(matches) <= 3 else []
+
+    def answer(self, text, emotions=None):
+        """A RoutedAnswer if the question can be answered from the index with confidence, else None"""
+        routed = self._answer(text, emotions or {})
+        registry.inc("intent_router_answers_total" if routed else "intent_router_fallthrough_total")
+        return routed
+
+    def _answer(self, text, emotions):
+        if any(emotions.get(flag) for flag in EMOTION_FLAGS):
+            return None
+        tokens = words(text)
+        if not tokens or len(tokens) > self.max_words or CONTEXT_WORDS & set(tokens):
+            return None
+        scores, slots, _ = self.classify(text)
+        for intent, (slot, bonus) in SLOT_BONUS.items():
+            if slot in slots:
+                scores[intent] = scores.get(intent, 0.0) + bonus
+        if "items" not in slots:
+            scores.pop("price", None)
+            scores.pop("describe", None)
+        if "category" not in slots or "items" in slots:
+            scores.pop("menu", None)
+        if not scores:
+            return None
+        ranked = sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+        intent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if intent in LLM_ONLY or score < self.min_score or score - runner_up < self.margin:
+            return None
+        reply = self.render(intent, slots)
+        return RoutedAnswer(intent, reply, score - runner_up, slots) if reply else None
+
+    def render(self, intent, slots):
+        """Spoken answer for intent from the index, or None if the slots or the data are missing"""
+        index = self.index
+        items = slots.get("items") or []
+        if intent == "price":
+            if not items:
+                return None
+            reply = spoken_list([f"the {item.spoken_name} is {item.price_text()}" for item in items])
+            return reply[0].upper() + reply[1:] + "."
+        if intent == "describe":
+            if len(items) != 1:
+                return None
+            item = items[0]
+            return f"The {item.spoken_name} is {item.price_text()}. {sentences(item.description, 1)}".strip()
+        if intent == "menu":
+            category = slots.get("category")
+            if category is None or items:
+                return None
+            names = [item.spoken_name for item in index.categories.get(category, [])]
+            return f"Our {category.lower()} are {spoken_list(names)}." if names else None
+        if intent in TOPIC_SECTIONS:
+            header_pattern, bullet_pattern = TOPIC_SECTIONS[intent]
+            lines = index.section(header_pattern)
+            if not lines:
+                return None
+            if bullet_pattern:
+                lines = [line for line in lines if re.search(bullet_pattern, line, re.IGNORECASE)]
+            return sentences(" ".join(lines), 3) or None
+        if intent == "address":
+            address = index.fact("address")
+            return f"We're at {address}." if address else None
+        if intent == "phone":
+            phone = index.fact("phone")
+            return f"You can reach us on {phone}." if phone else None
+        if intent == "email":
+            email = index.fact("email")
+            return f"Our email address is {email}." if email else None
+        if intent == "contact":
+            parts = [self.render("address", {}), self.render("phone", {})]
+            return " ".join(part for part in parts if part) or None
+        return None
+
+    def answer_digits(self, digits):
+        """Spoken answer for a keypad shortcut, the list of shortcuts for 0, or None"""
+        digits = (digits or "").strip().rstrip("#")
+        if digits == DTMF_HELP_DIGIT:
+            return self.shortcut_help()
+        shortcut = DTMF_SHORTCUTS.get(digits)
+        if shortcut is None:
+            return None
+        _, intent, slots = shortcut
+        slots = dict(slots)
+        if "category" in slots:
+            slots["category"] = self._category_words.get(slots["category"])
+        reply = self.render(intent, slots)
+        if reply:
+            registry.inc("intent_router_answers_total")
+        return reply
+
+    def shortcut_help(self):
+        options = []
+        for digit, (label, intent, slots) in sorted(DTMF_SHORTCUTS.items()):
+            slots = dict(slots)
+            if "category" in slots:
+                slots["category"] = self._category_words.get(slots["category"])
+            if self.render(intent, slots):
+                options.append(f"{digit} for {label}")
+        if not options:
+            return None
+        return f"You can press {spoken_list(options)}, or just ask me your question."
@@ -0,0 +1,376 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import registry
+
+# Spoken when no model can answer at all, so the caller hears something useful instead of silence
+DEGRADED_UTTERANCE = (
+    "I'm sorry, I'm having trouble with our system right now. "
+    "Please try again in a few minutes, or stay on the line and I'll do my best to help."
+)
+
+# Bounds of a single attempt, from a fast fallback model up to a slow primary
+ATTEMPT_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+
+
+class LLMUnavailable(Exception):
+    """No model produced a reply before the deadline, or every circuit breaker is open"""
+
+
+def counts_as_failure(error):
+    # A rejected request (bad input, auth) says nothing about the service's health
+    status = getattr(error, 'status_code', None)
+    return status is None or status >= 500 or status in (408, 409, 429)
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a model after failure_threshold consecutive
+    failures. Once reset_timeout has passed a single trial request is let
+    through (half-open); its success closes the breaker, its failure opens
+    it for another reset_timeout. A trial that ends without telling either
+    way (cancelled, or rejected as a bad request) is released, so the next
+    request becomes the trial.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self._trial else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and self.clock() - self.opened_at >= self.reset_timeout:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"LLM circuit breaker for {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release_trial(self):
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures < self.failure_threshold:
+                return
+            if self.opened_at is None or self._trial:
+                registry.inc("llm_breaker_opened_total")
+                print(f"LLM circuit breaker for {self.name} open after {self.failures} failures")
+            self.opened_at = self.clock()
+            self._trial = False
+
+
+class ResilientLLM:
+    """
+    Chat completions with a deadline, hedging and circuit breakers.
+
+    Each call goes to the primary model first. If it hasn't answered after
+    hedge_after seconds, or fails before then, the same request is sent to
+    the fallback model and whichever answers first wins. Every attempt is
+    bounded by the call's deadline. A model whose breaker is open is
+    skipped; when no model can be tried, or none answers in time, the call
+    raises LLMUnavailable and the caller answers in degraded mode.
+
+    The deadline defaults to 10s so a reply still fits in Twilio's 15s
+    webhook timeout. The OpenAI clients are created lazily in the process that uses them,
+    with a sized keep-alive pool and the SDK's own retries turned off,
+    since those would run past the deadline.
+    """
+
+    def __init__(self, api_key=None, model="gpt-4", fallback_model="gpt-3.5-turbo", deadline=10.0, hedge_after=3.0,
+                 max_connections=50, max_workers=16, failure_threshold=5, reset_timeout=30.0):
+        self.api_key = api_key
+        self.model = model
+        self.fallback_model = fallback_model or None
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.max_connections = max_connections
+        self.max_workers = max_workers
+        self.breakers = {
+            name: CircuitBreaker(name, failure_threshold, reset_timeout)
+            for name in (model, self.fallback_model) if name
+        }
+        self._client = None
+        self._async_client = None
+        self._pid = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+        registry.histogram("llm_attempt_seconds", "Duration of one LLM request by model and outcome", ATTEMPT_BUCKETS)
+        registry.describe("llm_hedged_requests_total", "Requests duplicated to the fallback model after hedge_after")
+        registry.describe("llm_failovers_total", "Requests sent to the fallback model after the primary failed")
+        registry.describe("llm_breaker_opened_total", "Times an LLM circuit breaker opened")
+        registry.describe("llm_degraded_replies_total", "Turns answered with the canned degraded-mode reply")
+        registry.set_gauge("llm_breakers_open", lambda: sum(b.opened_at is not None for b in self.breakers.values()))
+
+    @classmethod
+    def from_env(cls, api_key=None):
+        return cls(
+            api_key=api_key,
+            model=os.getenv('LLM_MODEL', 'gpt-4'),
+            fallback_model=os.getenv('LLM_FALLBACK_MODEL', 'gpt-3.5-turbo'),
+            # LLM_REQUEST_TIMEOUT is the older name for the deadline
+            deadline=float(os.getenv('LLM_DEADLINE', os.getenv('LLM_REQUEST_TIMEOUT', '10'))),
+            hedge_after=float(os.getenv('LLM_HEDGE_AFTER', '3.0')),
+            max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', '50')),
+            max_workers=int(os.getenv('LLM_WORKERS', '16')),
+            failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+            reset_timeout=float(os.getenv('LLM_BREAKER_COOLDOWN', '30')),
+        )
+
+    def _check_pid(self):
+        # Connections and threads don't survive a fork; start over in the child
+        if self._pid != os.getpid():
+            self._client = self._async_client = self._executor = None
+            self._pid = os.getpid()
+
+    @property
+    def client(self):
+        with self._lock:
+            self._check_pid()
+            if self._client is None:
+                import httpx
+                from openai import OpenAI, DefaultHttpxClient
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                self._client = OpenAI(api_key=self.api_key, max_retries=0, timeout=self.deadline,
+                                      http_client=DefaultHttpxClient(limits=limits))
+            return self._client
+
+    @client.setter
+    def client(self, client):
+        with self._lock:
+            self._check_pid()
+            self._client = client
+
+    @property
+    def async_client(self):
+        with self._lock:
+            self._check_pid()
+            if self._async_client is None:
+                import httpx
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                self._async_client = AsyncOpenAI(api_key=self.api_key, max_retries=0, timeout=self.deadline,
+                                                 http_client=DefaultAsyncHttpxClient(limits=limits))
+            return self._async_client
+
+    @async_client.setter
+    def async_client(self, client):
+        with self._lock:
+            self._check_pid()
+            self._async_client = client
+
+    @property
+    def executor(self):
+        with self._lock:
+            self._check_pid()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+            return self._executor
+
+    def _candidates(self):
+        return [name for name in (self.model, self.fallback_model) if name]
+
+    def _next_model(self, candidates):
+        # Asking a breaker may use up its half-open trial, so only ask when about to send
+        while candidates:
+            model = candidates.pop(0)
+            if self.breakers[model].allow():
+                return model
+        return None
+
+    def _settle(self, model, started, error=None):
+        breaker = self.breakers[model]
+        cancelled = isinstance(error, asyncio.CancelledError)
+        if error is None:
+            breaker.record_success()
+        elif cancelled or not counts_as_failure(error):
+            # Says nothing about the model's health, but must not hold on to a half-open trial
+            breaker.release_trial()
+        else:
+            breaker.record_failure()
+        outcome = "ok" if error is None else "cancelled" if cancelled else "error"
+        registry.observe_histogram("llm_attempt_seconds", time.perf_counter() - started,
+                                   (("model", model), ("outcome", outcome)))
+
+    def _attempt(self, client, model, messages, params, deadline):
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(
+                model=model, messages=messages, timeout=max(0.1, deadline - time.monotonic()), **params
+            )
+        except Exception as e:
+            self._settle(model, started, e)
+            raise
+        self._settle(model, started)
+        return response
+
+    async def _attempt_async(self, client, model, messages, params, deadline):
+        started = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=model, messages=messages, timeout=max(0.1, deadline - time.monotonic()), **params
+            )
+        except (Exception, asyncio.CancelledError) as e:
+            # The losing attempt of a hedged call is cancelled
+            self._settle(model, started, e)
+            raise
+        self._settle(model, started)
+        return response
+
+    def complete(self, messages, **params):
+        """The first successful response from the primary or its hedge; raises LLMUnavailable"""
+        started = time.monotonic()
+        deadline, hedge_at = started + self.deadline, started + self.hedge_after
+        client = self.client
+        candidates = self._candidates()
+        attempts, errors = {}, []
+
+        def launch():
+            hedging = bool(attempts)
+            model = self._next_model(candidates)
+            if model is not None:
+                attempts[self.executor.submit(self._attempt, client, model, messages, params, deadline)] = model
+                if model != self.model:
+                    registry.inc("llm_hedged_requests_total" if hedging else "llm_failovers_total")
+            return model
+
+        if launch() is None:
+            raise LLMUnavailable("every model's circuit breaker is open")
+        while attempts:
+            until = min(hedge_at, deadline) if candidates else deadline
+            done, _ = wait(attempts, timeout=max(0.0, until - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                model = attempts.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{model}: {e}")
+            now = time.monotonic()
+            if candidates and now < deadline and (not attempts or now >= hedge_at):
+                launch()
+            elif not done and now >= deadline:
+                break
+        # Attempts still running end on their own request timeout, which is the deadline
+        raise LLMUnavailable("; ".join(errors) or f"no reply within {self.deadline}s")
+
+    async def complete_async(self, messages, **params):
+        """complete() for the event loop; the losing attempt is cancelled"""
+        started = time.monotonic()
+        deadline, hedge_at = started + self.deadline, started + self.hedge_after
+        client = self.async_client
+        candidates = self._candidates()
+        attempts, errors = {}, []
+
+        def launch():
+            hedging = bool(attempts)
+            model = self._next_model(candidates)
+            if model is not None:
+                task = asyncio.ensure_future(self._attempt_async(client, model, messages, params, deadline))
+                attempts[task] = model
+                if model != self.model:
+                    registry.inc("llm_hedged_requests_total" if hedging else "llm_failovers_total")
+            return model
+
+        if launch() is None:
+            raise LLMUnavailable("every model's circuit breaker is open")
+        try:
+            while attempts:
+                until = min(hedge_at, deadline) if candidates else deadline
+                done, _ = await asyncio.wait(attempts, timeout=max(0.0, until - time.monotonic()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model = attempts.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        errors.append(f"{model}: {e}")
+                now = time.monotonic()
+                if candidates and now < deadline and (not attempts or now >= hedge_at):
+                    launch()
+                elif not done and now >= deadline:
+                    break
+            raise LLMUnavailable("; ".join(errors) or f"no reply within {self.deadline}s")
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def stream(self, messages, **params):
+        """
+        Open a streamed completion, failing over to the fallback model if the
+        primary can't be reached. Streams aren't hedged: a duplicate would
+        have to be consumed to the end to be of any use.
+
+        The whole stream, not just opening it, must finish within the
+        deadline. Its breaker is settled when the stream ends, fails, runs
+        past the deadline or is closed early, so a half-open trial is held
+        until then.
+        """
+        deadline = time.monotonic() + self.deadline
+        client = self.client
+        candidates = self._candidates()
+        errors = []
+        while True:
+            model = self._next_model(candidates)
+            if model is None:
+                raise LLMUnavailable("; ".join(errors) or "every model's circuit breaker is open")
+            if errors:
+                registry.inc("llm_failovers_total")
+            started = time.perf_counter()
+            try:
+                stream = client.chat.completions.create(
+                    model=model, messages=messages, stream=True, timeout=max(0.1, deadline - time.monotonic()),
+                    **params
+                )
+            except Exception as e:
+                self._settle(model, started, e)
+                errors.append(f"{model}: {e}")
+                continue
+            return self._settled_stream(stream, model, started, deadline)
+
+    def _settled_stream(self, stream, model, started, deadline):
+        error = None
+        try:
+            for chunk in stream:
+                if time.monotonic() > deadline:
+                    raise LLMUnavailable(f"{model}: stream ran past the {self.deadline}s deadline")
+                yield chunk
+        except GeneratorExit as e:
+            # Closed by the reader before the end; says nothing about the model's health
+            error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._settle(model, started, error)
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
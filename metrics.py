@@ -0,0 +1,120 @@
+import bisect
+import threading
+
+# Upper bounds in seconds, from cache hits up to slow LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics: counters, gauges, summaries and labelled
+    histograms, rendered in the Prometheus text format for the /metrics
+    endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._histograms = {}
+        self._buckets = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def set_gauge(self, name, value_or_fn):
+        """Set a gauge to a value, or to a callable evaluated at render time"""
+        with self._lock:
+            self._gauges[name] = value_or_fn
+
+    def observe(self, name, value):
+        with self._lock:
+            summary = self._summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def histogram(self, name, help_text=None, buckets=DEFAULT_BUCKETS):
+        """Declare the bucket bounds of a histogram before observing it"""
+        self._buckets[name] = tuple(sorted(buckets))
+        if help_text:
+            self.describe(name, help_text)
+
+    def observe_histogram(self, name, value, labels=()):
+        """Record value in histogram name; labels is a tuple of (label, value) pairs"""
+        buckets = self._buckets.get(name) or self._buckets.setdefault(name, DEFAULT_BUCKETS)
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = {"counts": [0] * (len(buckets) + 1), "sum": 0.0}
+            histogram["counts"][index] += 1
+            histogram["sum"] += value
+
+    def snapshot(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+            snapshot = {
+                "counters": dict(self._counters),
+                "summaries": {name: dict(summary) for name, summary in self._summaries.items()},
+                "histograms": {
+                    name: {
+                        labels: {"counts": list(histogram["counts"]), "sum": histogram["sum"]}
+                        for labels, histogram in series.items()
+                    }
+                    for name, series in self._histograms.items()
+                }
+            }
+        snapshot["gauges"] = {
+            name: value() if callable(value) else value
+            for name, value in gauges.items()
+        }
+        return snapshot
+
+    def render_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+
+        def header(name, metric_type):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for name, value in sorted(snapshot["counters"].items()):
+            header(name, "counter")
+            lines.append(f"{name} {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            header(name, "gauge")
+            lines.append(f"{name} {value}")
+        for name, summary in sorted(snapshot["summaries"].items()):
+            header(name, "summary")
+            lines.append(f"{name}_count {summary['count']}")
+            lines.append(f"{name}_sum {summary['sum']}")
+            lines.append(f"{name}_max {summary['max']}")
+        for name, series in sorted(snapshot["histograms"].items()):
+            header(name, "histogram")
+            bounds = [str(bound) for bound in self._buckets[name]] + ["+Inf"]
+            for labels, histogram in sorted(series.items()):
+                label_text = "".join(f'{key}="{value}",' for key, value in labels)
+                cumulative = 0
+                for bound, count in zip(bounds, histogram["counts"]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_text}le="{bound}"}} {cumulative}')
+                suffix = "{" + label_text.rstrip(",") + "}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {histogram['sum']}")
+                lines.append(f"{name}_count{suffix} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,213 @@
+from datetime import datetime
+
+import pytz
+
+# Used when no restaurant document is available
+SAMPLE_RESTAURANT_DATA = """
+________________________________________
+Restaurant Name:
+The Bavarian Bierhaus
+Address:
+22 Beer Street, Leeds, LS1 1AA, UK
+Contact Information:
+•	Phone: +44 113 234 5678
+•	Email: info@bavarianbierhaus.com
+•	Website: www.bavarianbierhaus.com
+•	Social Media: @BavarianBierhaus (Instagram, Twitter, Facebook)
+________________________________________
+Restaurant Overview:
+The Bavarian Bierhaus is a modern homage to the Bavarian beer halls of Munich, located in the heart of Leeds. Offering a warm, welcoming atmosphere, we provide guests with an authentic taste of German cuisine, from hearty sausages and schnitzels to the finest German lagers and weissbiers. Designed to replicate the rustic charm of a traditional beer garden, The Bavarian Bierhaus boasts wooden beams, long communal tables, and iconic Bavarian decor such as blue and white checkered flags. Our mission is to bring the best of Bavarian hospitality to the UK with every dish and drink we serve.
+________________________________________
+Restaurant Design and Ambiance:
+•	Interior: The inside features warm wood paneling, candlelit chandeliers, and rustic brick walls adorned with Bavarian artwork and vintage beer signs. The setting is designed to transport guests straight to Bavaria, creating an immersive atmosphere that pairs perfectly with the German beers and traditional dishes on offer.
+•	Outdoor Beer Garden: The Bierhaus also has a large outdoor seating area, perfect for those who wish to enjoy a refreshing beer or cocktail while soaking in the ambiance. The garden is adorned with large parasols and heaters, allowing guests to enjoy their meals year-round.
+•	Music and Entertainment: Live German folk bands perform every Friday and Saturday evening, adding to the festive atmosphere. During special events, such as Oktoberfest, the Bierhaus hosts lively traditional Bavarian music, dancing, and competitions.
+________________________________________
+History of Bavarian Cuisine:
+Bavarian cuisine is deeply rooted in tradition, with hearty meals designed to satisfy after a long day of work or outdoor activity. The emphasis is on quality meats, fresh ingredients, and dishes designed to be enjoyed with family and friends. Some of the most iconic foods, such as Wiener Schnitzel, Bratwurst, and Sauerbraten, have centuries-old origins and have evolved into staples of the Bavarian food scene.
+•	Sauerbraten: One of Bavaria's most beloved dishes, Sauerbraten is a pot roast that is marinated for several days before being slow-cooked to perfection. The dish is served with potato dumplings or boiled potatoes and red cabbage, creating a satisfying balance of flavors.
+•	Pretzels (Brezn): German pretzels are another hallmark of Bavarian cuisine, often served as an appetizer alongside sausages or as a snack with mustard. The pretzel's signature twisted shape comes from its ancient origins, dating back to early Christian times.
+________________________________________
+Restaurant Policies:
+Reservation Policy:
+We encourage our guests to book a table, especially for weekends, holidays, and special events. Reservations can be made online via our website or by calling the restaurant directly. Group bookings of 8 or more people must be made at least 48 hours in advance to ensure availability.
+Cancellation Policy:
+A 24-hour cancellation notice is required for all reservations. Cancellations within 24 hours will incur a £10 cancellation fee per person, while no-shows will be charged £15 per person.
+Dress Code:
+Casual attire is welcome, but for an authentic Bavarian experience, we encourage guests to wear traditional German clothing (lederhosen or dirndls) on special themed nights or for Oktoberfest.
+Payment Methods:
+We accept all major credit cards (Visa, MasterCard, American Express), debit cards, and cash. Contactless payments are also available for a quicker checkout process.
+Children and Pets:
+•	We offer a kid-friendly menu and high chairs for families. Children under the age of 5 eat for free when accompanied by an adult.
+•	Well-behaved pets are welcome in our outdoor beer garden. Please keep them on a leash and be mindful of other guests.
+Accessibility:
+The Bavarian Bierhaus is wheelchair accessible. We also have accessible restrooms for our guests’ convenience.
+________________________________________
+Menu Details:
+Appetizers:
+1.	Pretzel with Mustard – £3.99
+A classic German starter, our soft, freshly baked pretzel is served with a rich, tangy mustard. The perfect way to start your Bavarian journey!
+2.	Bratwurst with Sauerkraut – £5.99
+Juicy, grilled bratwurst sausages paired with homemade sauerkraut. This combination is a German staple, loved for its smoky, spicy flavor and crunchy texture.
+3.	Käsespätzle (Cheese Noodles) – £6.49
+Our take on macaroni and cheese, this dish features homemade spätzle (soft egg noodles) drenched in melted Swiss cheese and topped with crispy fried onions. A comfort food favorite!
+4.	Sauerbraten Meatballs (Königsberger Klopse) – £6.99
+Savory meatballs made with ground beef and pork, served in a rich, creamy gravy with capers. This dish originates from East Prussia and has been a part of German cuisine for centuries.
+5.	Obatzda (Bavarian Cheese Dip) – £4.49
+This creamy cheese dip is a popular Bavarian snack, combining soft cheese with butter, paprika, and other spices. Served with crusty bread or crackers for dipping.
+________________________________________
+Main Dishes:
+1.	Wiener Schnitzel – £12.99
+This traditional Viennese dish consists of a tender, breaded, and fried veal cutlet, served with mashed potatoes and cranberry sauce. A favorite throughout Germany and Austria, it’s perfect for meat lovers.
+2.	Jägerschnitzel (Hunter's Schnitzel) – £13.99
+A variation of the Wiener Schnitzel, this dish is topped with a rich and flavorful mushroom sauce. It’s a savory, comforting meal, best enjoyed with fries or spätzle.
+3.	Sauerbraten (German Pot Roast) – £14.49
+A slow-braised beef dish marinated for several days in a mixture of vinegar, wine, and spices. Served with potato dumplings and red cabbage, this dish offers a perfect balance of sweet, tangy, and savory flavors.
+4.	Bratwurst Platter – £11.99
+Enjoy a sampling of various traditional sausages, including bratwurst, currywurst, and weisswurst. Served with potato salad, sauerkraut, and mustard, it’s a hearty and satisfying meal.
+5.	Kasseler Rippchen (Smoked Pork Chops) – £15.49
+Smoky, tender pork chops, served with mashed potatoes, sauerkraut, and a tangy mustard sauce. The smokiness of the meat pairs perfectly with the acidity of the sauerkraut.
+________________________________________
+Desserts:
+1.	Apfelstrudel (Apple Strudel) – £4.99
+A warm pastry filled with spiced apples and raisins, served with a scoop of vanilla ice cream. It’s a sweet end to any Bavarian meal!
+2.	Black Forest Cake (Schwarzwälder Kirschtorte) – £5.49
+A rich chocolate cake layered with whipped cream, cherries, and Kirsch liqueur. This dessert is as iconic as it is indulgent.
+3.	Kaiserschmarrn (Shredded Pancake) – £5.49
+A fluffy, shredded pancake served with apple compote or plum jam. A true Bavarian classic, it's light and satisfying.
+________________________________________
+Drink Menu:
+Beers:
+1.	Krombacher Lager – £3.49 (330ml)
+A crisp, refreshing lager with a light malt flavor. Krombacher is one of Germany’s most well-known beer brands.
+2.	Paulaner Helles – £3.99 (500ml)
+A traditional Munich lager with a balanced taste of malt and hops, making it perfect for pairing with any dish.
+3.	Weissbier (Wheat Beer) – £4.99 (500ml)
+This wheat beer has a cloudy appearance and is known for its fruity aroma and smooth finish.
+4.	Augustiner Edelstoff – £4.49 (500ml)
+A smooth Munich lager with a mild, hoppy flavor and a slightly sweet aftertaste.
+________________________________________
+Testimonials:
+"A fantastic experience! The atmosphere felt just like a beer hall in Munich, and the food was absolutely delicious. Highly recommend the Wiener Schnitzel." – Sarah M.
+"The best German food I've had outside of Germany! The Sauerbraten was tender, and the pretzel was the perfect start." – John T.
+________________________________________
+Conclusion:
+The Bavarian Bierhaus is more than just a restaurant; it’s an experience. From our traditional German dishes to our world-class beer selection, we aim to transport our guests to the heart of Bavaria. Whether you’re here for a quick bite or a long evening with friends, we guarantee a memorable experience every time.
+"""
+
+PERSONA = "You are James, a knowledgeable restaurant assistant for our establishment."
+
+GUIDELINES = """Key Guidelines:
+1. Speak naturally and warmly like a real person
+2. Never direct customers to check websites or other sources
+3. Only provide information that exists in the restaurant data
+4. If information isn't in the reference data, politely say you'll check with the team
+5. Don't repeat phrases unless specifically asked
+6. Maintain conversation context and reference previous discussion points
+7. Be direct and helpful - avoid unnecessarily repeating "How may I assist you"
+8. Use the full conversation history to provide context-aware responses"""
+
+UPSET_NOTE = "The customer seems upset or frustrated. Maintain extra patience and empathy."
+URGENT_NOTE = "The customer has an urgent request. Prioritize efficiency while maintaining friendliness."
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 characters per token"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+def restaurant_lines_from_info(restaurant_info):
+    """DocumentReader paragraphs, falling back to the lines of the sample data"""
+    raw_content = (restaurant_info or {}).get("raw_content") or []
+    if raw_content:
+        return list(raw_content)
+    return SAMPLE_RESTAURANT_DATA.split("\n")
+
+
+def restaurant_text_from_info(restaurant_info):
+    """Flatten DocumentReader output into prompt text, falling back to the sample data"""
+    raw_content = (restaurant_info or {}).get("raw_content") or []
+    if raw_content:
+        return "\n".join(raw_content)
+    return SAMPLE_RESTAURANT_DATA
+
+
+class PromptBuilder:
+    """
+    Builds the system prompt from a static prefix (persona, restaurant data,
+    guidelines) that is rendered once, plus a short per-turn tail with the
+    current time and emotion notes. Keeping the prefix byte-identical across
+    turns lets the provider's prompt caching kick in.
+
+    With a retrieval index, the restaurant data moves out of the prefix and
+    only the sections relevant to the caller's question go into the tail.
+    A precomputed caller context from the customer profile also goes there.
+    """
+
+    def __init__(self, restaurant_info=None, retrieval_index=None, top_k=4):
+        self.restaurant_text = restaurant_text_from_info(restaurant_info)
+        self.retrieval_index = retrieval_index
+        self.top_k = top_k
+        if retrieval_index is None:
+            self.static_prefix = (
+                f"{PERSONA}\n\n"
+                f"Restaurant Information:\n{self.restaurant_text}\n\n"
+                f"{GUIDELINES}\n"
+            )
+        else:
+            self.static_prefix = f"{PERSONA}\n\n{GUIDELINES}\n"
+        self._emotion_suffixes = {}
+
+    def emotion_suffix(self, emotions):
+        upset = bool(emotions.get('angry') or emotions.get('is_shouting'))
+        urgent = bool(emotions.get('urgent'))
+        key = (upset, urgent)
+        suffix = self._emotion_suffixes.get(key)
+        if suffix is None:
+            notes = []
+            if upset:
+                notes.append(UPSET_NOTE)
+            if urgent:
+                notes.append(URGENT_NOTE)
+            suffix = "".join("\n" + note for note in notes)
+            self._emotion_suffixes[key] = suffix
+        return suffix
+
+    def relevant_information(self, query):
+        if self.retrieval_index is None:
+            return ""
+        if query:
+            sections = self.retrieval_index.select(query, self.top_k)
+        else:
+            sections = self.retrieval_index.chunks
+        return "Restaurant Information:\n" + "\n\n".join(sections) + "\n\n"
+
+    def build(self, current_time=None, emotions=None, query=None, customer_context=None):
+        current_time = current_time or datetime.now(pytz.UTC)
+        caller = f"About this caller:\n{customer_context}\n\n" if customer_context else ""
+        return (
+            f"{self.static_prefix}\n"
+            f"{self.relevant_information(query)}"
+            f"{caller}"
+            f"Current time: {current_time.strftime('%Y-%m-%d %H:%M:%S')} UTC"
+            f"{self.emotion_suffix(emotions or {})}"
+        )
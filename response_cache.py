@@ -0,0 +1,171 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from intent_router import LLM_ONLY, cue_scores
+from metrics import registry
+
+FILLER_WORDS = {"um", "uh", "erm", "hi", "hello", "hey", "please", "so", "well", "ok", "okay", "just"}
+
+# Questions leaning on earlier turns ("how much is it?") can't be answered from a shared cache
+CONTEXT_WORDS = {"it", "that", "this", "those", "these", "they", "them", "there", "he", "she", "one", "also", "else"}
+
+# Moods that change how a reply should be worded
+EMOTION_FLAGS = ("angry", "frustrated", "urgent", "is_shouting")
+
+# A question is FAQ-type if the intent router's cues for a document topic add up to this much
+FAQ_MIN_SCORE = 2.0
+
+# Words that change the answer however similar the rest of the question is; digits count too
+SPECIFIC_WORDS = {
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "mondays", "tuesdays", "wednesdays", "thursdays", "fridays", "saturdays", "sundays",
+    "today", "tonight", "tomorrow", "weekend", "weekday", "weekdays",
+    "morning", "afternoon", "evening", "night", "noon", "midday", "midnight",
+    "breakfast", "brunch", "lunch", "dinner", "am", "pm",
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+    "fifteen", "twenty", "thirty", "forty", "fifty", "half", "quarter", "dozen",
+}
+
+
+def normalize(text):
+    words = re.findall(r"[a-z0-9£']+", text.lower())
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def specifics(normalized):
+    """Numbers, times and days in a normalized question"""
+    return frozenset(
+        word for word in normalized.split()
+        if word in SPECIFIC_WORDS or any(char.isdigit() for char in word)
+    )
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ResponseCache:
+    """
+    Cache of assistant replies to standalone FAQ-style questions. Lookups try
+    the normalized question exactly, then the most similar cached question
+    by character-trigram Jaccard similarity via an inverted index; a similar
+    question only matches if it has the same numbers, times and days.
+    Entries expire after ttl seconds, and everything is dropped when the
+    source document version changes.
+    """
+
+    def __init__(self, ttl=3600, similarity_threshold=0.75, max_entries=2000):
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.source_version = None
+        self._entries = OrderedDict()
+        self._postings = {}
+        self._lock = threading.Lock()
+
+        registry.describe("response_cache_hits_total", "Turns answered from the response cache")
+        registry.describe("response_cache_misses_total", "Cacheable turns that went to the LLM")
+        registry.describe("response_cache_latency_saved_seconds_total", "LLM time avoided by cache hits")
+        registry.describe("response_cache_hit_rate", "Hits / (hits + misses) since start")
+        registry.set_gauge("response_cache_hit_rate", self.hit_rate)
+
+    @staticmethod
+    def is_cacheable(user_input, emotions, first_turn):
+        if any(emotions.get(flag) for flag in EMOTION_FLAGS):
+            return False
+        # Only questions about a document topic; bookings, complaints and advice are about the caller
+        scores = cue_scores(user_input)
+        if LLM_ONLY & scores.keys() or max(scores.values(), default=0) < FAQ_MIN_SCORE:
+            return False
+        if first_turn:
+            return True
+        return not (set(normalize(user_input).split()) & CONTEXT_WORDS)
+
+    def check_version(self, source_version):
+        """Clear the cache if the restaurant document changed"""
+        if source_version != self.source_version:
+            self.clear()
+            self.source_version = source_version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+
+    def get(self, user_input):
+        """Return (response, llm_seconds) for a cached answer, or None"""
+        key = normalize(user_input)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                key = self._most_similar(key)
+                entry = self._entries.get(key) if key else None
+            if entry is None:
+                registry.inc("response_cache_misses_total")
+                return None
+            if entry["expires_at"] < now:
+                self._remove(key)
+                registry.inc("response_cache_misses_total")
+                return None
+            self._entries.move_to_end(key)
+
+        registry.inc("response_cache_hits_total")
+        registry.inc("response_cache_latency_saved_seconds_total", entry["llm_seconds"])
+        return entry["response"], entry["llm_seconds"]
+
+    def _most_similar(self, key):
+        grams = trigrams(key)
+        key_specifics = specifics(key)
+        overlap = {}
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+        best_key, best_score = None, 0.0
+        for candidate, shared in overlap.items():
+            # "open on Saturday" must not be answered with "open on Sunday"
+            if self._entries[candidate]["specifics"] != key_specifics:
+                continue
+            score = shared / (len(grams) + self._entries[candidate]["gram_count"] - shared)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key if best_score >= self.similarity_threshold else None
+
+    def put(self, user_input, response, llm_seconds):
+        key = normalize(user_input)
+        if not key:
+            return
+        grams = trigrams(key)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "response": response,
+                "llm_seconds": llm_seconds,
+                "expires_at": time.time() + self.ttl,
+                "gram_count": len(grams),
+                "specifics": specifics(key)
+            }
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        for gram in trigrams(key):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def hit_rate(self):
+        hits = registry.counter("response_cache_hits_total")
+        total = hits + registry.counter("response_cache_misses_total")
+        return hits / total if total else 0.0
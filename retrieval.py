@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import os
+import re
+
+INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r"[a-z0-9£äöüß']+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "have", "how", "i", "in", "is", "it", "its", "me", "my", "of", "on",
+    "or", "our", "so", "that", "the", "there", "this", "to", "we", "what", "when",
+    "which", "with", "you", "your", "would", "could", "please", "any"
+}
+
+# Caller wording that never appears in the document, mapped onto words that do
+QUERY_SYNONYMS = {
+    "dog": "pet",
+    "cat": "pet",
+    "cost": "price",
+    "much": "price",
+    "book": "reservation",
+    "booking": "reservation",
+    "reserve": "reservation",
+    "table": "reservation",
+    "cancel": "cancellation",
+    "wear": "dress",
+    "clothes": "dress",
+    "pay": "payment",
+    "card": "payment",
+    "wheelchair": "accessible",
+    "kid": "children",
+    "beer": "lager",
+    "drink": "beer",
+    "dessert": "desserts",
+    "phone": "contact",
+    "email": "contact",
+    "where": "address",
+    "located": "address",
+    "music": "entertainment",
+    "band": "entertainment",
+}
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        token = token.strip("'")
+        if not token or token in STOPWORDS:
+            continue
+        if token.startswith("£"):
+            # Menu prices only appear as amounts, so give callers' "price" something to match
+            tokens.append("price")
+        # Cheap plural folding so "pets"/"pet" and "dishes"/"dish" meet
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def chunk_sections(lines, max_chars=1200):
+    """
+    Split document lines into sections. A short line ending in ':' starts a
+    new section; separator lines of underscores close one. A heading with no
+    body of its own (e.g. "Restaurant Policies:") is prefixed to the next one.
+    """
+    chunks = []
+    pending_heading = None
+    current = []
+
+    def close():
+        if current:
+            chunks.append("\n".join(current))
+            current.clear()
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if set(line) <= set("_-"):
+            close()
+            pending_heading = None
+            continue
+
+        is_heading = line.endswith(":") and len(line) <= 60
+        if is_heading:
+            if len(current) == 1 and current[0].endswith(":"):
+                pending_heading = current.pop()
+            close()
+            heading = f"{pending_heading} {line}" if pending_heading else line
+            pending_heading = None
+            current.append(heading)
+            continue
+
+        if current and sum(len(part) for part in current) + len(line) > max_chars:
+            heading = current[0] if current[0].endswith(":") else None
+            close()
+            if heading:
+                current.append(heading)
+        current.append(line)
+
+    close()
+    return chunks
+
+
+class RetrievalIndex:
+    """BM25 index over document sections; built locally, no network needed"""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            self.doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((chunk_id, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0
+        self.idf = {
+            token: math.log(1 + (len(chunks) - len(entries) + 0.5) / (len(entries) + 0.5))
+            for token, entries in self.postings.items()
+        }
+
+    def search(self, query, top_k=4):
+        """Return (chunk_id, score) pairs for the best matching sections"""
+        terms = tokenize(query)
+        terms += [QUERY_SYNONYMS[term] for term in terms if term in QUERY_SYNONYMS]
+        scores = {}
+        for term in set(terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for chunk_id, tf in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[chunk_id] / self.avg_length
+                scores[chunk_id] = scores.get(chunk_id, 0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def select(self, query, top_k=4, pinned=(0,)):
+        """Best sections for a query in document order, always including pinned ones"""
+        chosen = set(chunk_id for chunk_id in pinned if chunk_id < len(self.chunks))
+        chosen.update(chunk_id for chunk_id, _ in self.search(query, top_k))
+        return [self.chunks[chunk_id] for chunk_id in sorted(chosen)]
+
+    def to_dict(self):
+        return {"chunks": self.chunks, "k1": self.k1, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["chunks"], k1=data["k1"], b=data["b"])
+
+
+def _file_fingerprint(path):
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {"mtime": os.path.getmtime(path), "sha256": digest}
+
+
+def load_or_build_index(lines, cache_path, source_path=None):
+    """
+    Load the persisted index if it was built from the same source, otherwise
+    chunk the lines, build a fresh index and persist it. The source docx is
+    fingerprinted by mtime first and content hash second; without a docx the
+    text itself is hashed.
+    """
+    if source_path and os.path.exists(source_path):
+        source_mtime = os.path.getmtime(source_path)
+        fingerprint = None
+    else:
+        source_mtime = None
+        fingerprint = {"mtime": None, "sha256": hashlib.sha256("\n".join(lines).encode()).hexdigest()}
+
+    try:
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r') as f:
+                cached = json.load(f)
+            if cached.get("version") == INDEX_VERSION:
+                stored = cached.get("fingerprint", {})
+                if source_mtime is not None and stored.get("mtime") == source_mtime:
+                    return RetrievalIndex.from_dict(cached["index"])
+                if fingerprint is None:
+                    fingerprint = _file_fingerprint(source_path)
+                if stored.get("sha256") == fingerprint["sha256"]:
+                    return RetrievalIndex.from_dict(cached["index"])
+    except Exception as e:
+        print(f"Error loading retrieval index: {e}")
+
+    if fingerprint is None:
+        fingerprint = _file_fingerprint(source_path)
+    index = RetrievalIndex(chunk_sections(lines))
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "fingerprint": fingerprint, "index": index.to_dict()}, f)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Error saving retrieval index: {e}")
+    return index
@@ -0,0 +1,243 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import registry
+
+
+class SessionStore:
+    """
+    Per-call conversation state keyed by CallSid. Sessions expire ttl
+    seconds after their last write; an expired session reads as None, so a
+    caller returning after the timeout starts a fresh conversation.
+    """
+
+    # True if every worker sees the same sessions
+    shared = False
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+
+    def get(self, call_sid):
+        raise NotImplementedError
+
+    def put(self, call_sid, session):
+        raise NotImplementedError
+
+    def delete(self, call_sid):
+        raise NotImplementedError
+
+    def sweep(self):
+        """Drop expired sessions; returns how many were removed"""
+        return 0
+
+
+class LRUSessionStore(SessionStore):
+    """
+    In-process store, fine for a single worker. Memory is bounded three ways:
+    expired sessions are dropped by a background sweeper driven by a heap of
+    expiry times, and the least recently used sessions are evicted once
+    max_entries or max_bytes (an estimate of message text held) is exceeded.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000, max_bytes=64 * 1024 * 1024, sweep_interval=30):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._sessions = OrderedDict()
+        self._expiry_heap = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+        registry.describe("session_count", "Conversation sessions held in this worker")
+        registry.describe("session_bytes", "Estimated bytes of conversation text held in this worker")
+        registry.describe("session_evictions_expired_total", "Sessions dropped after their TTL")
+        registry.describe("session_evictions_lru_total", "Sessions evicted to stay under max_entries")
+        registry.describe("session_evictions_memory_total", "Sessions evicted to stay under max_bytes")
+        registry.set_gauge("session_count", lambda: len(self._sessions))
+        registry.set_gauge("session_bytes", lambda: self._bytes)
+
+    @staticmethod
+    def _estimate_size(session):
+        return 256 + sum(len(message.get('content') or '') + 64 for message in session.get('messages', []))
+
+    def _ensure_sweeper(self):
+        # Started lazily so the thread belongs to the worker process, not a pre-fork master
+        if self._sweeper is None or not self._sweeper.is_alive():
+            with self._lock:
+                if self._sweeper is None or not self._sweeper.is_alive():
+                    self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+                    self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep()
+
+    def get(self, call_sid):
+        with self._lock:
+            entry = self._sessions.get(call_sid)
+            if entry is None:
+                return None
+            expires_at, size, session = entry
+            if expires_at < time.time():
+                self._remove(call_sid)
+                registry.inc("session_evictions_expired_total")
+                return None
+            self._sessions.move_to_end(call_sid)
+            return session
+
+    def put(self, call_sid, session):
+        self._ensure_sweeper()
+        expires_at = time.time() + self.ttl
+        size = self._estimate_size(session)
+        with self._lock:
+            self._remove(call_sid)
+            self._sessions[call_sid] = (expires_at, size, session)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, call_sid))
+
+            while len(self._sessions) > self.max_entries:
+                self._remove(next(iter(self._sessions)))
+                registry.inc("session_evictions_lru_total")
+            while self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._remove(next(iter(self._sessions)))
+                registry.inc("session_evictions_memory_total")
+
+            # Updated sessions leave stale heap entries behind; rebuild once they dominate
+            if len(self._expiry_heap) > 2 * len(self._sessions) + 1024:
+                self._expiry_heap = [(expires_at, key) for key, (expires_at, _, _) in self._sessions.items()]
+                heapq.heapify(self._expiry_heap)
+
+    def _remove(self, call_sid):
+        entry = self._sessions.pop(call_sid, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def delete(self, call_sid):
+        with self._lock:
+            self._remove(call_sid)
+
+    def sweep(self):
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] < now:
+                expires_at, call_sid = heapq.heappop(self._expiry_heap)
+                entry = self._sessions.get(call_sid)
+                # Skip heap entries superseded by a later put
+                if entry is not None and entry[0] == expires_at:
+                    self._remove(call_sid)
+                    removed += 1
+        if removed:
+            registry.inc("session_evictions_expired_total", removed)
+        return removed
+
+    def memory_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store shared by every worker on the machine through one SQLite file, so
+    consecutive turns of a call can land on different gunicorn workers.
+    Sessions must be JSON-serializable.
+    """
+
+    shared = True
+
+    def __init__(self, path, ttl=300, sweep_every=100):
+        super().__init__(ttl)
+        self.path = path
+        self.sweep_every = sweep_every
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        # Reconnect after fork; SQLite connections must not be shared across processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    call_sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, call_sid):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data FROM sessions WHERE call_sid = ? AND expires_at >= ?",
+                (call_sid, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, call_sid, session):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO sessions (call_sid, data, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT(call_sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+                    """,
+                    (call_sid, json.dumps(session), time.time() + self.ttl)
+                )
+            self._writes += 1
+            should_sweep = self._writes % self.sweep_every == 0
+        if should_sweep:
+            self.sweep()
+
+    def delete(self, call_sid):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM sessions WHERE call_sid = ?", (call_sid,))
+
+    def sweep(self):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+
+def open_session_store(path, ttl=300, backend=None):
+    """
+    Create the session store selected by SESSION_STORE (memory or sqlite).
+    Unset, it is sqlite when WEB_CONCURRENCY says there are several workers,
+    since a call's turns may land on any of them, and memory otherwise.
+    """
+    workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+    backend = backend or os.getenv('SESSION_STORE') or ('sqlite' if workers > 1 else 'memory')
+    if backend == 'memory':
+        if workers > 1:
+            print(f"Warning: SESSION_STORE=memory with {workers} workers; a call's context and streamed "
+                  f"replies are lost whenever its turns reach different workers")
+        return LRUSessionStore(
+            ttl,
+            max_entries=int(os.getenv('SESSION_MAX_ENTRIES', '10000')),
+            max_bytes=int(os.getenv('SESSION_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path, ttl)
+    raise ValueError(f"Unknown session store: {backend}")
@@ -0,0 +1,98 @@
+import re
+import threading
+
+# End of a sentence: terminal punctuation followed by whitespace
+SENTENCE_END_RE = re.compile(r'[.!?](?:["\')\]]*)\s')
+
+# Don't cut off very short fragments like "Sure." - they sound clipped on their own
+MIN_FIRST_SENTENCE_CHARS = 20
+
+
+def find_sentence_end(text, min_chars=MIN_FIRST_SENTENCE_CHARS):
+    """Index just past the first sentence of at least min_chars, or -1"""
+    for match in SENTENCE_END_RE.finditer(text):
+        if match.end() >= min_chars:
+            return match.end()
+    return -1
+
+
+class PendingResponse:
+    """
+    A streamed completion being consumed on a background thread. The first
+    complete sentence is published as soon as it arrives; the full text is
+    available once the stream ends.
+    """
+
+    def __init__(self):
+        self.first_sentence = None
+        self.error = None
+        # Set once nobody is waiting for the rest of the reply
+        self.abandoned = False
+        self._parts = []
+        self._first_ready = threading.Event()
+        self._done = threading.Event()
+
+    def consume_in_background(self, stream, on_complete=None, on_error=None):
+        """
+        on_complete(full_text) runs once the stream ends. If the stream fails
+        after the first sentence was published, on_error(partial_text) runs
+        instead, since the caller may already be hearing part of the reply.
+        """
+        thread = threading.Thread(target=self._consume, args=(stream, on_complete, on_error), daemon=True)
+        thread.start()
+        return thread
+
+    def _consume(self, stream, on_complete, on_error=None):
+        try:
+            try:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    self._parts.append(delta)
+                    if self.first_sentence is None:
+                        text = "".join(self._parts)
+                        end = find_sentence_end(text)
+                        if end != -1:
+                            self.first_sentence = text[:end].strip()
+                            self._first_ready.set()
+            except Exception as e:
+                print(f"Error consuming response stream: {e}")
+                self.error = e
+                if on_error and self.first_sentence is not None:
+                    on_error(self.full_text())
+                return
+
+            full_text = self.full_text()
+            if self.first_sentence is None:
+                self.first_sentence = full_text
+                self._first_ready.set()
+            if on_complete:
+                on_complete(full_text)
+        except Exception as e:
+            print(f"Error completing response stream: {e}")
+            self.error = self.error or e
+        finally:
+            self._first_ready.set()
+            self._done.set()
+
+    def full_text(self):
+        return "".join(self._parts).strip()
+
+    def wait_first_sentence(self, timeout=None):
+        return self._first_ready.wait(timeout)
+
+    def wait_done(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def finished_with_first_sentence(self):
+        """True if the whole reply turned out to be just the first sentence"""
+        return self._done.is_set() and not self.remainder()
+
+    def remainder(self):
+        full_text = self.full_text()
+        if self.first_sentence and full_text.startswith(self.first_sentence):
+            return full_text[len(self.first_sentence):].strip()
+        return "" if self.first_sentence else full_text
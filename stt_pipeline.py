@@ -0,0 +1,399 @@
+"""
+Chunked speech-to-text for recorded audio. Audio is read in fixed-size
+frames, split into utterances by an energy-based voice activity detector,
+and the utterances are recognized concurrently on a worker pool. Silence
+is never sent to the recognizer.
+
+Transcribe a backlog of call recordings (WAV files or directories of them)
+to JSON lines:
+
+    python stt_pipeline.py transcribe recordings/ --workers 8 > transcripts.jsonl
+"""
+import argparse
+import array
+import glob
+import json
+import math
+import os
+import sys
+import threading
+import time
+import warnings
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from metrics import registry
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop
+except ImportError:
+    # Removed in Python 3.13; frame_rms() falls back to pure Python
+    audioop = None
+
+FRAME_MS = int(os.getenv('STT_FRAME_MS', '30'))
+# A pause this long ends an utterance
+SILENCE_MS = int(os.getenv('STT_SILENCE_MS', '400'))
+# Shorter bursts are clicks and line noise, not speech
+MIN_SPEECH_MS = int(os.getenv('STT_MIN_SPEECH_MS', '200'))
+# Long monologues are cut so no single request holds up the rest
+MAX_SEGMENT_SECONDS = float(os.getenv('STT_MAX_SEGMENT_SECONDS', '15'))
+# Audio kept either side of the speech, so word onsets and endings aren't clipped
+PAD_MS = int(os.getenv('STT_PAD_MS', '150'))
+STT_WORKERS = int(os.getenv('STT_WORKERS', '4'))
+
+SEGMENT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+ARRAY_TYPES = {2: "h", 4: "i"}
+
+
+def frame_rms(frame, sample_width):
+    if audioop is not None:
+        return audioop.rms(frame, sample_width)
+    if sample_width == 1:
+        samples = [sample - 128 for sample in frame]
+    else:
+        samples = array.array(ARRAY_TYPES[sample_width], frame)
+    return int(math.sqrt(sum(sample * sample for sample in samples) / len(samples))) if samples else 0
+
+
+def wav_frames(audio_file, frame_ms=FRAME_MS):
+    """Yield (sample_rate, sample_width, frame) for fixed-size frames of a PCM WAV file, mixed down to mono"""
+    with wave.open(audio_file, "rb") as source:
+        channels, sample_width, sample_rate = source.getnchannels(), source.getsampwidth(), source.getframerate()
+        if channels > 2 or (channels == 2 and audioop is None):
+            raise ValueError(f"{channels}-channel audio is not supported")
+        if audioop is None and sample_width not in (1, *ARRAY_TYPES):
+            raise ValueError(f"{8 * sample_width}-bit audio is not supported")
+        frames_per_chunk = max(1, sample_rate * frame_ms // 1000)
+        while True:
+            frame = source.readframes(frames_per_chunk)
+            if not frame:
+                return
+            if channels == 2:
+                frame = audioop.tomono(frame, sample_width, 0.5, 0.5)
+            yield sample_rate, sample_width, frame
+
+
+@dataclass(slots=True)
+class Segment:
+    """One utterance: its position in the recording, its audio and, once recognized, its text"""
+    index: int
+    start: float
+    end: float
+    audio: bytes
+    sample_rate: int
+    sample_width: int
+    text: str = ""
+    error: str = None
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+@dataclass(slots=True)
+class Transcript:
+    segments: list = field(default_factory=list)
+    audio_seconds: float = 0.0
+    error: str = None
+
+    @property
+    def text(self):
+        return " ".join(segment.text for segment in self.segments if segment.text)
+
+    @property
+    def errors(self):
+        errors = [f"{segment.start:.1f}s: {segment.error}" for segment in self.segments if segment.error]
+        return [self.error] + errors if self.error else errors
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "speech_seconds": round(sum(segment.duration for segment in self.segments), 3),
+            "segments": [
+                {"start": round(s.start, 3), "end": round(s.end, 3), "text": s.text, "error": s.error}
+                for s in self.segments
+            ],
+            "errors": self.errors
+        }
+
+
+class VoiceActivitySegmenter:
+    """
+    Splits a stream of fixed-size frames into utterances by frame energy.
+    The speech threshold follows the line's noise floor, a running average
+    of the energy of non-speech frames, so a hissy line doesn't read as one
+    long utterance. A segment opens on the first speech frame, with pad_ms
+    of lead-in, and closes after silence_ms of silence or at
+    max_segment_seconds.
+    """
+
+    def __init__(self, frame_ms=FRAME_MS, silence_ms=SILENCE_MS, min_speech_ms=MIN_SPEECH_MS,
+                 max_segment_seconds=MAX_SEGMENT_SECONDS, pad_ms=PAD_MS, threshold_ratio=3.0, min_level=0.01):
+        self.frame_ms = frame_ms
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = max(1, int(max_segment_seconds * 1000 // frame_ms))
+        self.pad_frames = pad_ms // frame_ms
+        self.threshold_ratio = threshold_ratio
+        # Quietest level ever counted as speech, as a fraction of full scale
+        self.min_level = min_level
+        self.noise_floor = None
+        self.position = 0
+        self._lead_in = deque(maxlen=self.pad_frames or 1)
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_run = 0
+        self._start = 0
+        self._format = None
+        self._count = 0
+
+    def _is_speech(self, level, sample_width):
+        min_threshold = self.min_level * (1 << (8 * sample_width - 1))
+        if self.noise_floor is None:
+            # A recording may start mid-word, so don't take the first frame for the floor
+            self.noise_floor = min(level, min_threshold)
+        threshold = max(min_threshold, self.noise_floor * self.threshold_ratio)
+        speech = level > threshold
+        if not speech:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * level
+        return speech
+
+    def _close(self):
+        frames, self._frames = self._frames, []
+        speech_frames, self._speech_frames = self._speech_frames, 0
+        # Drop the trailing silence beyond the padding
+        keep = len(frames) - max(0, self._silent_run - self.pad_frames)
+        self._silent_run = 0
+        if speech_frames < self.min_speech_frames:
+            return None
+        sample_rate, sample_width = self._format
+        audio = b"".join(frames[:keep])
+        segment = Segment(
+            index=self._count,
+            start=self._start * self.frame_ms / 1000,
+            end=(self._start * self.frame_ms / 1000) + len(audio) / (sample_rate * sample_width),
+            audio=audio,
+            sample_rate=sample_rate,
+            sample_width=sample_width
+        )
+        self._count += 1
+        return segment
+
+    def feed(self, sample_rate, sample_width, frame):
+        """Add one frame; returns the segment it closed, or None"""
+        self._format = (sample_rate, sample_width)
+        speech = self._is_speech(frame_rms(frame, sample_width), sample_width)
+        self.position += 1
+        closed = None
+
+        if not self._frames:
+            if speech:
+                self._start = self.position - 1 - len(self._lead_in)
+                self._frames = list(self._lead_in) if self.pad_frames else []
+                self._lead_in.clear()
+            elif self.pad_frames:
+                self._lead_in.append(frame)
+                return None
+            else:
+                return None
+
+        self._frames.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silent_run = 0
+        else:
+            self._silent_run += 1
+        if self._silent_run >= self.silence_frames or len(self._frames) >= self.max_frames:
+            closed = self._close()
+        return closed
+
+    def flush(self):
+        """Close the open segment at the end of the audio"""
+        return self._close() if self._frames else None
+
+
+class SpeechRecognitionBackend:
+    """
+    Recognizer backed by the speech_recognition package: Google's web API
+    ('google') or the offline CMU Sphinx engine ('sphinx', needs
+    pocketsphinx). Audio with no recognizable speech gives "".
+    """
+
+    def __init__(self, engine="google", language="en-GB"):
+        import speech_recognition as sr
+        self.sr = sr
+        self.engine = engine
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, audio, sample_rate, sample_width):
+        data = self.sr.AudioData(audio, sample_rate, sample_width)
+        try:
+            if self.engine == "sphinx":
+                return self.recognizer.recognize_sphinx(data)
+            return self.recognizer.recognize_google(data, language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class STTPipeline:
+    """
+    Frames -> voice activity segments -> recognizer, with the segments
+    recognized concurrently on a shared pool of workers. A segment is
+    submitted as soon as it closes, so recognition overlaps reading the
+    rest of the audio. At most max_pending segments are in flight, which
+    bounds memory when transcribing a large backlog.
+
+    The recognizer is anything with recognize(audio, sample_rate,
+    sample_width) -> text, e.g. SpeechRecognitionBackend or
+    tools/stub_stt.py.
+    """
+
+    def __init__(self, recognizer, workers=STT_WORKERS, frame_ms=FRAME_MS, max_pending=None, **vad_options):
+        self.recognizer = recognizer
+        self.workers = workers
+        self.frame_ms = frame_ms
+        self.vad_options = vad_options
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self._executor = None
+        self._executor_pid = None
+
+        registry.histogram("stt_segment_seconds", "Time to recognize one speech segment", SEGMENT_BUCKETS)
+        registry.describe("stt_audio_seconds_total", "Seconds of audio read by the STT pipeline")
+        registry.describe("stt_speech_seconds_total", "Seconds of speech sent to the recognizer")
+        registry.describe("stt_segment_errors_total", "Speech segments the recognizer failed on")
+
+    @property
+    def executor(self):
+        # Created on first use so its threads belong to the worker, not a pre-fork master
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stt")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _recognize(self, segment):
+        start = time.perf_counter()
+        try:
+            segment.text = (self.recognizer.recognize(segment.audio, segment.sample_rate, segment.sample_width)
+                            or "").strip()
+        except Exception as e:
+            segment.error = f"{type(e).__name__}: {e}"
+            registry.inc("stt_segment_errors_total")
+        registry.observe_histogram("stt_segment_seconds", time.perf_counter() - start)
+        return segment
+
+    def _submit(self, segment):
+        self._slots.acquire()
+        registry.inc("stt_speech_seconds_total", segment.duration)
+        future = self.executor.submit(self._recognize, segment)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def segments(self, frames):
+        """Voice activity segments of a stream of (sample_rate, sample_width, frame)"""
+        vad = VoiceActivitySegmenter(frame_ms=self.frame_ms, **self.vad_options)
+        audio_seconds = 0.0
+        try:
+            for sample_rate, sample_width, frame in frames:
+                audio_seconds += len(frame) / (sample_rate * sample_width)
+                segment = vad.feed(sample_rate, sample_width, frame)
+                if segment is not None:
+                    yield segment
+            segment = vad.flush()
+            if segment is not None:
+                yield segment
+        finally:
+            registry.inc("stt_audio_seconds_total", audio_seconds)
+
+    def stream(self, frames):
+        """Yield recognized segments in order, while later audio is still being read and recognized"""
+        pending = deque()
+        for segment in self.segments(frames):
+            pending.append(self._submit(segment))
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _start(self, audio_file):
+        transcript = Transcript()
+        futures = []
+
+        def frames():
+            for sample_rate, sample_width, frame in wav_frames(audio_file, self.frame_ms):
+                transcript.audio_seconds += len(frame) / (sample_rate * sample_width)
+                yield sample_rate, sample_width, frame
+
+        try:
+            for segment in self.segments(frames()):
+                futures.append(self._submit(segment))
+        except (wave.Error, EOFError, OSError, ValueError) as e:
+            transcript.error = f"Unreadable audio: {str(e) or type(e).__name__}"
+        return transcript, futures
+
+    def transcribe(self, audio_file):
+        """Transcript of one WAV recording (path or file object)"""
+        return next(self.transcribe_batch([audio_file]))[1]
+
+    def transcribe_batch(self, audio_files):
+        """
+        Transcribe many recordings through the shared pool. Yields
+        (audio_file, Transcript) in input order; an unreadable file gets a
+        transcript with an error rather than stopping the batch.
+        """
+        started = deque()
+        for audio_file in audio_files:
+            started.append((audio_file, *self._start(audio_file)))
+            while started and all(future.done() for future in started[0][2]):
+                yield self._finish(*started.popleft())
+        while started:
+            yield self._finish(*started.popleft())
+
+    @staticmethod
+    def _finish(audio_file, transcript, futures):
+        transcript.segments = [future.result() for future in futures]
+        return audio_file, transcript
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def expand_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "**", "*.wav"), recursive=True))
+        else:
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-transcribe call recordings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    transcribe = commands.add_parser("transcribe", help="Transcribe WAV files or directories to JSON lines")
+    transcribe.add_argument("paths", nargs="+")
+    transcribe.add_argument("--workers", type=int, default=STT_WORKERS)
+    transcribe.add_argument("--engine", choices=("google", "sphinx"), default=os.getenv('STT_ENGINE', 'google'))
+    transcribe.add_argument("--language", default="en-GB")
+    args = parser.parse_args(argv)
+
+    pipeline = STTPipeline(SpeechRecognitionBackend(args.engine, args.language), workers=args.workers)
+    start = time.perf_counter()
+    audio_seconds = failed = 0
+    for path, transcript in pipeline.transcribe_batch(expand_paths(args.paths)):
+        audio_seconds += transcript.audio_seconds
+        failed += bool(transcript.errors)
+        print(json.dumps({"file": path, **transcript.to_dict()}), flush=True)
+    elapsed = time.perf_counter() - start
+    pipeline.shutdown()
+    print(f"{audio_seconds:.0f}s of audio in {elapsed:.1f}s ({audio_seconds / max(elapsed, 1e-9):.1f}x real time), "
+          f"{failed} file(s) with errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+ResilientLLM's circuit breakers must always settle a half-open trial,
+whatever the trial's outcome, and settle a stream only once it ends. The
+in-process fakes below cover every outcome; the last tests run the same
+scenarios over HTTP against tools/fake_openai_server.py and need the
+OpenAI SDK.
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from llm_client import LLMUnavailable, ResilientLLM  # noqa: E402
+from stub_openai import StubAPIError  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "How much is the Wiener Schnitzel?"}]
+PRIMARY, FALLBACK = "gpt-4", "gpt-3.5-turbo"
+COOLDOWN = 0.05
+
+
+def reply(model):
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(message=SimpleNamespace(content=f"from {model}"))])
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeCompletions:
+    """
+    behaviour maps a model to (latency, status); a status is raised as an API
+    error after the latency. A streamed reply waits the latency before each of
+    its three chunks and raises the status after the first.
+    """
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.requests = []
+
+    def _outcome(self, model):
+        self.requests.append(model)
+        return self.behaviour.get(model, (0.0, None))
+
+    def create(self, model=None, messages=(), timeout=None, stream=False, **params):
+        latency, status = self._outcome(model)
+        if stream:
+            return self._stream(model, latency, status)
+        time.sleep(latency)
+        if status is not None:
+            raise StubAPIError(f"status {status}", status_code=status)
+        return reply(model)
+
+    def _stream(self, model, latency, status):
+        for index in range(3):
+            time.sleep(latency)
+            if index and status is not None:
+                raise StubAPIError(f"status {status}", status_code=status)
+            yield chunk(f"from {model} ")
+
+
+class AsyncFakeCompletions(FakeCompletions):
+    async def create(self, model=None, messages=(), timeout=None, **params):
+        latency, status = self._outcome(model)
+        await asyncio.sleep(latency)
+        if status is not None:
+            raise StubAPIError(f"status {status}", status_code=status)
+        return reply(model)
+
+
+def make_llm(behaviour, hedge_after=0.05, deadline=2.0):
+    llm = ResilientLLM(api_key="test", model=PRIMARY, fallback_model=FALLBACK, deadline=deadline,
+                       hedge_after=hedge_after, failure_threshold=1, reset_timeout=COOLDOWN)
+    completions = FakeCompletions(behaviour)
+    async_completions = AsyncFakeCompletions(behaviour)
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    llm.async_client = SimpleNamespace(chat=SimpleNamespace(completions=async_completions))
+    return llm, completions, async_completions
+
+
+def open_primary(llm):
+    """Open the primary's breaker and wait out its cooldown, so the next request is its trial"""
+    llm.breakers[PRIMARY].record_failure()
+    assert llm.breakers[PRIMARY].state == "open"
+    time.sleep(COOLDOWN * 1.5)
+
+
+def test_failure_opens_and_successful_trial_closes():
+    llm, completions, _ = make_llm({PRIMARY: (0.0, 500)})
+    assert llm.complete(MESSAGES).model == FALLBACK
+    assert llm.breakers[PRIMARY].state == "open"
+
+    completions.behaviour[PRIMARY] = (0.0, None)
+    assert llm.complete(MESSAGES).model == FALLBACK
+    time.sleep(COOLDOWN * 1.5)
+    assert llm.complete(MESSAGES).model == PRIMARY
+    assert llm.breakers[PRIMARY].state == "closed"
+
+
+def test_failed_trial_reopens():
+    llm, completions, _ = make_llm({PRIMARY: (0.0, 503)})
+    open_primary(llm)
+    llm.complete(MESSAGES)
+    breaker = llm.breakers[PRIMARY]
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_cancelled_trial_is_released():
+    # The primary is slow, so the hedge wins and the primary's trial is cancelled
+    llm, _, async_completions = make_llm({PRIMARY: (0.5, None)})
+    open_primary(llm)
+    response = asyncio.run(llm.complete_async(MESSAGES))
+    assert response.model == FALLBACK
+    assert async_completions.requests == [PRIMARY, FALLBACK]
+    assert llm.breakers[PRIMARY].state == "open"
+
+    async_completions.behaviour[PRIMARY] = (0.0, None)
+    assert asyncio.run(llm.complete_async(MESSAGES)).model == PRIMARY
+    assert llm.breakers[PRIMARY].state == "closed"
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_rejected_trial_is_released(status):
+    llm, completions, _ = make_llm({PRIMARY: (0.0, status)})
+    open_primary(llm)
+    assert llm.complete(MESSAGES).model == FALLBACK
+    breaker = llm.breakers[PRIMARY]
+    assert breaker.state == "open"
+    assert breaker.allow()
+
+
+def test_rejected_trial_is_released_async():
+    llm, _, async_completions = make_llm({PRIMARY: (0.0, 400)})
+    open_primary(llm)
+    assert asyncio.run(llm.complete_async(MESSAGES)).model == FALLBACK
+
+    async_completions.behaviour[PRIMARY] = (0.0, None)
+    assert asyncio.run(llm.complete_async(MESSAGES)).model == PRIMARY
+
+
+def test_unavailable_when_every_breaker_is_open():
+    llm, _, _ = make_llm({PRIMARY: (0.0, 500), FALLBACK: (0.0, 500)})
+    with pytest.raises(LLMUnavailable):
+        llm.complete(MESSAGES)
+    with pytest.raises(LLMUnavailable, match="circuit breaker is open"):
+        llm.complete(MESSAGES)
+
+
+def test_stream_settles_its_trial_when_it_ends():
+    llm, _, _ = make_llm({})
+    open_primary(llm)
+    stream = llm.stream(MESSAGES)
+    # Opening the stream proves nothing yet; the trial is held until it ends
+    assert llm.breakers[PRIMARY].state == "half_open"
+    assert len(list(stream)) == 3
+    assert llm.breakers[PRIMARY].state == "closed"
+
+
+def test_stream_failing_midway_reopens():
+    llm, _, _ = make_llm({PRIMARY: (0.0, 502)})
+    open_primary(llm)
+    with pytest.raises(StubAPIError):
+        list(llm.stream(MESSAGES))
+    assert llm.breakers[PRIMARY].state == "open"
+    assert not llm.breakers[PRIMARY].allow()
+
+
+def test_stream_closed_early_releases_trial():
+    llm, _, _ = make_llm({})
+    open_primary(llm)
+    stream = llm.stream(MESSAGES)
+    next(stream)
+    stream.close()
+    breaker = llm.breakers[PRIMARY]
+    assert breaker.state == "open"
+    assert breaker.allow()
+
+
+def test_stream_is_bounded_by_the_deadline():
+    llm, _, _ = make_llm({PRIMARY: (0.1, None)}, deadline=0.15)
+    with pytest.raises(LLMUnavailable, match="deadline"):
+        list(llm.stream(MESSAGES))
+    assert llm.breakers[PRIMARY].state == "open"
+
+
+@pytest.fixture
+def fake_server():
+    pytest.importorskip("openai")
+    from fake_openai_server import serve_in_thread
+
+    server = serve_in_thread(first_token_latency=0.0, token_delay=0.0, model_latency={PRIMARY: 0.5})
+    yield server
+    server.shutdown()
+
+
+def http_llm(server):
+    from openai import AsyncOpenAI
+
+    llm = ResilientLLM(api_key="test", model=PRIMARY, fallback_model=FALLBACK, deadline=5.0, hedge_after=0.1,
+                       failure_threshold=1, reset_timeout=COOLDOWN)
+    llm.async_client = AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+    return llm
+
+
+def test_cancelled_trial_over_http(fake_server):
+    llm = http_llm(fake_server)
+    open_primary(llm)
+
+    # One event loop for both calls, since the SDK's connection pool belongs to the loop it was used on
+    async def calls():
+        await llm.complete_async(MESSAGES)
+        # Let the cancelled primary attempt unwind and settle its trial
+        await asyncio.sleep(0.1)
+        assert llm.breakers[PRIMARY].state == "open"
+        fake_server.options["model_latency"][PRIMARY] = 0.0
+        return await llm.complete_async(MESSAGES)
+
+    assert asyncio.run(calls()).model == PRIMARY
+    assert llm.breakers[PRIMARY].state == "closed"
+
+
+def test_rejected_trial_over_http(fake_server):
+    llm = http_llm(fake_server)
+    fake_server.options.update(error_rate=1.0, error_status=400)
+    open_primary(llm)
+
+    async def calls():
+        with pytest.raises(LLMUnavailable):
+            await llm.complete_async(MESSAGES)
+        fake_server.options.update(error_rate=0.0)
+        fake_server.options["model_latency"][PRIMARY] = 0.0
+        return await llm.complete_async(MESSAGES)
+
+    assert asyncio.run(calls()).model == PRIMARY
+    assert llm.breakers[PRIMARY].state == "closed"
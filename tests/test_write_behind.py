@@ -0,0 +1,98 @@
+"""
+WriteBehindStore queues plain rows and mutate() calls and applies each
+batch in one transaction of the wrapped store; its metrics describe that
+queue.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from history_store import SQLiteStore  # noqa: E402
+from metrics import registry  # noqa: E402
+from write_behind import WriteBehindStore  # noqa: E402
+
+
+def counter(name):
+    return registry.snapshot()["counters"].get(name, 0)
+
+
+def increment(tx, key, by=1):
+    record = tx.get("meta", key) or {"count": 0}
+    record["count"] += by
+    tx.put("meta", key, record)
+
+
+def fail(tx):
+    tx.put("meta", "partial", {"written": True})
+    raise ValueError("bad update")
+
+
+class GatedStore(SQLiteStore):
+    """Holds every transaction until the gate opens"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.gate = threading.Event()
+
+    def transaction(self):
+        self.gate.wait()
+        return super().transaction()
+
+
+def test_mutations_are_queued_and_applied_in_order(tmp_path):
+    store = WriteBehindStore(SQLiteStore(str(tmp_path / "history.db")), flush_interval=0.05)
+    flushed = counter("history_flush_rows_total")
+    for _ in range(50):
+        store.mutate(increment, "turns")
+    store.put("meta", "plain", {"row": True})
+    store.mutate(increment, "turns", 10)
+    store.flush()
+    assert store.get("meta", "turns") == {"count": 60}
+    assert store.get("meta", "plain") == {"row": True}
+    # Each key is written once per batch, not once per update
+    assert 2 <= counter("history_flush_rows_total") - flushed < 52
+    store.close()
+
+
+def test_failing_mutation_is_dropped_alone(tmp_path):
+    store = WriteBehindStore(SQLiteStore(str(tmp_path / "history.db")), flush_interval=0.05)
+    store.mutate(increment, "turns")
+    store.mutate(fail)
+    store.mutate(increment, "turns")
+    store.flush()
+    assert store.get("meta", "turns") == {"count": 2}
+    assert store.get("meta", "partial") is None
+    store.close()
+
+
+def test_full_queue_blocks_and_counts_backpressure(tmp_path):
+    inner = GatedStore(str(tmp_path / "history.db"))
+    store = WriteBehindStore(inner, max_queue=1, batch_size=1, flush_interval=0.01, put_timeout=0.01)
+    backpressure = counter("history_write_backpressure_total")
+    writer = threading.Thread(target=lambda: [store.mutate(increment, "turns") for _ in range(4)])
+    writer.start()
+    writer.join(timeout=0.3)
+    assert writer.is_alive()
+    assert store.metrics()["queue_depth"] == 1
+    inner.gate.set()
+    writer.join()
+    store.flush()
+    assert counter("history_write_backpressure_total") > backpressure
+    assert store.get("meta", "turns") == {"count": 4}
+    store.close()
+
+
+def test_close_drains_the_queue(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = WriteBehindStore(SQLiteStore(path), flush_interval=0.05)
+    for _ in range(5):
+        store.mutate(increment, "turns")
+    store.close()
+    reopened = SQLiteStore(path)
+    assert reopened.get("meta", "turns") == {"count": 5}
+    reopened.close()
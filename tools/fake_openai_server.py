@@ -0,0 +1,179 @@
+"""
+Local stand-in for the OpenAI chat completions API, for testing and
+benchmarking without the network. Supports plain and streamed (SSE)
+responses with configurable latency, per-model latency, and injected
+failures: a share of requests can return an error status or stall for
+slow_latency seconds, to exercise the app's deadline, hedging and circuit
+breaker.
+
+Run standalone and point the app at it:
+
+    python tools/fake_openai_server.py --port 8765 --first-token-latency 0.4
+    python tools/fake_openai_server.py --error-rate 0.1 --slow-rate 0.05 --slow-latency 12 \
+        --model-latency gpt-3.5-turbo=0.15
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test python app.py
+
+or start it in-process with serve_in_thread().
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Of course! The Wiener Schnitzel is £12.99 and comes with mashed potatoes "
+    "and cranberry sauce. Would you like me to book a table for you?"
+)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        options = self.server.options
+        self.server.request_count += 1
+
+        model = body.get("model", "gpt-4")
+        reply = options["reply"]
+        tokens = [word + " " for word in reply.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+
+        with self.server.lock:
+            roll = self.server.rng.random()
+        if roll < options["error_rate"]:
+            self.server.error_count += 1
+            time.sleep(options["error_latency"])
+            self._send_json(options["error_status"], {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+        slow = roll < options["error_rate"] + options["slow_rate"]
+        time.sleep(options["slow_latency"] if slow else options["model_latency"].get(model, options["first_token_latency"]))
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for index, token in enumerate(tokens):
+                if index:
+                    time.sleep(options["token_delay"])
+                self._send_event(self._chunk(model, {"role": "assistant", "content": token} if index == 0 else {"content": token}))
+            self._send_event(self._chunk(model, {}, finish_reason="stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        time.sleep(options["token_delay"] * (len(tokens) - 1))
+        prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        self._send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_chars // 4 + len(tokens)
+            }
+        })
+
+    def _chunk(self, model, delta, finish_reason=None):
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    def _send_event(self, payload):
+        self.wfile.write(b"data: " + json.dumps(payload).encode() + b"\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host="127.0.0.1", port=0, reply=DEFAULT_REPLY, first_token_latency=0.3, token_delay=0.02,
+                model_latency=None, error_rate=0.0, error_status=500, error_latency=0.0, slow_rate=0.0,
+                slow_latency=30.0, seed=None):
+    """
+    model_latency maps a model name to its own first-token latency. A
+    request fails with error_status (after error_latency) with probability
+    error_rate, and otherwise stalls for slow_latency with probability
+    slow_rate.
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.request_count = 0
+    server.error_count = 0
+    server.lock = threading.Lock()
+    server.rng = random.Random(seed)
+    server.options = {
+        "reply": reply,
+        "first_token_latency": first_token_latency,
+        "token_delay": token_delay,
+        "model_latency": dict(model_latency or {}),
+        "error_rate": error_rate,
+        "error_status": error_status,
+        "error_latency": error_latency,
+        "slow_rate": slow_rate,
+        "slow_latency": slow_latency
+    }
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server
+
+
+def serve_in_thread(**options):
+    """Start a fake server on a free port; call .shutdown() when done"""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="First-token latency for one model, e.g. gpt-3.5-turbo=0.15")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--error-latency", type=float, default=0.0, help="Delay before a failure is returned")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests that stall")
+    parser.add_argument("--slow-latency", type=float, default=30.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.reply, args.first_token_latency, args.token_delay,
+        model_latency={name: float(seconds) for name, seconds in (item.split("=", 1) for item in args.model_latency)},
+        error_rate=args.error_rate, error_status=args.error_status, error_latency=args.error_latency,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=args.seed
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    server.serve_forever()
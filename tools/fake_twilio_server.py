@@ -0,0 +1,126 @@
+"""
+Local stand-in for Twilio's Calls REST API, for testing and benchmarking
+outbound campaigns without placing real calls. POST
+/2010-04-01/Accounts/<sid>/Calls.json answers like Twilio (201 with a call
+resource), after a configurable latency; a share of requests can fail with
+an error status. Every accepted call is recorded, with the time it arrived,
+so a test can check the dispatch rate, concurrency and duplicates.
+
+Run standalone and point the app at it:
+
+    python tools/fake_twilio_server.py --port 8766 --latency 0.3 --error-rate 0.05
+    TWILIO_API_BASE_URL=http://127.0.0.1:8766 TWILIO_ACCOUNT_SID=AC00000000000000000000000000000000 \
+        TWILIO_AUTH_TOKEN=test TWILIO_PHONE_NUMBER=+441130000000 python app.py
+
+or start it in-process with serve_in_thread().
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+CALLS_PATH_RE = re.compile(r"^/2010-04-01/Accounts/(?P<account>AC\w+)/Calls\.json$")
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        match = CALLS_PATH_RE.match(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length", 0))
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        if not match:
+            self._send_json(404, {"code": 20404, "message": "The requested resource was not found", "status": 404})
+            return
+
+        server = self.server
+        options = server.options
+        with server.lock:
+            server.request_count += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            roll = server.rng.random()
+        try:
+            time.sleep(options["latency"])
+            if not form.get("To") or not form.get("From") or not (form.get("Url") or form.get("Twiml")):
+                self._send_json(400, {"code": 21201, "message": "No 'To', 'From' or 'Url' specified", "status": 400})
+                return
+            if roll < options["error_rate"]:
+                with server.lock:
+                    server.error_count += 1
+                status = options["error_status"]
+                self._send_json(status, {"code": 20500 if status >= 500 else 20429,
+                                         "message": "Injected failure", "status": status})
+                return
+            sid = "CA" + uuid.uuid4().hex
+            with server.lock:
+                server.calls.append((time.monotonic(), form["To"], sid))
+            self._send_json(201, {
+                "sid": sid,
+                "account_sid": match.group("account"),
+                "to": form["To"],
+                "from": form["From"],
+                "status": "queued",
+                "direction": "outbound-api",
+                "api_version": "2010-04-01",
+                "date_created": time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime()),
+                "uri": f"/2010-04-01/Accounts/{match.group('account')}/Calls/{sid}.json"
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.2, error_rate=0.0, error_status=500, seed=None):
+    """A request fails with error_status with probability error_rate, after the same latency"""
+    server = ThreadingHTTPServer((host, port), FakeTwilioHandler)
+    server.daemon_threads = True
+    server.request_count = 0
+    server.error_count = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    # (monotonic time, To, CallSid) of every accepted call
+    server.calls = []
+    server.lock = threading.Lock()
+    server.rng = random.Random(seed)
+    server.options = {"latency": latency, "error_rate": error_rate, "error_status": error_status}
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    return server
+
+
+def serve_in_thread(**options):
+    """Start a fake server on a free port; call .shutdown() when done"""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate, args.error_status, args.seed)
+    print(f"Fake Twilio API listening on {server.base_url}")
+    server.serve_forever()
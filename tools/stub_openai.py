@@ -0,0 +1,108 @@
+"""
+In-process, deterministic stand-in for the OpenAI client, for benchmarks
+that drive the app directly rather than over HTTP. Assign it to the
+manager's client:
+
+    manager.client = StubOpenAI(latency=0.2, token_delay=0.01)
+
+Only chat.completions.create is implemented, plain and streamed, with the
+same response shape the app reads from the real SDK. Usage counts come from
+the app's own token estimate, so prompt growth shows up in the numbers.
+Failures can be injected as in tools/fake_openai_server.py; a request's
+timeout is honoured the way the SDK does, by raising once it has passed.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import count_tokens  # noqa: E402
+
+DEFAULT_REPLY = (
+    "Of course! The Wiener Schnitzel is £12.99 and comes with mashed potatoes "
+    "and cranberry sauce. Would you like me to book a table for you?"
+)
+
+
+class StubAPIError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Completions:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def create(self, model=None, messages=(), stream=False, timeout=None, **kwargs):
+        stub = self.stub
+        with stub.lock:
+            stub.request_count += 1
+            roll = stub.rng.random()
+        prompt_tokens = sum(count_tokens(message.get("content") or "") for message in messages)
+        tokens = stub.tokenize(stub.reply)
+        if roll < stub.error_rate:
+            time.sleep(stub.error_latency)
+            raise StubAPIError("Injected failure", status_code=500)
+        slow = roll < stub.error_rate + stub.slow_rate
+        latency = stub.slow_latency if slow else stub.model_latency.get(model, stub.latency)
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise StubAPIError("Request timed out.")
+        time.sleep(latency)
+        if stream:
+            return stub.stream(model, tokens)
+        time.sleep(stub.token_delay * len(tokens))
+        message = SimpleNamespace(role="assistant", content=stub.reply)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(tokens),
+                total_tokens=prompt_tokens + len(tokens)
+            )
+        )
+
+
+class StubOpenAI:
+    """
+    latency is the delay before the first token (or the whole reply when not
+    streaming), overridden per model by model_latency; token_delay is added
+    per generated token. A request fails with probability error_rate and
+    otherwise stalls for slow_latency with probability slow_rate.
+    """
+
+    def __init__(self, reply=DEFAULT_REPLY, latency=0.0, token_delay=0.0, model_latency=None, error_rate=0.0,
+                 error_latency=0.0, slow_rate=0.0, slow_latency=30.0, seed=None):
+        self.reply = reply
+        self.latency = latency
+        self.token_delay = token_delay
+        self.model_latency = dict(model_latency or {})
+        self.error_rate = error_rate
+        self.error_latency = error_latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    @staticmethod
+    def tokenize(text):
+        # Word-sized pieces, each keeping its leading space like real tokens
+        words = text.split(" ")
+        return [words[0]] + [" " + word for word in words[1:]]
+
+    def stream(self, model, tokens):
+        for token in tokens:
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            delta = SimpleNamespace(content=token)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        delta = SimpleNamespace(content=None)
+        yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta, finish_reason="stop")])
@@ -0,0 +1,32 @@
+"""
+Local stand-in for the speech recognizer, for tests and throughput
+benchmarks without the network. Takes latency plus realtime_factor times
+the audio's duration, like a remote recognizer, and returns a placeholder
+naming the segment's length:
+
+    pipeline = STTPipeline(StubRecognizer(latency=0.1, realtime_factor=0.2))
+"""
+import threading
+import time
+
+
+class StubRecognizer:
+    def __init__(self, latency=0.0, realtime_factor=0.0, error_every=0):
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+        # Fail every nth request, to exercise per-segment error handling
+        self.error_every = error_every
+        self.request_count = 0
+        self.audio_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def recognize(self, audio, sample_rate, sample_width):
+        seconds = len(audio) / (sample_rate * sample_width)
+        with self._lock:
+            self.request_count += 1
+            self.audio_seconds += seconds
+            count = self.request_count
+        time.sleep(self.latency + self.realtime_factor * seconds)
+        if self.error_every and count % self.error_every == 0:
+            raise ConnectionError("Injected recognizer failure")
+        return f"utterance of {seconds:.1f} seconds"
@@ -0,0 +1,38 @@
+"""
+Local stand-in for the text-to-speech backend, for tests and benchmarks
+without the network. Produces a valid WAV clip of silence whose length
+follows the text, after a delay modelled on a remote TTS service:
+
+    handler = VoiceHandler(tts_backend=StubTTS(latency=0.2, per_word=0.01))
+"""
+import io
+import threading
+import time
+import wave
+
+SAMPLE_RATE = 8000
+SECONDS_PER_WORD = 0.3
+
+
+class StubTTS:
+    name = "stub"
+    extension = "wav"
+
+    def __init__(self, latency=0.0, per_word=0.0):
+        self.latency = latency
+        self.per_word = per_word
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, text, voice=None, language="en-GB"):
+        with self._lock:
+            self.request_count += 1
+        words = len(text.split())
+        time.sleep(self.latency + self.per_word * words)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as clip:
+            clip.setnchannels(1)
+            clip.setsampwidth(1)
+            clip.setframerate(SAMPLE_RATE)
+            clip.writeframes(b"\x80" * int(SAMPLE_RATE * SECONDS_PER_WORD * max(1, words)))
+        return buffer.getvalue()
@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from metrics import registry
+
+STAGE_METRIC = "voice_turn_stage_seconds"
+TURN_METRIC = "voice_turn_seconds"
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullTrace:
+    """
+    Stand-in used when tracing is disabled: every method is a no-op and
+    span() hands back one shared context manager, so an instrumented turn
+    costs a few attribute lookups and nothing else.
+    """
+
+    __slots__ = ()
+    trace_id = None
+    _span = _NullSpan()
+
+    def span(self, name):
+        return self._span
+
+    def set(self, key, value):
+        pass
+
+    def add_usage(self, usage):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace._record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Trace:
+    """
+    Stage timings for one conversational turn, keyed by the Twilio CallSid.
+    Each span is observed in the stage histogram as soon as it ends, so
+    stages finishing after the webhook returned (e.g. the history write of a
+    streamed reply) still count; finish() records the turn total and writes
+    the JSON log line.
+    """
+
+    __slots__ = ("tracer", "trace_id", "spans", "attributes", "start", "finished")
+
+    def __init__(self, tracer, trace_id):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.spans = {}
+        self.attributes = {}
+        self.start = time.perf_counter()
+        self.finished = False
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def _record(self, name, seconds):
+        # A stage can run more than once per turn (e.g. two history lookups)
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+        registry.observe_histogram(STAGE_METRIC, seconds, (("stage", name),))
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add_usage(self, usage):
+        """Record token usage from a chat completion response's usage field"""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.attributes["prompt_tokens"] = self.attributes.get("prompt_tokens", 0) + prompt_tokens
+        self.attributes["completion_tokens"] = self.attributes.get("completion_tokens", 0) + completion_tokens
+        registry.inc("llm_prompt_tokens_total", prompt_tokens)
+        registry.inc("llm_completion_tokens_total", completion_tokens)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.start
+        registry.observe_histogram(TURN_METRIC, total)
+        self.tracer._log(self, total)
+
+
+class Tracer:
+    """
+    Creates per-turn traces. Disabled tracers return NULL_TRACE. When
+    log_stream is set, every finished turn is written to it as one JSON line.
+    """
+
+    def __init__(self, enabled=True, log_stream=None):
+        self.enabled = enabled
+        self.log_stream = log_stream
+        self._log_lock = threading.Lock()
+
+        registry.histogram(STAGE_METRIC, "Time spent in each stage of a voice turn")
+        registry.histogram(TURN_METRIC, "Time to handle one voice turn end to end")
+        registry.describe("llm_prompt_tokens_total", "Prompt tokens sent to the LLM")
+        registry.describe("llm_completion_tokens_total", "Completion tokens generated by the LLM")
+
+    @classmethod
+    def from_env(cls):
+        """TRACING=0 disables tracing; TRACE_LOG=stdout|stderr|<path> enables JSON turn logs"""
+        log_target = os.getenv("TRACE_LOG")
+        log_stream = None
+        if log_target == "stdout":
+            log_stream = sys.stdout
+        elif log_target == "stderr":
+            log_stream = sys.stderr
+        elif log_target:
+            log_stream = open(log_target, "a", buffering=1)
+        return cls(enabled=os.getenv("TRACING", "1") == "1", log_stream=log_stream)
+
+    def start(self, trace_id=None):
+        if not self.enabled:
+            return NULL_TRACE
+        return Trace(self, trace_id)
+
+    def _log(self, trace, total):
+        if self.log_stream is None:
+            return
+        record = {
+            "ts": time.time(),
+            "trace_id": trace.trace_id,
+            "total_ms": round(total * 1000, 3),
+            "spans_ms": {name: round(seconds * 1000, 3) for name, seconds in trace.spans.items()},
+        }
+        record.update(trace.attributes)
+        line = json.dumps(record, default=str)
+        with self._log_lock:
+            try:
+                self.log_stream.write(line + "\n")
+            except Exception as e:
+                print(f"Error writing trace log: {e}")
+
+
+tracer = Tracer.from_env()
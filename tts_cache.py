@@ -0,0 +1,115 @@
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+from metrics import registry
+
+# <sha256 prefix>.<extension>, the only names the /tts endpoint will look up
+AUDIO_NAME_RE = re.compile(r"^[0-9a-f]{40}\.[a-z0-9]{2,4}$")
+
+MIMETYPES = {"mp3": "audio/mpeg", "wav": "audio/wav"}
+
+
+def audio_key(backend, voice, language, text):
+    """Content address of one utterance; any change to the inputs is a different clip"""
+    return hashlib.sha256(f"{backend}\0{voice}\0{language}\0{text}".encode("utf-8")).hexdigest()[:40]
+
+
+def iter_chunks(buffer, chunk_size=64 * 1024):
+    # Slicing an mmap copies just that slice, so a response never holds the whole clip twice
+    for start in range(0, len(buffer), chunk_size):
+        yield buffer[start:start + chunk_size]
+
+
+class TTSCache:
+    """
+    Synthesized audio, addressed by audio_key() plus the file extension.
+
+    Two tiers: each clip is written once to cache_dir and read back through
+    a read-only memory map, and an LRU of those maps, bounded by
+    memory_bytes, keeps popular clips open. The maps are backed by the page
+    cache, so workers on one host share the pages of a clip rather than
+    each holding a copy. Without a cache_dir the LRU holds plain bytes.
+    """
+
+    def __init__(self, cache_dir=None, memory_bytes=32 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        registry.describe("tts_cache_memory_hits_total", "Clips served from the in-memory LRU")
+        registry.describe("tts_cache_disk_hits_total", "Clips mapped in from the disk cache")
+        registry.describe("tts_cache_misses_total", "Clips that had to be synthesized")
+        registry.set_gauge("tts_cache_memory_bytes", lambda: self._memory_size)
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name[:2], name)
+
+    def _remember(self, name, audio):
+        with self._lock:
+            previous = self._memory.pop(name, None)
+            if previous is not None:
+                self._memory_size -= len(previous)
+            self._memory[name] = audio
+            self._memory_size += len(audio)
+            # Evicted maps close once the last response streaming from them is done
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, name):
+        """The clip as a bytes-like object, or None if it isn't cached"""
+        if not AUDIO_NAME_RE.match(name):
+            return None
+        with self._lock:
+            audio = self._memory.get(name)
+            if audio is not None:
+                self._memory.move_to_end(name)
+        if audio is not None:
+            registry.inc("tts_cache_memory_hits_total")
+            return audio
+        if not self.cache_dir:
+            return None
+        try:
+            audio = self._map(self._path(name))
+        except (FileNotFoundError, ValueError):
+            return None
+        registry.inc("tts_cache_disk_hits_total")
+        self._remember(name, audio)
+        return audio
+
+    def contains(self, name):
+        with self._lock:
+            if name in self._memory:
+                return True
+        return bool(self.cache_dir) and os.path.exists(self._path(name))
+
+    def put(self, name, audio):
+        """Store a clip; returns what get() would return for it"""
+        if not audio or not self.cache_dir:
+            if audio:
+                self._remember(name, bytes(audio))
+            return audio
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so another worker never maps a half-written clip
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        mapped = self._map(path)
+        self._remember(name, mapped)
+        return mapped
@@ -0,0 +1,122 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+from metrics import registry
+
+# Spoken when the LLM misses its latency budget, well before Twilio's 15 s webhook timeout
+FALLBACK_UTTERANCE = "Sorry, that's taking me a little longer than usual. Could you say that once more?"
+
+
+class TurnPipeline:
+    """
+    Runs the independent stages of a turn concurrently on a shared thread
+    pool: the context fetch overlaps emotion detection, the LLM call runs
+    under a latency budget, and the history writes go out after the reply
+    has been returned. Every wait has a timeout; on a timeout the caller
+    gets the stage's default instead of an error.
+
+    With enabled=False every stage runs inline on the calling thread, as
+    before; timeouts then cannot be enforced.
+    """
+
+    def __init__(self, enabled=True, max_workers=8, context_timeout=1.0, llm_budget=10.0, fallback_text=FALLBACK_UTTERANCE):
+        self.enabled = enabled
+        self.max_workers = max_workers
+        self.context_timeout = context_timeout
+        self.llm_budget = llm_budget
+        self.fallback_text = fallback_text
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._background = set()
+        self._background_lock = threading.Lock()
+
+        registry.describe("turn_stage_timeouts_total", "Turn stages that missed their timeout")
+        registry.describe("turn_llm_fallbacks_total", "Turns answered with the fallback utterance")
+        registry.set_gauge("turn_background_writes", lambda: len(self._background))
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('TURN_PIPELINE', '1') == '1',
+            max_workers=int(os.getenv('TURN_WORKERS', '8')),
+            context_timeout=float(os.getenv('TURN_CONTEXT_TIMEOUT', '1.0')),
+            llm_budget=float(os.getenv('LLM_LATENCY_BUDGET', '10.0')),
+        )
+
+    @property
+    def executor(self):
+        # Created on first use so its threads belong to the worker, not a pre-fork master
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="turn")
+        return self._executor
+
+    def start(self, fn, *args):
+        """Start a stage; returns a handle for wait(). Runs inline when disabled."""
+        if not self.enabled:
+            return _Done(fn, args)
+        return self.executor.submit(fn, *args)
+
+    def wait(self, handle, timeout, stage, default=None):
+        """Result of a started stage, or default if it doesn't finish within timeout"""
+        try:
+            return handle.result(timeout=timeout)
+        except FutureTimeout:
+            registry.inc("turn_stage_timeouts_total")
+            print(f"Turn stage '{stage}' timed out after {timeout}s")
+            return default
+
+    def in_background(self, *calls):
+        """Run (fn, *args) calls concurrently without waiting for them"""
+        if not self.enabled:
+            for fn, *args in calls:
+                fn(*args)
+            return
+        for fn, *args in calls:
+            future = self.executor.submit(_log_errors, fn, *args)
+            with self._background_lock:
+                self._background.add(future)
+            future.add_done_callback(self._forget)
+
+    def _forget(self, future):
+        with self._background_lock:
+            self._background.discard(future)
+
+    def flush(self, timeout=None):
+        """Wait for background writes; returns True if none are still running"""
+        with self._background_lock:
+            pending = list(self._background)
+        return not wait(pending, timeout=timeout).not_done
+
+    def shutdown(self, timeout=10):
+        self.flush(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class _Done:
+    """Handle for a stage that already ran inline"""
+
+    def __init__(self, fn, args):
+        self._value, self._error = None, None
+        try:
+            self._value = fn(*args)
+        except Exception as e:
+            self._error = e
+
+    def result(self, timeout=None):
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+
+def _log_errors(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"Error in background turn stage {getattr(fn, '__name__', fn)}: {e}")
@@ -1,30 +1,161 @@
-from gtts import gTTS
-import speech_recognition as sr
 import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry
+from streaming import find_sentence_end
+from stt_pipeline import STTPipeline, SpeechRecognitionBackend, STT_WORKERS
+from tts_cache import TTSCache, audio_key
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(BASE_DIR, 'data', 'tts_cache'))
+TTS_MEMORY_BYTES = int(os.getenv('TTS_CACHE_MEMORY_MB', '32')) * 1024 * 1024
+
+
+class GTTSBackend:
+    """Google Translate TTS. gTTS has no voices, only a language and an accent (tld)"""
+
+    name = "gtts"
+    extension = "mp3"
+
+    ACCENTS = {"en-GB": ("en", "co.uk"), "en-US": ("en", "com"), "en-IE": ("en", "ie")}
+
+    def synthesize(self, text, voice=None, language="en-GB"):
+        from gtts import gTTS
+        lang, tld = self.ACCENTS.get(language, (language.split("-")[0], "com"))
+        audio_buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=tld).write_to_fp(audio_buffer)
+        return audio_buffer.getvalue()
+
 
 class VoiceHandler:
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
+    """
+    Speech-to-text through an STTPipeline, and text-to-speech through a
+    TTSCache: every utterance is synthesized once per backend, voice and
+    language, then served from memory or disk. Both backends are
+    swappable: the TTS one is anything with name, extension and
+    synthesize(text, voice, language) -> bytes, e.g. tools/stub_tts.py;
+    the STT one anything with recognize(audio, sample_rate, sample_width),
+    e.g. tools/stub_stt.py.
+    """
+
+    def __init__(self, tts_backend=None, cache=None, voice=None, language="en-GB", stt_backend=None):
+        self.tts = tts_backend or GTTSBackend()
+        self.cache = cache if cache is not None else TTSCache(TTS_CACHE_DIR, TTS_MEMORY_BYTES)
+        self.voice = voice
+        self.language = language
+        self._stt_backend = stt_backend
+        self._stt = None
+        self._executor = None
+        self._executor_pid = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+        registry.histogram("tts_synthesis_seconds", "Time to synthesize one uncached utterance")
+
+    @property
+    def stt(self):
+        if self._stt is None:
+            backend = self._stt_backend or SpeechRecognitionBackend(os.getenv('STT_ENGINE', 'google'), self.language)
+            self._stt = STTPipeline(backend, workers=STT_WORKERS)
+        return self._stt
 
     def speech_to_text(self, audio_file):
-        """Convert speech to text"""
+        """Text of a WAV recording, or None if nothing could be recognized"""
+        transcript = self.stt.transcribe(audio_file)
+        if transcript.errors:
+            print(f"Speech-to-text errors in {audio_file}: {'; '.join(transcript.errors)}")
+        return transcript.text or None
+
+    def transcribe_recordings(self, audio_files):
+        """Yield (audio_file, Transcript) for a backlog of recordings, in order"""
+        return self.stt.transcribe_batch(audio_files)
+
+    def audio_name(self, text, language=None):
+        key = audio_key(self.tts.name, self.voice, language or self.language, text)
+        return f"{key}.{self.tts.extension}"
+
+    def cached_name(self, text, language=None):
+        """Name of the cached clip for text, or None if it hasn't been synthesized"""
+        name = self.audio_name(text, language)
+        return name if self.cache.contains(name) else None
+
+    def synthesize(self, text, language=None):
+        """(name, audio) for text, synthesizing it only on a cache miss; (None, None) on failure"""
+        language = language or self.language
+        name = self.audio_name(text, language)
+        audio = self.cache.get(name)
+        if audio is not None:
+            return name, audio
+        registry.inc("tts_cache_misses_total")
+        start = time.perf_counter()
         try:
-            with sr.AudioFile(audio_file) as source:
-                audio = self.recognizer.record(source)
-                text = self.recognizer.recognize_google(audio)
-                return text
+            audio = self.tts.synthesize(text, self.voice, language)
         except Exception as e:
-            print(f"Speech-to-text error: {e}")
-            return None
+            print(f"Text-to-speech error: {e}")
+            return None, None
+        registry.observe_histogram("tts_synthesis_seconds", time.perf_counter() - start)
+        return name, self.cache.put(name, audio)
 
     def text_to_speech(self, text):
         """Convert text to speech"""
-        try:
-            tts = gTTS(text=text, lang='en')
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            return audio_buffer
-        except Exception as e:
-            print(f"Text-to-speech error: {e}")
-            return None
+        _, audio = self.synthesize(text)
+        return io.BytesIO(audio) if audio is not None else None
+
+    def synthesize_stream(self, text_chunks, language=None):
+        """
+        Yield (name, audio) for each sentence as soon as it is complete.
+        text_chunks is a string or an iterable of text deltas, e.g. tokens of
+        a streamed LLM reply. Sentences are cached one by one, so a reply
+        that repeats a common sentence only synthesizes the new ones.
+        """
+        if isinstance(text_chunks, str):
+            text_chunks = (text_chunks,)
+        pending = ""
+        for chunk in text_chunks:
+            pending += chunk
+            end = find_sentence_end(pending)
+            while end != -1:
+                sentence, pending = pending[:end].strip(), pending[end:]
+                name, audio = self.synthesize(sentence, language)
+                if audio is not None:
+                    yield name, audio
+                end = find_sentence_end(pending)
+        if pending.strip():
+            name, audio = self.synthesize(pending.strip(), language)
+            if audio is not None:
+                yield name, audio
+
+    @property
+    def executor(self):
+        # Created on first use so its thread belongs to the worker, not a pre-fork master
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def synthesize_in_background(self, text, language=None):
+        """Cache text's audio off the request path, so the next time it is spoken it can be played"""
+        name = self.audio_name(text, language)
+        with self._lock:
+            if name in self._in_flight or self.cache.contains(name):
+                return
+            self._in_flight.add(name)
+
+        def run():
+            try:
+                self.synthesize(text, language)
+            finally:
+                with self._lock:
+                    self._in_flight.discard(name)
+
+        self.executor.submit(run)
+
+    def prewarm(self, texts, language=None):
+        """Synthesize known static prompts ahead of the first call; returns how many were missing"""
+        missing = [text for text in texts if not self.cached_name(text, language)]
+        for text in missing:
+            self.synthesize(text, language)
+        return len(missing)
@@ -0,0 +1,200 @@
+import atexit
+import json
+import queue
+import threading
+import time
+
+from history_store import HistoryStore
+from metrics import registry
+
+
+class WriteBehindStore(HistoryStore):
+    """
+    Wraps a HistoryStore so writes are queued and flushed by a background
+    thread instead of blocking the webhook. Both plain rows and mutate()
+    calls are queued; a batch is applied once it reaches batch_size items or
+    flush_interval seconds, whichever comes first, in one transaction of the
+    underlying store, and each key touched by the batch is written once.
+
+    Single-record reads don't wait for the queue, so a turn's lookups see
+    the store as of the last flush; load() and transaction() flush first.
+
+    The queue is bounded. When it is full, writers block until the flusher
+    makes room, so a stalled disk slows requests down rather than dropping
+    history; writes that waited longer than put_timeout are counted as
+    backpressure. Writing inline instead would let a row overtake older
+    queued rows for the same key and then be overwritten by them.
+    """
+
+    def __init__(self, store, max_queue=10000, batch_size=200, flush_interval=0.5, put_timeout=1.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._closed = False
+
+        registry.describe("history_write_queue_depth", "Rows and updates waiting to be flushed to the history store")
+        registry.describe("history_flush_seconds", "Time spent applying one batch to the history store")
+        registry.describe("history_flush_rows_total", "Records written to the history store by the flusher")
+        registry.describe("history_write_backpressure_total", "Writes that waited more than put_timeout for queue space")
+        registry.set_gauge("history_write_queue_depth", self._queue.qsize)
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        # Started lazily so the thread is created in the worker, not a pre-fork master
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, name="history-write-behind", daemon=True
+                    )
+                    self._thread.start()
+
+    def load(self, namespace):
+        self.flush()
+        return self.store.load(namespace)
+
+    def get(self, namespace, key):
+        # On the turn path; at most one batch behind the writes queued so far
+        return self.store.get(namespace, key)
+
+    def transaction(self):
+        """
+        Synchronous read-modify-writes (startup, maintenance) go straight to
+        the underlying store, after the queue is flushed so they never read a
+        record older than a queued write
+        """
+        self.flush()
+        return self.store.transaction()
+
+    def write_batch(self, rows):
+        if self._closed:
+            self.store.write_batch(rows)
+            return
+        self._enqueue(rows)
+
+    def mutate(self, fn, *args):
+        """Queue fn(tx, *args); the flusher runs it in the next batch's transaction"""
+        if self._closed:
+            self.store.mutate(fn, *args)
+            return
+        self._enqueue([(fn, args)])
+
+    def _enqueue(self, items):
+        self._ensure_thread()
+        for item in items:
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                registry.inc("history_write_backpressure_total")
+                self._queue.put(item)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush_batch(batch)
+
+    def _flush_batch(self, batch):
+        start = time.perf_counter()
+        written = 0
+        try:
+            with self.store.transaction() as tx:
+                written = _apply_batch(tx, batch)
+        except Exception as e:
+            print(f"Error flushing history batch: {e}")
+        finally:
+            registry.observe("history_flush_seconds", time.perf_counter() - start)
+            registry.inc("history_flush_rows_total", written)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued write has been persisted"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def metrics(self):
+        snapshot = registry.snapshot()
+        return {
+            "queue_depth": self._queue.qsize(),
+            "flush_seconds": snapshot["summaries"].get("history_flush_seconds", {}),
+            "rows_flushed": snapshot["counters"].get("history_flush_rows_total", 0),
+            "backpressure_writes": snapshot["counters"].get("history_write_backpressure_total", 0)
+        }
+
+    def compact(self):
+        self.flush()
+        self.store.compact()
+
+    def close(self):
+        """Drain the queue and close the underlying store; safe to call twice"""
+        if self._closed:
+            return
+        # New writes go inline from here on; the flusher drains what is queued
+        self._closed = True
+        self.flush()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.store.close()
+
+
+def _apply_batch(tx, batch):
+    """Apply queued rows and mutations in order; returns how many keys were written"""
+    pending = _Coalesced(tx)
+    for item in batch:
+        if callable(item[0]):
+            fn, args = item
+            # A failing mutation is dropped on its own, like a failed synchronous update
+            own = _Coalesced(pending)
+            try:
+                fn(own, *args)
+            except Exception as e:
+                print(f"Error applying history update {getattr(fn, '__name__', fn)}: {e}")
+                continue
+            pending.payloads.update(own.payloads)
+        else:
+            namespace, key, payload = item
+            pending.payloads[(namespace, key)] = payload
+    for (namespace, key), payload in pending.payloads.items():
+        tx.put(namespace, key, json.loads(payload))
+    return len(pending.payloads)
+
+
+class _Coalesced:
+    """View of a transaction that holds puts back, last write per key wins"""
+
+    def __init__(self, tx):
+        self.tx = tx
+        self.payloads = {}
+
+    def get(self, namespace, key):
+        payload = self.payloads.get((namespace, key))
+        return json.loads(payload) if payload is not None else self.tx.get(namespace, key)
+
+    def load(self, namespace):
+        records = self.tx.load(namespace)
+        records.update({key: json.loads(payload) for (ns, key), payload in self.payloads.items() if ns == namespace})
+        return records
+
+    def put(self, namespace, key, record):
+        self.payloads[(namespace, key)] = json.dumps(record)